@@ -1,26 +1,201 @@
 # Import required libraries
+import time  # Time functions
+MODULE_IMPORT_START = time.perf_counter()  # Start of module import, for --startup-profile
 import cv2  # OpenCV for computer vision
-import mediapipe as mp  # MediaPipe for pose estimation
 import math  # Math functions
 import random  # Random number generation
 import json  # JSON handling for data storage
+import numpy as np  # Vectorized landmark math
 import pygame  # Pygame for game interface
 import threading  # Threading for parallel processing
-import time  # Time functions
+import queue  # Queues for the webcam pipeline stages
 import pygame.mixer  # Pygame audio mixer
 import os  # Operating system functions
+from collections import OrderedDict, deque, namedtuple  # LRU text surface cache, metric sample windows, state snapshots
+from contextlib import contextmanager  # Startup phase timers
+import argparse  # Command line options
+import csv  # User record import/export
+import sqlite3  # On-disk staging of imported users
+import asyncio  # Scheduler running the UI, webcam pipeline, persistence and music
+import platform  # Machine description stored with benchmark baselines
+import tracemalloc  # Memory measurement for benchmarks
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed  # Batch worker pool, scheduler executor
+import multiprocessing  # One process per tracking station
+from abc import ABC, abstractmethod  # Interfaces exercises and detectors implement
 from datetime import datetime, timedelta  # Date and time handling
-import matplotlib.pyplot as plt  # For graph generation
+# MediaPipe and matplotlib are imported on first use, see load_mediapipe and load_matplotlib
 
 # Game configuration
 goal_squats = 20  # Target number of squats for progress
 
+# Exercise screen configuration
+GAME_FPS = 30  # Frame rate cap for the exercise screens
+
+# Scheduler configuration
+UI_POLL_INTERVAL = 1 / 60  # Seconds between input checks while a screen waits for events
+SCHEDULER_WORKERS = 4  # Executor threads for blocking work: capture, inference, disk writes, graphs
+
+# Webcam pipeline configuration
+PIPELINE_QUEUE_SIZE = 2  # Max frames buffered between pipeline stages
+PIPELINE_POLL_TIMEOUT = 0.1  # Seconds a stage waits for input before rechecking flags
+FRAME_POOL_SIZE = PIPELINE_QUEUE_SIZE * 2 + 4  # Frames both queues can hold, one per stage, and a spare
+PREWARM_SECONDS = 5  # Countdown length while the camera and pose model warm up
+PREWARM_TIMEOUT = 20  # Seconds to wait for readiness before starting anyway
+PREWARM_INFERENCES = 3  # Dummy inferences run to warm up the pose model
+PREWARM_FRAMES = 5  # Camera frames that must be processed before play begins
+
+# Adaptive quality configuration
+TARGET_FPS = 20  # Frame rate the quality controller keeps inference at (0 disables adaptation)
+QUALITY_LEVELS = [  # (inference input scale, infer every Nth frame, model complexity), best first
+    (1.0, 1, 1),
+    (0.75, 1, 1),
+    (0.75, 1, 0),
+    (0.5, 1, 0),
+    (0.5, 2, 0),
+    (0.5, 3, 0),
+]
+QUALITY_DOWNGRADE_FRAMES = 15  # Consecutive over-budget frames before quality is lowered
+QUALITY_UPGRADE_FRAMES = 90  # Consecutive fast frames before quality is raised again
+QUALITY_HEADROOM = 0.6  # Fraction of the frame budget a frame must stay under to count as fast
+
+# Region of interest configuration
+ROI_PADDING = 0.3  # Padding around the person's landmarks, as a fraction of their box size
+ROI_MARGIN = 0.05  # The crop is kept while the person stays this far (fraction of crop) inside it
+ROI_MIN_SIZE = 0.25  # Smallest crop side, as a fraction of the shorter frame side
+ROI_MAX_AREA = 0.8  # Crops covering more of the frame than this search the full frame instead
+
+# Landmark smoothing configuration
+NOMINAL_FRAME_RATE = 30  # Frame rate assumed when landmarks arrive without timestamps
+EXPONENTIAL_ALPHA = 0.5  # Weight of the newest frame in the exponential filter
+ONE_EURO_MIN_CUTOFF = 1.5  # One-Euro cutoff frequency in Hz when landmarks are still
+ONE_EURO_BETA = 1.0  # Cutoff increase per unit/second of landmark speed, lowers lag on fast moves
+ONE_EURO_DERIVATIVE_CUTOFF = 1.0  # Cutoff frequency in Hz for the speed estimate
+
+# Instrumentation configuration
+METRICS_WINDOW = 2000  # Latency samples kept per stage for percentiles
+METRICS_DIR = "metrics"  # Session metrics files are written here
+
+# Batch analysis configuration
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".webm")  # Files picked up from directories
+BATCH_OUTPUT_FILE = "batch_results.jsonl"  # Per-file results, one JSON object per line
+
+# Landmark recording configuration
+LANDMARK_FILE_EXTENSION = ".fqlm"  # Recorded landmark sessions
+landmark_record_dir = None  # Directory live sessions are recorded to (None disables recording)
+replay_file = None  # Recording played back instead of the webcam (None uses the webcam)
+detector_options = {}  # Threshold overrides per exercise type, passed to the detectors
+
+# Multi-station configuration
+STATION_SESSION_SECONDS = 120  # Length of a station session
+STATION_UPDATE_INTERVAL = 1 / 15  # Seconds between a station's dashboard updates
+STATION_TILE_SIZE = (480, 360)  # Size of each station's tile on the dashboard
+
+# Benchmark configuration
+BENCHMARK_RESOLUTIONS = [(320, 240), (640, 480), (1280, 720)]  # Frame sizes benchmarked
+BENCHMARK_FRAMES = 90  # Timed frames per exercise, resolution and quality level
+BENCHMARK_WARMUP_FRAMES = 10  # Untimed frames run first so model setup is not measured
+BENCHMARK_MEMORY_FRAMES = 20  # Frames run under tracemalloc, separately from the timed run
+BENCHMARK_QUALITY_LEVELS = [0, len(QUALITY_LEVELS) - 1]  # Full quality and the lowest adaptive quality
+BENCHMARK_SEED = 1234  # Seed for synthetic frames, landmarks and coin positions
+BENCHMARK_BASELINE_FILE = "benchmark_baseline.json"  # Stored results checked for regressions
+BENCHMARK_TOLERANCE = 0.2  # Allowed slowdown (or memory growth) before a result is a regression
+
+# Startup time of each initialization phase in seconds, for --startup-profile
+STARTUP_TIMINGS = {}
+
+@contextmanager
+def startup_timer(phase):
+    """Record how long an initialization phase takes"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STARTUP_TIMINGS[phase] = STARTUP_TIMINGS.get(phase, 0.0) + time.perf_counter() - start
+
 # Initialize Pygame
 def setup_game():
-    pygame.init()
-    initialize_music()  # Set up background music
+    with startup_timer("pygame init"):
+        pygame.init()
+    init_display()
+    # Music is loaded by a scheduler task once the menu is up
+
+class Scheduler:
+    """Single asyncio event loop running the UI, webcam pipeline, persistence and music as tasks"""
+
+    def __init__(self, workers=SCHEDULER_WORKERS):
+        self.workers = workers
+        self.loop = None
+        self.executor = None  # Long-lived threads for blocking work
+        self.tasks = set()
 
-pygame.font.init()  # Initialize font system
+    def run(self, coroutine):
+        """Run the main coroutine to completion, then cancel any remaining tasks"""
+        self.loop = asyncio.new_event_loop()
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="fitquest")
+        self.loop.set_default_executor(self.executor)
+        try:
+            return self.loop.run_until_complete(coroutine)
+        finally:
+            for task in list(self.tasks):
+                task.cancel()
+            self.loop.run_until_complete(asyncio.gather(*self.tasks, return_exceptions=True))
+            self.executor.shutdown(wait=True)
+            self.loop.close()
+            self.loop = None
+
+    def spawn(self, coroutine):
+        """Start a background task on the loop"""
+        task = self.loop.create_task(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def run_blocking(self, function, *args):
+        """Run blocking work on an executor thread without stalling the loop"""
+        return await self.loop.run_in_executor(self.executor, function, *args)
+
+    def call_soon_threadsafe(self, callback, *args):
+        """Schedule a callback on the loop from any thread; does nothing when no loop is running"""
+        loop = self.loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(callback, *args)
+
+scheduler = Scheduler()
+
+async def next_events(timeout=None):
+    """Wait until input arrives, or until the timeout passes (returning no events)"""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        events = pygame.event.get()
+        if events:
+            return events
+        if deadline is not None and time.monotonic() >= deadline:
+            return []
+        await asyncio.sleep(UI_POLL_INTERVAL)  # Idle screens sleep instead of redrawing
+
+class FrameClock:
+    """asyncio version of pygame.time.Clock that yields to other tasks between frames"""
+
+    def __init__(self):
+        self._next_frame = None
+
+    async def tick(self, fps):
+        now = time.perf_counter()
+        if self._next_frame is None or now - self._next_frame > 1.0 / fps:
+            self._next_frame = now  # First frame, or fell behind; do not try to catch up
+        self._next_frame += 1.0 / fps
+        await asyncio.sleep(max(0.0, self._next_frame - now))
+
+def init_display():
+    """Open the game window and load fonts"""
+    global screen, font, small_font
+    with startup_timer("display"):
+        screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+        pygame.display.set_caption("Exercise Tracker Game")
+    with startup_timer("fonts"):
+        pygame.font.init()  # Initialize font system
+        font = pygame.font.Font(None, 36)  # Main font
+        small_font = pygame.font.Font(None, 24)  # Secondary font
 
 # Avatar assets (simple shapes for visualization)
 AVATAR_BASE = {
@@ -40,8 +215,7 @@ AVATAR_ITEMS = {
 
 # Screen dimensions
 SCREEN_WIDTH, SCREEN_HEIGHT = 800, 600
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Exercise Tracker Game")
+screen = None  # Game window, opened by init_display
 
 # Color definitions
 WHITE = (255, 255, 255)
@@ -51,71 +225,1200 @@ GREEN = (0, 255, 0)
 RED = (255, 0, 0)
 GOLD = (255, 215, 0)
 
-# Font settings
-font = pygame.font.Font(None, 36)  # Main font
-small_font = pygame.font.Font(None, 24)  # Secondary font
+# Font settings (loaded by init_display)
+font = None  # Main font
+small_font = None  # Secondary font
+TEXT_CACHE_SIZE = 512  # Rendered text surfaces kept by render_text
+
+class TextSurfaceCache:
+    """LRU cache of rendered text surfaces keyed by font, text, color and antialiasing"""
+
+    def __init__(self, maxsize=TEXT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._surfaces = OrderedDict()
+
+    def render(self, text_font, text, antialias, color):
+        """Return the rendered surface, rendering it only on a cache miss"""
+        key = (text_font, text, tuple(color), antialias)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self._surfaces.move_to_end(key)
+            return surface
+        
+        self.misses += 1
+        surface = text_font.render(text, antialias, color)
+        self._surfaces[key] = surface
+        if len(self._surfaces) > self.maxsize:
+            self._surfaces.popitem(last=False)  # Evict the least recently used surface
+        return surface
+
+    def stats(self):
+        """Describe the cache hit rate"""
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups * 100 if lookups else 0
+        return f"{self.hits} hits, {self.misses} misses ({hit_rate:.1f}% hit rate, {len(self._surfaces)} surfaces cached)"
+
+text_cache = TextSurfaceCache()
+
+def render_text(text_font, text, antialias, color):
+    """Render text through the shared surface cache; the result must not be modified"""
+    return text_cache.render(text_font, text, antialias, color)
 
 # Game state variables
 running = True  # Main game loop control
 webcam_active = False  # Webcam status
-coin_x, coin_y = 0.5, 0.5  # Normalized coin coordinates (0-1)
 coin_radius = 15  # Coin display size
-coins_collected = 0  # Coin collection counter
-squats_count = 0  # Squat counter
-is_squatting = False  # Current squat state
-was_squatting = False  # Previous squat state
 exercise_type = None  # Current exercise mode
 current_user = None  # Currently logged in user
 last_exercise_date = None  # Last exercise date tracking
-squat_state = "standing"  # Squat state machine
-walking_bursts = 0  # Walking burst counter
-walking_state = "Standing"  # Current walking state
-last_walking_state = "Standing"  # Previous walking state
-center_history = []  # Movement tracking history
-still_counter = 0  # Stationary frame counter
 background_music_playing = True  # Music playback state
 music_file = "background_music.mp3"  # Music file path
-sit_count = 0  # Chair sit counter
-calibrated = False  # Posture calibration status
-initial_leg_height = None  # Baseline leg position
-is_sitting = False  # Current sitting state
-was_sitting = False  # Previous sitting state
-posture_status = "Calibrating..."  # Posture feedback message
+MUSIC_READY_EVENT = pygame.USEREVENT + 1  # Posted once the music task has loaded the music
+
+# Exercise state shared between the webcam pipeline and the game screens.
+# The pipeline publishes a new immutable snapshot after every detected frame
+# and the screens read whichever snapshot is newest, so neither side locks.
+ExerciseSnapshot = namedtuple("ExerciseSnapshot", [
+    "count",  # Coins, squats, walking bursts or chair sits so far
+    "status",  # Feedback text, e.g. "Walking" or "Calibrating..."
+    "active",  # Currently squatting or sitting
+    "coin_x", "coin_y",  # Normalized coin coordinates (0-1)
+    "progress",  # Squat goal progress in percent
+    "cadence",  # Walking steps per minute
+    "frame",  # Number of detected frames behind this snapshot
+])
+
+class StateChannel:
+    """Single-slot channel holding the latest snapshot; one writer, any number of readers"""
+
+    def __init__(self, snapshot):
+        self._snapshot = snapshot
+
+    def publish(self, snapshot):
+        """Replace the current snapshot; rebinding one reference is atomic"""
+        self._snapshot = snapshot
+
+    def latest(self):
+        """Newest published snapshot, never partially updated"""
+        return self._snapshot
+
+exercise_state = StateChannel(ExerciseSnapshot(0, "Standing", False, 0.5, 0.5, 0, 0.0, 0))
 
 # User data file path
 USER_DATA_FILE = "user_data.json"
+USER_DATA_LOG_FILE = "user_data.log"  # Append-only log of changes since the last snapshot
+LOG_COMPACT_THRESHOLD = 500  # Logged events before the log is folded into the snapshot
+PERSIST_FLUSH_INTERVAL = 2.0  # Seconds changes are coalesced before being written
+PERSIST_FSYNC = "snapshot"  # When to fsync: "always", "snapshot" or "never"
+HISTORY_COLUMNS_FILE = "user_history.bin"  # Columnar copy of exercise histories, written with each snapshot
+USER_SCHEMA_VERSION = 3  # Version of the user record layout, see USER_MIGRATIONS
+
+# Import/export configuration
+IMPORT_BATCH_SIZE = 1000  # Records validated and written together
+IMPORT_ERRORS_FILE = "import_errors.jsonl"  # Rejected records with their problems, one JSON object per line
+JSON_READ_CHUNK = 1 << 16  # Characters read at a time when parsing JSON files incrementally
+JSON_TOKEN_LOOKAHEAD = 10  # A parse error this close to the end of the buffer may be a token cut off by the chunk boundary
+
+class SessionStore:
+    """JSON snapshot of all users plus an append-only log of small change events"""
+
+    def __init__(self, snapshot_path, log_path, compact_threshold=LOG_COMPACT_THRESHOLD, fsync=PERSIST_FSYNC):
+        self.snapshot_path = snapshot_path
+        self.log_path = log_path
+        self.compact_threshold = compact_threshold
+        self.fsync = fsync
+        self._log_file = None
+        self._log_events = 0  # Events appended since the last snapshot
+        self.replayed_users = set()  # Users changed by log events since the snapshot
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Read the snapshot and replay any logged events on top of it"""
+        try:
+            with open(self.snapshot_path, "r") as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            data = {}
+        
+        self._log_events = 0
+        self.replayed_users = set()
+        complete = 0  # Bytes up to the end of the last intact event
+        for event, complete in self.read_events():
+            apply_user_event(data, event)
+            self.replayed_users.add(event["user"])
+            self._log_events += 1
+        
+        # Cut a torn tail off so the next append does not get glued onto the fragment
+        try:
+            if os.path.getsize(self.log_path) > complete:
+                with open(self.log_path, "rb+") as file:
+                    file.truncate(complete)
+        except FileNotFoundError:
+            pass
+        
+        return data
+
+    def read_events(self):
+        """Yield (event, end offset) for each intact logged event, stopping at a torn write"""
+        try:
+            with open(self.log_path, "rb") as file:
+                end = 0
+                for line in file:
+                    # Appends write the newline in the same write, so a line without one is torn
+                    if not line.endswith(b"\n"):
+                        return
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        return
+                    end += len(line)
+                    yield event, end
+        except FileNotFoundError:
+            return
+
+    def append(self, event):
+        """Append one event to the log"""
+        self.append_lines([json.dumps(event, separators=(",", ":"))])
+
+    def append_lines(self, lines):
+        """Append already serialized events to the log in one write"""
+        with self._lock:
+            if self._log_file is None:
+                self._log_file = open(self.log_path, "a")
+            self._log_file.write("".join(line + "\n" for line in lines))
+            self._log_file.flush()
+            if self.fsync == "always":
+                os.fsync(self._log_file.fileno())
+            self._log_events += len(lines)
+
+    def needs_compaction(self):
+        """Check whether the log has grown past the compaction threshold"""
+        return self._log_events >= self.compact_threshold
+
+    def compact(self, data):
+        """Write a full snapshot atomically and start a fresh log"""
+        self.write_snapshot(json.dumps(data, indent=4))
+
+    def write_snapshot(self, text):
+        """Atomically replace the snapshot with serialized data and start a fresh log"""
+        self.write_snapshot_chunks([text])
+
+    def write_snapshot_chunks(self, chunks):
+        """Like write_snapshot, but the serialized data is written piece by piece as it is produced"""
+        with self._lock:
+            temp_path = self.snapshot_path + ".tmp"
+            try:
+                with open(temp_path, "w") as file:
+                    for chunk in chunks:
+                        file.write(chunk)
+                    file.flush()
+                    if self.fsync != "never":
+                        os.fsync(file.fileno())
+                os.replace(temp_path, self.snapshot_path)  # Readers never see a half-written snapshot
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)  # Producing the chunks failed; the old snapshot stays
+            
+            # Everything in the log is now part of the snapshot
+            if self._log_file is not None:
+                self._log_file.close()
+            self._log_file = open(self.log_path, "w")
+            self._log_events = 0
+
+    def close(self):
+        """Close the log file"""
+        with self._lock:
+            if self._log_file is not None:
+                self._log_file.close()
+                self._log_file = None
+
+def apply_user_event(data, event):
+    """Apply one logged change event to the user data"""
+    op = event["op"]
+    user = event["user"]
+    
+    if op == "put":  # Replace a whole user record
+        data[user] = event["value"]
+    elif op == "delete":  # Remove a user
+        data.pop(user, None)
+    elif user in data:
+        # Field-level events address a value inside the user record
+        target = data[user]
+        *parents, key = event["path"]
+        for part in parents:
+            target = target.setdefault(part, {})
+        if op == "set":
+            target[key] = event["value"]
+        elif op == "inc":
+            target[key] = target.get(key, 0) + event["value"]
+
+class PersistenceService:
+    """Write-behind flusher that saves changed users from a scheduler task"""
+
+    def __init__(self, store, flush_interval=PERSIST_FLUSH_INTERVAL):
+        self.store = store
+        self.flush_interval = flush_interval
+        self._dirty_users = set()  # Users whose whole record must be rewritten
+        self._pending_events = {}  # Field-level events keyed by (user, path)
+        self._snapshot_requested = False
+        self._condition = threading.Condition()  # Guards the pending changes, which any thread may add
+        self._flush_lock = threading.Lock()  # Keeps the task's flushes and the final flush apart
+        self._wakeup = None  # asyncio.Event set when changes arrive
+        self._task = None
+
+    def mark_dirty(self, user=None):
+        """Schedule a user's record (or with no user, a full snapshot) to be saved"""
+        with self._condition:
+            if user is None:
+                self._snapshot_requested = True
+            else:
+                self._dirty_users.add(user)
+            self._wake()
+
+    def queue_event(self, event):
+        """Schedule a field-level event, coalescing repeated changes to one field"""
+        key = (event["user"], tuple(event["path"]))
+        with self._condition:
+            previous = self._pending_events.get(key)
+            if previous is not None and event["op"] == "inc" and previous["op"] in ("inc", "set"):
+                event = dict(previous, value=previous["value"] + event["value"])
+            self._pending_events[key] = event
+            self._wake()
+
+    def _wake(self):
+        if self._wakeup is not None:
+            scheduler.call_soon_threadsafe(self._wakeup.set)
+
+    def start(self):
+        """Run the flusher as a scheduler task; without it changes are written by stop()"""
+        self._wakeup = asyncio.Event()
+        self._task = scheduler.spawn(self._run())
+
+    async def _run(self):
+        """Flusher task: wait for changes, let them settle, then write them off the loop"""
+        while True:
+            await self._wakeup.wait()
+            # Debounce so a burst of changes becomes one write
+            await asyncio.sleep(self.flush_interval)
+            self._wakeup.clear()
+            await scheduler.run_blocking(self.flush)
+
+    def flush(self):
+        """Write all pending changes now"""
+        with self._flush_lock:
+            self._flush()
+
+    def _flush(self):
+        # Serialize under the data lock, write to disk outside it. Taking the
+        # pending changes under the same lock keeps them in step with user_data.
+        with data_lock:
+            with self._condition:
+                dirty_users = self._dirty_users
+                pending_events = self._pending_events
+                snapshot_requested = self._snapshot_requested
+                self._dirty_users = set()
+                self._pending_events = {}
+                self._snapshot_requested = False
+            
+            if snapshot_requested or self.store.needs_compaction():
+                snapshot = json.dumps(user_data, indent=4)
+                history_columns.detach()  # The column file is about to be replaced
+                history_bytes = history_columns.to_bytes()
+            else:
+                snapshot = None
+                lines = []
+                for user in dirty_users:
+                    if user in user_data:
+                        lines.append(json.dumps({"op": "put", "user": user, "value": user_data[user]}, separators=(",", ":")))
+                    else:
+                        lines.append(json.dumps({"op": "delete", "user": user}, separators=(",", ":")))
+                # A rewritten record already contains its field-level changes
+                for (user, _), event in pending_events.items():
+                    if user not in dirty_users:
+                        lines.append(json.dumps(event, separators=(",", ":")))
+        
+        flush_start = time.perf_counter()
+        if snapshot is not None:
+            self.store.write_snapshot(snapshot)
+            history_columns.write(HISTORY_COLUMNS_FILE, history_bytes, self.store.fsync)
+        elif lines:
+            self.store.append_lines(lines)
+        pipeline_metrics.record("flush", time.perf_counter() - flush_start)
+
+    def stop(self):
+        """Stop the flusher, then write everything as a final snapshot"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+            self._wakeup = None
+        with self._condition:
+            self._snapshot_requested = True
+        self.flush()  # Waits for a flush still running on the executor
+        self.store.close()
+
+user_store = SessionStore(USER_DATA_FILE, USER_DATA_LOG_FILE)
+persistence = PersistenceService(user_store)
 
 def load_user_data():
-    """Load user data from JSON file with initialization checks"""
+    """Load user data from JSON file, upgrading records to the current schema"""
+    data = user_store.load()
+    for user in data:
+        try:
+            data[user] = migrate_user_record(data[user])
+        except ValueError as e:
+            print(f"User {user}: {e}")  # Kept as is; the game only reads fields it knows
+    return data
+
+def save_user_data(data, user=None):
+    """Schedule user data to be saved; with a user given only that user's record is written"""
+    global user_data_version
+    user_data_version += 1
+    persistence.mark_dirty(user)
+
+def log_user_event(user, op, path, value):
+    """Apply a field-level change to a user and schedule it to be logged"""
+    global user_data_version
+    event = {"op": op, "user": user, "path": list(path), "value": value}
+    apply_user_event(user_data, event)
+    user_data_version += 1
+    persistence.queue_event(event)
+
+# User data, loaded by main
+user_data = {}
+user_data_version = 0  # Bumped on every change, used to invalidate cached graphs
+
+class StatsIndex:
+    """Running totals and day/week/month rollups of each user's exercise history"""
+
+    def __init__(self):
+        self._stats = {}  # user -> exercise -> {"total": n, "day": {...}, "week": {...}, "month": {...}}
+
+    def rebuild(self, data):
+        """Build the index from scratch with one pass over all histories"""
+        self._stats = {}
+        for user in data:
+            self.rebuild_user(data, user)
+
+    def rebuild_user(self, data, user):
+        """Rebuild one user's entries from their histories"""
+        self._stats.pop(user, None)
+        for exercise, field in HISTORY_FIELDS.items():
+            for date, count in data[user].get(field, {}).items():
+                if is_iso_date(date):  # The same check the history columns and imports use
+                    self._add(user, exercise, date, count)
+                else:
+                    print(f"User {user}: skipping {field} entry {date!r}, expected a YYYY-MM-DD date")
+
+    def remove_user(self, user):
+        """Drop a deleted user"""
+        self._stats.pop(user, None)
+
+    def record(self, user, exercise, date, old_count, new_count):
+        """Apply a change of one day's count"""
+        if new_count != old_count:
+            self._add(user, exercise, date, new_count - old_count)
+
+    def _add(self, user, exercise, date, delta):
+        stats = self._exercise_stats(user, exercise)
+        year, week, _ = datetime.strptime(date, "%Y-%m-%d").isocalendar()
+        stats["total"] += delta
+        for period, key in (("day", date), ("week", f"{year}-W{week:02d}"), ("month", date[:7])):
+            stats[period][key] = stats[period].get(key, 0) + delta
+
+    def _exercise_stats(self, user, exercise):
+        user_stats = self._stats.setdefault(user, {})
+        if exercise not in user_stats:
+            user_stats[exercise] = {"total": 0, "day": {}, "week": {}, "month": {}}
+        return user_stats[exercise]
+
+    def total(self, user, exercise):
+        """All-time count of an exercise for a user"""
+        return self._stats.get(user, {}).get(exercise, {}).get("total", 0)
+
+    def rollup(self, user, exercise, period):
+        """Counts per "day", "week" (YYYY-Www) or "month" (YYYY-MM) for a user"""
+        return dict(self._stats.get(user, {}).get(exercise, {}).get(period, {}))
+
+stats_index = StatsIndex()
+
+class HistoryColumns:
+    """Exercise histories as sorted NumPy columns of epoch days and counts per user and exercise"""
+
+    MAGIC = b"FQHC"
+    VERSION = 1
+
+    def __init__(self):
+        self._series = {}  # (user, exercise) -> (days int32 array, counts int32 array)
+
+    @staticmethod
+    def to_day(date):
+        """Convert a date or "YYYY-MM-DD" string to days since 1970-01-01"""
+        return int(np.datetime64(date, "D").astype(np.int64))
+
+    @staticmethod
+    def to_date(day):
+        """Convert days since 1970-01-01 back to a "YYYY-MM-DD" string"""
+        return str(np.datetime64(int(day), "D"))
+
+    def build(self, data):
+        """Convert every user's history dicts to columns"""
+        self._series = {}
+        for user in data:
+            self.build_user(data, user)
+
+    def build_user(self, data, user):
+        """Convert one user's history dicts to columns"""
+        self.remove_user(user)
+        for exercise, field in HISTORY_FIELDS.items():
+            history = data[user].get(field, {})
+            dates = [date for date in history if is_iso_date(date)]
+            for date in history.keys() - set(dates):
+                print(f"User {user}: skipping {field} entry {date!r}, expected a YYYY-MM-DD date")
+            if not dates:
+                continue
+            days = np.array(dates, dtype="datetime64[D]").astype(np.int32)
+            counts = np.array([history[date] for date in dates], dtype=np.int32)
+            order = np.argsort(days)
+            self._series[(user, exercise)] = (days[order], counts[order])
+
+    def remove_user(self, user):
+        """Drop all series of a user"""
+        for key in [key for key in self._series if key[0] == user]:
+            del self._series[key]
+
+    def update(self, user, exercise, date, count):
+        """Set one day's count"""
+        day = self.to_day(date)
+        days, counts = self.series(user, exercise)
+        i = int(np.searchsorted(days, day))
+        if i < len(days) and days[i] == day:
+            counts = np.array(counts)  # Memory-mapped columns are read-only
+            counts[i] = count
+        else:
+            days = np.insert(days, i, day)
+            counts = np.insert(counts, i, count)
+        self._series[(user, exercise)] = (days, counts)
+
+    def series(self, user, exercise):
+        """All (days, counts) of a user's exercise, sorted by day"""
+        empty = np.zeros(0, dtype=np.int32)
+        return self._series.get((user, exercise), (empty, empty))
+
+    def query(self, user, exercise, start=None, end=None):
+        """(days, counts) between two dates, inclusive"""
+        days, counts = self.series(user, exercise)
+        lo = 0 if start is None else int(np.searchsorted(days, self.to_day(start), side="left"))
+        hi = len(days) if end is None else int(np.searchsorted(days, self.to_day(end), side="right"))
+        return days[lo:hi], counts[lo:hi]
+
+    def resample(self, user, exercise, period="week", start=None, end=None):
+        """Sum counts per "week" (starting Monday) or "month"; returns (period start days, sums)"""
+        days, counts = self.query(user, exercise, start, end)
+        if len(days) == 0:
+            return days, counts
+        if period == "week":
+            buckets = days - (days + 3) % 7  # 1970-01-01 was a Thursday
+        elif period == "month":
+            buckets = days.astype("datetime64[D]").astype("datetime64[M]").astype("datetime64[D]").astype(np.int32)
+        else:
+            raise ValueError(f"Unknown period: {period}")
+        starts = np.flatnonzero(np.diff(buckets, prepend=buckets[0] - 1))
+        return buckets[starts], np.add.reduceat(counts, starts)
+
+    def streaks(self, user, exercise, today=None):
+        """(current, longest) run of consecutive days with at least one rep"""
+        days, counts = self.series(user, exercise)
+        active = days[counts > 0]
+        if len(active) == 0:
+            return 0, 0
+        
+        # Runs of consecutive days are split wherever the gap is more than a day
+        breaks = np.flatnonzero(np.diff(active) != 1) + 1
+        run_starts = np.concatenate(([0], breaks))
+        run_lengths = np.diff(np.concatenate((run_starts, [len(active)])))
+        
+        # The current streak may end today or yesterday
+        today = self.to_day(today if today is not None else datetime.now().strftime("%Y-%m-%d"))
+        current = int(run_lengths[-1]) if today - active[-1] <= 1 else 0
+        return current, int(run_lengths.max())
+
+    def to_bytes(self):
+        """Serialize all columns: magic, version, JSON index length, JSON index, days, counts"""
+        index = []
+        offset = 0
+        for (user, exercise), (days, _) in self._series.items():
+            index.append([user, exercise, offset, len(days)])
+            offset += len(days)
+        header = json.dumps(index).encode()
+        days = np.concatenate([days for days, _ in self._series.values()] or [np.zeros(0)]).astype("<i4")
+        counts = np.concatenate([counts for _, counts in self._series.values()] or [np.zeros(0)]).astype("<i4")
+        
+        # Pad the index so the columns start 4-byte aligned
+        header += b" " * (-(len(self.MAGIC) + 8 + len(header)) % 4)
+        prefix = self.MAGIC + np.array([self.VERSION, len(header)], dtype="<u4").tobytes()
+        return prefix + header + days.tobytes() + counts.tobytes()
+
+    def detach(self):
+        """Copy memory-mapped columns into memory so the file they were loaded from can be replaced"""
+        # Windows refuses to replace a file that is still mapped; the last slice
+        # dropped here closes the mapping
+        self._series = {key: tuple(np.array(column) if isinstance(column, np.memmap) else column for column in series)
+                        for key, series in self._series.items()}
+
+    def write(self, path, data_bytes, fsync=PERSIST_FSYNC):
+        """Atomically write serialized columns; call detach() first if they were loaded from path"""
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as file:
+            file.write(data_bytes)
+            file.flush()
+            if fsync != "never":
+                os.fsync(file.fileno())
+        os.replace(temp_path, path)
+
+    def load(self, path):
+        """Memory-map columns written by write()"""
+        with open(path, "rb") as file:
+            magic = file.read(len(self.MAGIC))
+            version, header_length = np.frombuffer(file.read(8), dtype="<u4")
+            if magic != self.MAGIC or version != self.VERSION:
+                raise ValueError(f"{path} is not a history column file")
+            index = json.loads(file.read(header_length))
+        
+        total = sum(length for _, _, _, length in index)
+        self._series = {}
+        if total == 0:
+            return
+        data_offset = len(self.MAGIC) + 8 + int(header_length)
+        days = np.memmap(path, dtype="<i4", mode="r", offset=data_offset, shape=(total,))
+        counts = np.memmap(path, dtype="<i4", mode="r", offset=data_offset + 4 * total, shape=(total,))
+        for user, exercise, offset, length in index:
+            self._series[(user, exercise)] = (days[offset:offset + length], counts[offset:offset + length])
+
+history_columns = HistoryColumns()
+
+def load_history_columns(data):
+    """Memory-map the history columns if they match the snapshot, otherwise rebuild them"""
+    try:
+        up_to_date = os.path.getmtime(HISTORY_COLUMNS_FILE) >= os.path.getmtime(USER_DATA_FILE)
+    except OSError:
+        up_to_date = False
+    
+    if up_to_date:
+        try:
+            history_columns.load(HISTORY_COLUMNS_FILE)
+        except (ValueError, OSError):
+            up_to_date = False
+    if not up_to_date:
+        history_columns.build(data)
+        return
+    
+    # Users changed by the replayed log are newer than the column file
+    for user in user_store.replayed_users:
+        if user in data:
+            history_columns.build_user(data, user)
+        else:
+            history_columns.remove_user(user)
+
+def record_session(user, exercise, date, count):
+    """Store an exercise count in the user's history and update the stats index"""
+    history = user_data[user].setdefault(HISTORY_FIELDS[exercise], {})
+    stats_index.record(user, exercise, date, history.get(date, 0), count)
+    history_columns.update(user, exercise, date, count)
+    history[date] = count
+
+# User record schema
+def migrate_v1_user(record):
+    """Version 1 records predate versioning and may miss fields the game adds on first use"""
+    for field in HISTORY_FIELDS.values():
+        record.setdefault(field, {})
+    record.setdefault("inventory", [])
+    record.setdefault("last_exercise_date", None)
+    record.setdefault("coins", 0)
+    record.setdefault("progress", 0)
+    return record
+
+def migrate_v2_user(record):
+    """Version 2 and older records store the age as the text typed at registration"""
+    age = record.get("age")
+    if isinstance(age, str) and age.strip().isdecimal():
+        record["age"] = int(age)
+    return record
+
+# Upgrade from each schema version to the next
+USER_MIGRATIONS = {
+    1: migrate_v1_user,
+    2: migrate_v2_user,
+}
+
+def migrate_user_record(record):
+    """Upgrade a user record to USER_SCHEMA_VERSION; unversioned records are version 1"""
+    version = record.get("schema_version", 1)
+    if not isinstance(version, int) or version < 1 or version > USER_SCHEMA_VERSION:
+        raise ValueError(f"unsupported schema version {version!r}")
+    while version < USER_SCHEMA_VERSION:
+        record = USER_MIGRATIONS[version](record)
+        version += 1
+    record["schema_version"] = version
+    return record
+
+def is_count(value, maximum=None):
+    """Whether a value is a non-negative whole number (bools are not), optionally capped"""
+    return (isinstance(value, int) and not isinstance(value, bool) and value >= 0
+            and (maximum is None or value <= maximum))
+
+def user_record_problems(user, record):
+    """Problems with one migrated record's fields; history dates are checked per batch"""
+    problems = []
+    if not isinstance(user, str) or not user:
+        problems.append("user name must be a non-empty string")
+    if not is_count(record.get("age"), 150):
+        problems.append("age must be a whole number from 0 to 150")
+    if not is_count(record.get("coins")):
+        problems.append("coins must be a non-negative whole number")
+    progress = record.get("progress")
+    if not isinstance(progress, (int, float)) or isinstance(progress, bool) or not 0 <= progress <= 100:
+        problems.append("progress must be a number from 0 to 100")
+    last_date = record.get("last_exercise_date")
+    if last_date is not None and not isinstance(last_date, str):
+        problems.append("last_exercise_date must be a date or empty")
+    inventory = record.get("inventory")
+    if not isinstance(inventory, list) or not all(isinstance(item, str) for item in inventory):
+        problems.append("inventory must be a list of item names")
+    for field in HISTORY_FIELDS.values():
+        history = record.get(field, {})
+        if not isinstance(history, dict):
+            problems.append(f"{field} must be an object of date: count")
+        elif not all(is_count(count) for count in history.values()):
+            problems.append(f"{field} counts must be non-negative whole numbers")
+    return problems
+
+def validate_user_batch(batch):
+    """Migrate and check a batch of (source, user, record, problem) entries; returns (valid, rejected)"""
+    checked = []
+    for source, user, record, problem in batch:
+        problems = [problem] if problem is not None else []
+        if not problems:
+            try:
+                record = migrate_user_record(record)
+                problems = user_record_problems(user, record)
+            except ValueError as e:
+                problems = [str(e)]
+        checked.append((source, user, record, problems))
+    
+    # Dates of the whole batch are parsed in one go with the same conversion the history columns use
+    dates = []
+    owners = []
+    for i, (_, _, record, problems) in enumerate(checked):
+        if problems:
+            continue
+        for field in HISTORY_FIELDS.values():
+            history = record.get(field, {})
+            dates.extend(history)
+            owners.extend([i] * len(history))
+        if record.get("last_exercise_date") is not None:
+            dates.append(record["last_exercise_date"])
+            owners.append(i)
+    if dates:
+        try:
+            parsed = np.datetime_as_string(np.array(dates, dtype="datetime64[D]"))
+            bad = np.flatnonzero(parsed != np.array(dates))  # Rejects partial dates such as "2024-05"
+        except ValueError:
+            bad = [j for j, date in enumerate(dates) if not is_iso_date(date)]
+        for j in bad:
+            checked[owners[j]][3].append(f"invalid date {dates[j]!r}, expected YYYY-MM-DD")
+    
+    valid = [(user, record) for _, user, record, problems in checked if not problems]
+    rejected = [(source, user, problems) for source, user, _, problems in checked if problems]
+    return valid, rejected
+
+def is_iso_date(date):
+    """Whether a string is a YYYY-MM-DD date"""
+    try:
+        return str(np.datetime64(date, "D")) == date
+    except ValueError:
+        return False
+
+# Bulk import/export of user records
+CSV_SCALAR_COLUMNS = ["user", "last_exercise_date"]  # Written as plain text
+CSV_JSON_COLUMNS = ["schema_version", "age", "coins", "progress", "inventory"]  # Written as JSON values
+
+def csv_columns():
+    """Column order of exported CSV files; unknown fields go to the "extra" column"""
+    return CSV_SCALAR_COLUMNS + CSV_JSON_COLUMNS + list(HISTORY_FIELDS.values()) + ["extra"]
+
+def user_file_format(path, file_format=None):
+    """Format of an import/export file: given explicitly, or from its extension"""
+    if file_format is not None:
+        return file_format
+    extension = os.path.splitext(path)[1].lower()
+    return {".csv": "csv", ".json": "json"}.get(extension, "ndjson")
+
+def iter_json_object(file, chunk_size=JSON_READ_CHUNK):
+    """Yield the (key, value) members of a top-level JSON object, reading the file in chunks"""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    consumed = 0  # Characters dropped from the front of the buffer, for error offsets
+    
+    def read_more():
+        # Only the unparsed tail is kept, so memory is bounded by the largest member
+        nonlocal buffer, position, consumed
+        chunk = file.read(chunk_size)
+        consumed += position
+        buffer = buffer[position:] + chunk
+        position = 0
+        return bool(chunk)
+    
+    def error(message):
+        return ValueError(f"{message} at character {consumed + position}")
+    
+    def next_character():
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n":
+                position += 1
+            if position < len(buffer):
+                return buffer[position]
+            if not read_more():
+                return ""
+    
+    def next_value():
+        nonlocal position
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError as e:
+                # Only a value cut off by the end of the buffer can be completed by reading
+                # on; any other error is reported without reading the rest of the file
+                truncated = e.msg.startswith("Unterminated string") or len(buffer) - e.pos <= JSON_TOKEN_LOOKAHEAD
+                if truncated and read_more():
+                    continue
+                raise ValueError(f"invalid JSON at character {consumed + e.pos}: {e.msg}") from None
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(buffer) and read_more():
+                continue
+            position = end
+            return value
+    
+    if next_character() != "{":
+        raise error("expected a JSON object of users")
+    position += 1
+    if next_character() == "}":
+        return
+    while True:
+        next_character()
+        key = next_value()
+        if next_character() != ":":
+            raise error(f"expected ':' after {key!r}")
+        position += 1
+        next_character()
+        yield key, next_value()
+        separator = next_character()
+        if separator == "}":
+            return
+        if separator != ",":
+            raise error(f"expected ',' or '}}' after {key!r}")
+        position += 1
+
+def read_user_records(path, file_format=None):
+    """Yield (source, user, record, problem) for each record of an import file, one at a time"""
+    file_format = user_file_format(path, file_format)
+    with open(path, "r", newline="" if file_format == "csv" else None) as file:
+        if file_format == "json":
+            # Same layout as the user data snapshot
+            for number, (user, record) in enumerate(iter_json_object(file), 1):
+                problem = None if isinstance(record, dict) else "record must be a JSON object"
+                yield f"{path}:{number}", user, record, problem
+        elif file_format == "csv":
+            reader = csv.DictReader(file)
+            for row in reader:
+                source = f"{path}:{reader.line_num}"
+                try:
+                    record = json.loads(row.pop("extra", None) or "{}")
+                    user = row.pop("user", None)
+                    for column, text in row.items():
+                        if column is None:
+                            continue  # Cells beyond the header
+                        if column in CSV_SCALAR_COLUMNS:
+                            record[column] = text or None
+                        elif text:
+                            record[column] = json.loads(text)  # Blank cells leave the field to migration
+                    yield source, user, record, None
+                except (json.JSONDecodeError, AttributeError, TypeError) as e:
+                    yield source, None, None, f"unreadable row: {e}"
+        else:
+            for number, line in enumerate(file, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield f"{path}:{number}", None, None, f"unreadable line: {e}"
+                    continue
+                if isinstance(record, dict):
+                    yield f"{path}:{number}", record.pop("user", None), record, None
+                else:
+                    yield f"{path}:{number}", None, None, "record must be a JSON object"
+
+def iter_store_users(store):
+    """Yield (user, record) from a store's snapshot with its log applied, one user at a time"""
+    # The game compacts the log every LOG_COMPACT_THRESHOLD events and imports write a
+    # new snapshot, so the log is small enough to group in memory
+    events = {}
+    for event, _ in store.read_events():  # Same events the game replays on load
+        events.setdefault(event["user"], []).append(event)
+    
+    def with_events(user, record):
+        data = {} if record is None else {user: record}
+        for event in events.pop(user, []):
+            apply_user_event(data, event)
+        return data.get(user)
+    
     try:
-        with open(USER_DATA_FILE, "r") as file:
-            data = json.load(file)
-            # Ensure required fields exist for all users
-            for user in data:
-                if 'squats_history' not in data[user]:
-                    data[user]['squats_history'] = {}
-            return data
+        with open(store.snapshot_path, "r") as file:
+            for user, record in iter_json_object(file):
+                record = with_events(user, record)
+                if record is not None:
+                    yield user, record
     except FileNotFoundError:
-        return {}  # Return empty dict if file doesn't exist
+        pass
+    
+    # Users created since the snapshot
+    for user in list(events):
+        record = with_events(user, None)
+        if record is not None:
+            yield user, record
 
-def save_user_data(data):
-    """Save user data to JSON file"""
-    with open(USER_DATA_FILE, "w") as file:
-        json.dump(data, file, indent=4)
+def snapshot_chunks(records):
+    """Serialize (user, record) pairs in the snapshot's indented JSON layout, one user at a time"""
+    empty = True
+    for user, record in records:
+        yield ("{\n" if empty else ",\n") + "    " + json.dumps(user) + ": " + json.dumps(record, indent=4).replace("\n", "\n    ")
+        empty = False
+    yield "{}" if empty else "\n}"
 
-# Load existing user data
-user_data = load_user_data()
+def export_users(path, file_format=None, store=None):
+    """Stream every user record, upgraded to the current schema, to an NDJSON, CSV or JSON file"""
+    store = user_store if store is None else store
+    file_format = user_file_format(path, file_format)
+    count = 0
+    
+    def counted(records):
+        nonlocal count
+        for user, record in records:
+            try:
+                record = migrate_user_record(record)
+            except ValueError as e:
+                print(f"Skipping user {user}: {e}")
+                continue
+            count += 1
+            yield user, record
+    
+    records = iter_store_users(store)
+    
+    with open(path, "w", newline="" if file_format == "csv" else None) as file:
+        if file_format == "json":
+            for chunk in snapshot_chunks(counted(records)):
+                file.write(chunk)
+        elif file_format == "csv":
+            columns = csv_columns()
+            writer = csv.DictWriter(file, columns)
+            writer.writeheader()
+            for user, record in counted(records):
+                row = {"user": user}
+                extra = {}
+                for field, value in record.items():
+                    if field in CSV_SCALAR_COLUMNS:
+                        row[field] = "" if value is None else value
+                    elif field in columns:
+                        row[field] = json.dumps(value, separators=(",", ":"))
+                    else:
+                        extra[field] = value
+                row["extra"] = json.dumps(extra, separators=(",", ":")) if extra else ""
+                writer.writerow(row)
+        else:
+            for user, record in counted(records):
+                file.write(json.dumps({"user": user, **record}, separators=(",", ":")) + "\n")
+    
+    print(f"Exported {count} users to {path} ({file_format}, schema version {USER_SCHEMA_VERSION})")
+    return count
 
-# Initialize MediaPipe pose estimation
-mp_pose = mp.solutions.pose
-pose = mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5)
-mp_drawing = mp.solutions.drawing_utils  # For drawing pose landmarks
+def import_users(paths, file_format=None, batch_size=IMPORT_BATCH_SIZE, errors_file=IMPORT_ERRORS_FILE, store=None):
+    """Validate user records from import files in batches and merge the valid ones into the store.
+    
+    Valid records are staged in an on-disk SQLite table keyed by user name, so a later record
+    of the same user replaces the earlier one without an in-memory index and memory stays
+    bounded by the batch size. The staged users are then merged with the stored users into a
+    new snapshot one user at a time; imported users replace any user with the same name.
+    Nothing in the store changes until the whole import has been read.
+    """
+    store = user_store if store is None else store
+    staging_path = store.snapshot_path + ".import"
+    if os.path.exists(staging_path):
+        os.remove(staging_path)  # Left over from an interrupted import
+    imported = rejected = 0
+    
+    staging = sqlite3.connect(staging_path)
+    staging.execute("PRAGMA journal_mode = OFF")  # Scratch data, thrown away if the import fails
+    staging.execute("PRAGMA synchronous = OFF")
+    staging.execute("CREATE TABLE users (name TEXT PRIMARY KEY, record TEXT NOT NULL)")
+    
+    def merged_users():
+        for user, record in iter_store_users(store):
+            if staging.execute("SELECT 1 FROM users WHERE name = ?", (user,)).fetchone() is None:
+                yield user, record
+        for user, record in staging.execute("SELECT name, record FROM users ORDER BY rowid"):
+            yield user, json.loads(record)
+    
+    try:
+        with open(errors_file, "w") as errors:
+            def write_batch(batch):
+                nonlocal imported, rejected
+                valid, invalid = validate_user_batch(batch)
+                staging.executemany("INSERT OR REPLACE INTO users VALUES (?, ?)",
+                                    [(user, json.dumps(record, separators=(",", ":"))) for user, record in valid])
+                for source, user, problems in invalid:
+                    errors.write(json.dumps({"source": source, "user": user, "problems": problems}) + "\n")
+                imported += len(valid)
+                rejected += len(invalid)
+            
+            for path in paths:
+                batch = []
+                for entry in read_user_records(path, file_format):
+                    batch.append(entry)
+                    if len(batch) >= batch_size:
+                        write_batch(batch)
+                        batch = []
+                if batch:
+                    write_batch(batch)
+                print(f"{path}: {imported} users imported, {rejected} rejected so far")
+        
+        if imported:
+            # The new snapshot also takes in the log, so the store is left compacted
+            store.write_snapshot_chunks(snapshot_chunks(merged_users()))
+    finally:
+        staging.close()
+        store.close()
+        os.remove(staging_path)
+    
+    print(f"Imported {imported} users, rejected {rejected}" + (f" (see {errors_file})" if rejected else ""))
+    return imported, rejected
+
+def migrate_user_store(store=None):
+    """Rewrite the snapshot with every record upgraded to the current schema, without loading all users"""
+    store = user_store if store is None else store
+    failed = 0
+    
+    def migrated_users():
+        nonlocal failed
+        for user, record in iter_store_users(store):
+            try:
+                record = migrate_user_record(record)
+            except ValueError as e:
+                print(f"User {user}: {e}")  # Kept as is, like load_user_data does
+                failed += 1
+            yield user, record
+    
+    try:
+        # The temporary snapshot is complete before the old one and the log are replaced
+        store.write_snapshot_chunks(snapshot_chunks(migrated_users()))
+    finally:
+        store.close()
+    print(f"Upgraded {store.snapshot_path} to schema version {USER_SCHEMA_VERSION}"
+          + (f", {failed} users could not be upgraded" if failed else ""))
+
+# MediaPipe pose estimation, loaded on first use
+mp_pose = None
+pose = None
+pose_models = {}  # Live pose models by model complexity
+
+def load_mediapipe():
+    """Import MediaPipe the first time it is needed"""
+    global mp_pose
+    if mp_pose is None:
+        with startup_timer("import mediapipe"):
+            import mediapipe as mp  # MediaPipe for pose estimation
+        mp_pose = mp.solutions.pose
+    return mp_pose
+
+def get_pose(model_complexity=1):
+    """Return the shared pose model of a complexity, building it on first use"""
+    global pose
+    model = pose_models.get(model_complexity)
+    if model is None:
+        load_mediapipe()
+        phase = "create pose model" if model_complexity == 1 else f"create pose model (complexity {model_complexity})"
+        with startup_timer(phase):
+            model = mp_pose.Pose(model_complexity=model_complexity,
+                                 min_detection_confidence=0.5, min_tracking_confidence=0.5)
+        pose_models[model_complexity] = model
+        if model_complexity == 1:
+            pose = model
+    return model
+
+def load_matplotlib():
+    """Import matplotlib's off-screen Agg renderer the first time a graph is opened"""
+    with startup_timer("import matplotlib"):
+        from matplotlib.figure import Figure  # For graph generation
+        from matplotlib.backends.backend_agg import FigureCanvasAgg  # Renders without a GUI window
+    return Figure, FigureCanvasAgg
 
 # Webcam capture object
 cap = None
+webcam_task = None  # Scheduler task running the webcam pipeline
+landmark_recorder = None  # Recorder for the current session's landmarks
+quality_controller = None  # Adaptive quality of the current session
+roi_tracker = None  # Crop region around the tracked person in the current session
+frame_pool = None  # Preallocated frame buffers of the current session
+target_fps = TARGET_FPS  # Overridden with --target-fps
+pipeline_active = False  # Pipeline stage loop control
+
+metrics_overlay = True  # Show pipeline metrics on the webcam window, toggled with 'm'
+
+# Readiness of the pipeline, shown during the countdown
+pipeline_status = {"camera": False, "model": False, "frames": 0, "person": False, "error": None}
+detection_active = False  # Exercise detection only runs once play begins
+
+class PipelineMetrics:
+    """Per-stage latency histograms, FPS, dropped frames and lock wait time of one session"""
+
+    def __init__(self, window=METRICS_WINDOW):
+        self._lock = threading.Lock()  # The capture, inference and display threads all record
+        self.window = window
+        self.samples = {}  # Stage -> recent latencies in seconds
+        self.totals = {}  # Stage -> [count, total seconds] over the whole session
+        self.lock_waits = deque(maxlen=window)  # Recent data_lock wait times in seconds
+        self.lock_wait_total = 0.0
+        self.lock_acquisitions = 0
+        self.frames_shown = 0
+        self.dropped_frames = 0
+        self.start_time = time.perf_counter()
+        self._frame_times = deque(maxlen=60)  # Display times used for the current FPS
+
+    def record(self, stage, seconds):
+        """Add one latency sample for a stage"""
+        with self._lock:
+            samples = self.samples.get(stage)
+            if samples is None:
+                samples = self.samples[stage] = deque(maxlen=self.window)
+                self.totals[stage] = [0, 0.0]
+            samples.append(seconds)
+            totals = self.totals[stage]
+            totals[0] += 1
+            totals[1] += seconds
+
+    @contextmanager
+    def timed(self, stage):
+        """Record how long the body of a with block takes"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def record_lock_wait(self, seconds):
+        """Add one data_lock acquisition"""
+        with self._lock:
+            self.lock_waits.append(seconds)
+            self.lock_wait_total += seconds
+            self.lock_acquisitions += 1
+
+    def frame_shown(self):
+        """Count a frame reaching the display"""
+        with self._lock:
+            self.frames_shown += 1
+            self._frame_times.append(time.perf_counter())
+
+    def fps(self):
+        """Frames per second over the last displayed frames"""
+        with self._lock:
+            frame_times = list(self._frame_times)
+        if len(frame_times) < 2:
+            return 0.0
+        elapsed = frame_times[-1] - frame_times[0]
+        return (len(frame_times) - 1) / elapsed if elapsed > 0 else 0.0
+
+    def _copy(self):
+        """Copies of the stage samples and totals and the lock waits, taken together"""
+        with self._lock:
+            samples = {stage: list(values) for stage, values in self.samples.items()}
+            totals = {stage: tuple(values) for stage, values in self.totals.items()}
+            return samples, totals, list(self.lock_waits), self.lock_wait_total, self.lock_acquisitions
+
+    @staticmethod
+    def _distribution(samples):
+        """p50/p95/p99/max of latency samples in milliseconds"""
+        if not samples:
+            return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+        values = np.fromiter(samples, dtype=np.float64) * 1000
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        return {"p50_ms": round(float(p50), 3), "p95_ms": round(float(p95), 3),
+                "p99_ms": round(float(p99), 3), "max_ms": round(float(values.max()), 3)}
+
+    def summary(self):
+        """All metrics of the session as a dict"""
+        duration = time.perf_counter() - self.start_time
+        samples, totals, lock_waits, lock_wait_total, lock_acquisitions = self._copy()
+        stages = {}
+        for stage, values in samples.items():
+            count, total = totals[stage]
+            stages[stage] = {"count": count, "mean_ms": round(total / count * 1000, 3), **self._distribution(values)}
+        return {
+            "duration_seconds": round(duration, 3),
+            "frames_shown": self.frames_shown,
+            "average_fps": round(self.frames_shown / duration, 2) if duration > 0 else 0.0,
+            "dropped_frames": self.dropped_frames,
+            "stages": stages,
+            "data_lock_wait": {"acquisitions": lock_acquisitions,
+                               "total_ms": round(lock_wait_total * 1000, 3),
+                               **self._distribution(lock_waits)},
+        }
+
+    def overlay_lines(self):
+        """Short text lines for the on-screen overlay"""
+        lines = [f"FPS: {self.fps():.1f}  Dropped: {self.dropped_frames}"]
+        samples, _, lock_waits, lock_wait_total, _ = self._copy()
+        for stage, values in samples.items():
+            stats = self._distribution(values[-200:])
+            lines.append(f"{stage}: p50 {stats['p50_ms']:.1f} p95 {stats['p95_ms']:.1f} p99 {stats['p99_ms']:.1f} ms")
+        lock_stats = self._distribution(lock_waits[-200:])
+        lines.append(f"data_lock wait: p95 {lock_stats['p95_ms']:.2f} ms, total {lock_wait_total * 1000:.0f} ms")
+        return lines
+
+    def dump(self, path, **extra):
+        """Write the session metrics, and any extra sections, to a JSON file"""
+        with open(path, "w") as file:
+            json.dump({**self.summary(), **extra}, file, indent=4)
+
+pipeline_metrics = PipelineMetrics()  # Metrics of the current webcam session
+
+class InstrumentedLock:
+    """threading.Lock that records how long callers wait to acquire it"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def acquire(self, blocking=True, timeout=-1):
+        start = time.perf_counter()
+        acquired = self._lock.acquire(blocking, timeout)
+        pipeline_metrics.record_lock_wait(time.perf_counter() - start)
+        return acquired
+
+    def release(self):
+        self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
 
 # Thread synchronization lock
-data_lock = threading.Lock()
+data_lock = InstrumentedLock()
 
 def calculate_angle(x1, y1, x2, y2, x3, y3):
     """Calculate angle between three points"""
@@ -143,7 +1446,513 @@ def get_current_edge(x, y):
     else:
         return "center"  # fallback
 
-def get_text_input(prompt):
+# Exercise detectors
+# MediaPipe pose landmark indices used by the detectors
+NUM_LANDMARKS = 33
+LEFT_SHOULDER, RIGHT_SHOULDER = 11, 12
+LEFT_WRIST, RIGHT_WRIST = 15, 16
+LEFT_HIP, RIGHT_HIP = 23, 24
+LEFT_KNEE, RIGHT_KNEE = 25, 26
+LEFT_ANKLE, RIGHT_ANKLE = 27, 28
+
+# Coin positions for the hand exercise, as returned by generate_edge_coin_position
+COIN_POSITIONS = {"left": (0.05, 0.5), "center": (0.5, 0.05), "right": (0.95, 0.5)}
+
+def landmarks_to_array(pose_landmarks):
+    """Convert MediaPipe pose landmarks to a (33, 4) array of x, y, z, visibility"""
+    return np.array([(lm.x, lm.y, lm.z, lm.visibility) for lm in pose_landmarks.landmark], dtype=np.float32)
+
+def joint_angles(first, middle, last):
+    """Vectorized calculate_angle over arrays of (x, y) points"""
+    angle = np.abs(np.degrees(np.arctan2(last[..., 1] - middle[..., 1], last[..., 0] - middle[..., 0])
+                              - np.arctan2(first[..., 1] - middle[..., 1], first[..., 0] - middle[..., 0])))
+    return np.where(angle <= 180, angle, 360 - angle)
+
+def frame_times(count, times, last_time):
+    """Timestamps in seconds for a sequence, continuing at NOMINAL_FRAME_RATE from last_time when none are given"""
+    if times is not None:
+        return np.asarray(times, dtype=np.float64).reshape(-1)
+    start = 0.0 if last_time is None else last_time + 1 / NOMINAL_FRAME_RATE
+    return start + np.arange(count) / NOMINAL_FRAME_RATE
+
+class LandmarkFilter:
+    """Temporal filter applied to landmarks before detection; this base class passes them through"""
+
+    def reset(self):
+        """Forget all previous frames"""
+
+    def apply(self, landmarks, times):
+        """Filter an (N, 33, 4) landmark sequence with (N,) timestamps in seconds"""
+        return landmarks
+
+class ExponentialFilter(LandmarkFilter):
+    """Exponential moving average of the landmark positions"""
+
+    def __init__(self, alpha=EXPONENTIAL_ALPHA):
+        self.alpha = alpha  # Weight of the newest frame
+        self.reset()
+
+    def reset(self):
+        self._value = None
+
+    def apply(self, landmarks, times):
+        filtered = landmarks.copy()
+        for i in range(len(landmarks)):
+            # Only x, y, z are smoothed; visibility is passed through
+            position = landmarks[i, :, :3]
+            if self._value is None:
+                self._value = position.copy()
+            else:
+                self._value += self.alpha * (position - self._value)
+            filtered[i, :, :3] = self._value
+        return filtered
+
+class OneEuroFilter(LandmarkFilter):
+    """One-Euro filter: heavy smoothing while a landmark is still, little lag while it moves fast"""
+
+    def __init__(self, min_cutoff=ONE_EURO_MIN_CUTOFF, beta=ONE_EURO_BETA, derivative_cutoff=ONE_EURO_DERIVATIVE_CUTOFF):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.derivative_cutoff = derivative_cutoff
+        self.reset()
+
+    def reset(self):
+        self._value = None
+        self._derivative = None
+        self._time = None
+
+    @staticmethod
+    def _alpha(elapsed, cutoff):
+        return 1.0 / (1.0 + 1.0 / (2 * np.pi * cutoff * elapsed))
+
+    def apply(self, landmarks, times):
+        filtered = landmarks.copy()
+        for i in range(len(landmarks)):
+            position = landmarks[i, :, :3]
+            if self._value is None:
+                self._value = position.copy()
+                self._derivative = np.zeros_like(position)
+            else:
+                # Frames with repeated or out of order timestamps fall back to the nominal frame time
+                elapsed = times[i] - self._time
+                if elapsed <= 0:
+                    elapsed = 1 / NOMINAL_FRAME_RATE
+                speed = (position - self._value) / elapsed
+                self._derivative += self._alpha(elapsed, self.derivative_cutoff) * (speed - self._derivative)
+                cutoff = self.min_cutoff + self.beta * np.abs(self._derivative)
+                self._value += self._alpha(elapsed, cutoff) * (position - self._value)
+            self._time = times[i]
+            filtered[i, :, :3] = self._value
+        return filtered
+
+# Landmark filter for each smoothing option
+LANDMARK_FILTERS = {
+    "none": LandmarkFilter,
+    "exponential": ExponentialFilter,
+    "one_euro": OneEuroFilter,
+}
+
+def hysteresis_state(enter, leave, initial):
+    """State after each frame of a two-threshold switch that turns on at enter frames and off at leave frames"""
+    positions = np.arange(len(enter))
+    last_enter = np.maximum.accumulate(np.where(enter, positions, -1))
+    last_leave = np.maximum.accumulate(np.where(leave, positions, -1))
+    # Between the two thresholds the previous state is kept
+    return np.where((last_enter < 0) & (last_leave < 0), initial, last_enter >= last_leave)
+
+class ExerciseDetector(ABC):
+    """Stateful rep detector that accepts single frames or whole landmark sequences"""
+
+    LANDMARKS = list(range(NUM_LANDMARKS))  # Landmarks the detector reads; only these are smoothed
+
+    def __init__(self, frame_width=640, frame_height=480, smoothing="none"):
+        self.frame_width = frame_width  # Frame size for pixel-based thresholds
+        self.frame_height = frame_height
+        self.smoother = LANDMARK_FILTERS[smoothing]()  # Applied to landmarks before detection
+        self.reset()
+
+    def reset(self):
+        """Clear all detection state"""
+        self.count = 0
+        self.last_time = None  # Timestamp of the last processed frame
+        self.smoother.reset()
+
+    def step(self, landmarks, timestamp=None):
+        """Process one (33, 4) landmark array and return the rep count"""
+        self.run(landmarks, None if timestamp is None else [timestamp])
+        return self.count
+
+    def run(self, landmarks, times=None):
+        """Process an (N, 33, 4) landmark sequence and return the rep count after each frame"""
+        landmarks = np.asarray(landmarks, dtype=np.float64).reshape(-1, NUM_LANDMARKS, 4)
+        if len(landmarks) == 0:
+            return np.empty(0, dtype=np.int64)
+        times = frame_times(len(landmarks), times, self.last_time)
+        self.last_time = float(times[-1])
+        smoothed = landmarks.copy()
+        smoothed[:, self.LANDMARKS] = self.smoother.apply(landmarks[:, self.LANDMARKS], times)
+        return self._run(smoothed, times)
+
+    @abstractmethod
+    def _run(self, landmarks, times):
+        """Detect reps in a smoothed (N, 33, 4) sequence and return the count after each frame"""
+
+class HandCoinDetector(ExerciseDetector):
+    """Counts coins collected by stretching a hand towards the current screen edge"""
+
+    LANDMARKS = [LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_WRIST, RIGHT_WRIST]
+
+    def __init__(self, frame_width=640, frame_height=480, proximity=100, smoothing="none"):
+        self.proximity = proximity  # Max wrist to coin distance in pixels
+        super().__init__(frame_width, frame_height, smoothing)
+
+    def reset(self):
+        super().reset()
+        self.coin_x, self.coin_y = generate_edge_coin_position()
+
+    def _run(self, landmarks, times):
+        scale = np.array([self.frame_width, self.frame_height])
+        
+        # Wrist pixels are truncated like the original int() conversion
+        wrists = np.trunc(landmarks[:, [LEFT_WRIST, RIGHT_WRIST], :2] * scale)
+        shoulders = landmarks[:, [LEFT_SHOULDER, RIGHT_SHOULDER], :2] * scale
+        arm_angles = np.degrees(np.arctan2(wrists[..., 1] - shoulders[..., 1], wrists[..., 0] - shoulders[..., 0]))
+        left_angle, right_angle = arm_angles[:, 0], arm_angles[:, 1]
+        
+        # Whether a coin at each edge would be collected on each frame
+        collectable = {}
+        for edge, (x, y) in COIN_POSITIONS.items():
+            coin = np.array([int(x * self.frame_width), int(y * self.frame_height)])
+            offsets = wrists - coin
+            near = np.hypot(offsets[..., 0], offsets[..., 1]) < self.proximity
+            
+            if edge == "center":
+                # Center coin - stretch up
+                hit = ((near[:, 0] & (np.abs(left_angle) > 70) & (np.abs(left_angle) < 110)) |
+                       (near[:, 1] & (np.abs(right_angle) > 70) & (np.abs(right_angle) < 110)))
+            elif edge == "left":
+                # Left coin - right hand stretched left
+                hit = (near[:, 1] & (right_angle > 160)) | (right_angle < -160)
+            else:
+                # Right coin - left hand stretched right
+                hit = (near[:, 0] & (np.abs(left_angle) < 20)) | (np.abs(left_angle) > 340)
+            collectable[edge] = hit.tolist()
+        
+        # Coins respawn at random edges, so only this pass is sequential
+        reps = np.empty(len(landmarks), dtype=np.int64)
+        for i in range(len(landmarks)):
+            if collectable[get_current_edge(self.coin_x, self.coin_y)][i]:
+                self.count += 1
+                self.coin_x, self.coin_y = generate_edge_coin_position()
+            reps[i] = self.count
+        return reps
+
+class SquatDetector(ExerciseDetector):
+    """Counts squats from both knee angles"""
+
+    LANDMARKS = [LEFT_HIP, RIGHT_HIP, LEFT_KNEE, RIGHT_KNEE, LEFT_ANKLE, RIGHT_ANKLE]
+
+    def __init__(self, frame_width=640, frame_height=480, knee_angle=120, knee_hysteresis=10, smoothing="one_euro"):
+        self.knee_angle = knee_angle  # Knee angle in degrees below which the user starts squatting
+        self.knee_hysteresis = knee_hysteresis  # Degrees above knee_angle a knee must straighten to stand up
+        super().__init__(frame_width, frame_height, smoothing)
+
+    def reset(self):
+        super().reset()
+        self.is_squatting = False
+        self.state = "standing"
+
+    def _run(self, landmarks, times):
+        left_knee_angle = joint_angles(landmarks[:, LEFT_HIP, :2], landmarks[:, LEFT_KNEE, :2], landmarks[:, LEFT_ANKLE, :2])
+        right_knee_angle = joint_angles(landmarks[:, RIGHT_HIP, :2], landmarks[:, RIGHT_KNEE, :2], landmarks[:, RIGHT_ANKLE, :2])
+        enter = (left_knee_angle < self.knee_angle) & (right_knee_angle < self.knee_angle)
+        leave = np.maximum(left_knee_angle, right_knee_angle) > self.knee_angle + self.knee_hysteresis
+        squatting = hysteresis_state(enter, leave, self.state == "squatting")
+        
+        # Each squat -> stand transition is a rep
+        previous = np.concatenate(([self.state == "squatting"], squatting[:-1]))
+        reps = self.count + np.cumsum(previous & ~squatting)
+        
+        self.is_squatting = bool(squatting[-1])
+        self.state = "squatting" if self.is_squatting else "standing"
+        self.count = int(reps[-1])
+        return reps
+
+class MotionWindow:
+    """Fixed-capacity ring buffer over a 1-D signal with O(1) windowed min, max, mean and swing frequency"""
+
+    def __init__(self, capacity, dead_band=0.0):
+        self.capacity = capacity
+        self.dead_band = dead_band  # Distance from the window mean that counts as a swing to one side
+        self._values = np.zeros(capacity)
+        self._times = np.zeros(capacity)
+        self.pushed = 0  # Samples pushed so far; sample i lives in slot i % capacity
+        self._minima = deque()  # Sample numbers whose values increase from front to back
+        self._maxima = deque()  # Sample numbers whose values decrease from front to back
+        self._swings = deque()  # Sample numbers that completed a swing, oldest first
+        self._sum = 0.0
+        self._side = 0  # -1 or 1 once the signal has left the dead band
+
+    def __len__(self):
+        return min(self.pushed, self.capacity)
+
+    def push(self, value, timestamp):
+        """Add a sample, evicting the oldest one once the window is full"""
+        index = self.pushed
+        slot = index % self.capacity
+        if index >= self.capacity:
+            self._sum -= self._values[slot]
+        oldest = index - self.capacity + 1
+        for samples in (self._minima, self._maxima, self._swings):
+            while samples and samples[0] < oldest:
+                samples.popleft()
+        
+        self._values[slot] = value
+        self._times[slot] = timestamp
+        self._sum += value
+        self.pushed += 1
+        
+        # Each sample is appended and removed at most once, so this is amortized O(1)
+        while self._minima and self._values[self._minima[-1] % self.capacity] >= value:
+            self._minima.pop()
+        self._minima.append(index)
+        while self._maxima and self._values[self._maxima[-1] % self.capacity] <= value:
+            self._maxima.pop()
+        self._maxima.append(index)
+        
+        # A swing is the signal crossing from one side of the window mean to the other
+        deviation = value - self.mean
+        side = 1 if deviation > self.dead_band else -1 if deviation < -self.dead_band else 0
+        if side != 0:
+            if self._side != 0 and side != self._side:
+                self._swings.append(index)
+            self._side = side
+
+    @property
+    def minimum(self):
+        return self._values[self._minima[0] % self.capacity]
+
+    @property
+    def maximum(self):
+        return self._values[self._maxima[0] % self.capacity]
+
+    @property
+    def mean(self):
+        return self._sum / len(self)
+
+    def span(self):
+        """Max - min of the samples in the window"""
+        return self.maximum - self.minimum
+
+    def swings_per_minute(self):
+        """Swing frequency from the first to the last swing in the window; a walker's hips swing once per step"""
+        if len(self._swings) < 2:
+            return 0.0
+        elapsed = self._times[self._swings[-1] % self.capacity] - self._times[self._swings[0] % self.capacity]
+        return float((len(self._swings) - 1) * 60 / elapsed) if elapsed > 0 else 0.0
+
+class WalkingDetector(ExerciseDetector):
+    """Counts walking bursts from side-to-side movement of the hip center and measures cadence"""
+
+    LANDMARKS = [LEFT_HIP, RIGHT_HIP]
+
+    def __init__(self, frame_width=640, frame_height=480, move_threshold=20, move_hysteresis=5, window=5, still_frames=10,
+                 cadence_window=150, step_sway=5, smoothing="one_euro"):
+        self.move_threshold = move_threshold  # Hip center movement in pixels that starts a walking burst
+        self.move_hysteresis = move_hysteresis  # Movement this far below the threshold still keeps a burst going
+        self.window = window  # Number of recent hip centers compared
+        self.still_frames = still_frames  # Frames without movement before the user is standing
+        self.cadence_window = cadence_window  # Number of recent hip centers cadence is measured over
+        self.step_sway = step_sway  # Hip sway in pixels from the mean position that counts as a step to one side
+        super().__init__(frame_width, frame_height, smoothing)
+
+    def reset(self):
+        super().reset()
+        self.state = "Standing"
+        self.motion = MotionWindow(self.window)  # Recent hip center x positions in pixels
+        self.sway = MotionWindow(self.cadence_window, self.step_sway)
+        self.still_counter = 0
+        self.cadence = 0.0  # Steps per minute over the cadence window
+
+    def _run(self, landmarks, times):
+        reps = np.full(len(landmarks), self.count, dtype=np.int64)
+        visible = (landmarks[:, LEFT_HIP, 3] > 0.5) & (landmarks[:, RIGHT_HIP, 3] > 0.5)
+        frames = np.flatnonzero(visible)
+        if len(frames) == 0:
+            return reps
+        
+        centers = (((landmarks[frames, LEFT_HIP, 0] + landmarks[frames, RIGHT_HIP, 0]) / 2) * self.frame_width).astype(np.int64)
+        
+        # Movement is max - min over the last `window` centers at each position; only
+        # this pass is sequential, and it costs the same for any window size
+        offset = self.motion.pushed
+        movement = np.empty(len(centers))
+        for i, (center, timestamp) in enumerate(zip(centers.tolist(), times[frames].tolist())):
+            self.motion.push(center, timestamp)
+            self.sway.push(center, timestamp)
+            movement[i] = self.motion.span()
+        self.cadence = self.sway.swings_per_minute()
+        
+        # Movement is only judged once there are two centers to compare
+        evaluated = np.arange(offset, offset + len(centers)) >= 1
+        moving = evaluated & (movement > self.move_threshold)
+        sustained = evaluated & (movement > self.move_threshold - self.move_hysteresis)
+        
+        # Frames without movement since the last frame that kept the burst going
+        positions = np.arange(len(centers))
+        ticks = np.cumsum(evaluated)
+        last_move = np.maximum.accumulate(np.where(sustained, positions, -1))
+        still = np.where(last_move >= 0, ticks - ticks[np.maximum(last_move, 0)], self.still_counter + ticks)
+        
+        # Walking starts on movement and lasts until the user has been still for long enough
+        walking = hysteresis_state(moving, still > self.still_frames, self.state == "Walking")
+        previous = np.concatenate(([self.state == "Walking"], walking[:-1]))
+        reps[frames] = self.count + np.cumsum(moving & ~previous)
+        
+        self.state = "Walking" if walking[-1] else "Standing"
+        self.still_counter = int(still[-1])
+        self.count = int(reps[frames[-1]])
+        return np.maximum.accumulate(reps)
+
+class ChairSitDetector(ExerciseDetector):
+    """Counts chair sits from the hip to knee height against a calibrated baseline"""
+
+    LANDMARKS = [LEFT_HIP, LEFT_KNEE]
+
+    def __init__(self, frame_width=640, frame_height=480, sit_ratio=0.8, sit_hysteresis=0.05, smoothing="one_euro"):
+        self.sit_ratio = sit_ratio  # Fraction of the standing leg height below which the user sits down
+        self.sit_hysteresis = sit_hysteresis  # Extra fraction of the leg height needed to stand up again
+        super().__init__(frame_width, frame_height, smoothing)
+
+    def reset(self):
+        super().reset()
+        self.calibrated = False
+        self.initial_leg_height = None
+        self.is_sitting = False
+        self.posture_status = "Calibrating..."
+
+    def _run(self, landmarks, times):
+        reps = np.full(len(landmarks), self.count, dtype=np.int64)
+        visible = (landmarks[:, LEFT_HIP, 3] > 0.5) & (landmarks[:, LEFT_KNEE, 3] > 0.5)
+        frames = np.flatnonzero(visible)
+        leg_heights = np.abs(landmarks[frames, LEFT_HIP, 1] - landmarks[frames, LEFT_KNEE, 1])
+        
+        if not self.calibrated and len(frames):
+            # Initial calibration on the first visible frame
+            self.initial_leg_height = float(leg_heights[0])
+            self.calibrated = True
+            self.posture_status = "Calibrated"
+            frames, leg_heights = frames[1:], leg_heights[1:]
+        if len(frames) == 0:
+            return reps
+        
+        # Count stand -> sit transitions
+        enter = leg_heights < self.initial_leg_height * self.sit_ratio
+        leave = leg_heights > self.initial_leg_height * (self.sit_ratio + self.sit_hysteresis)
+        sitting = hysteresis_state(enter, leave, self.is_sitting)
+        previous = np.concatenate(([self.is_sitting], sitting[:-1]))
+        reps[frames] = self.count + np.cumsum(sitting & ~previous)
+        
+        self.is_sitting = bool(sitting[-1])
+        self.posture_status = "Sitting" if self.is_sitting else "Standing"
+        self.count = int(reps[frames[-1]])
+        return np.maximum.accumulate(reps)
+
+active_detectors = {}  # Detectors of the current session by exercise type
+
+def create_detector(exercise, frame_width, frame_height, options=None):
+    """Build the detector for an exercise type with any threshold overrides"""
+    if options is None:
+        options = detector_options
+    return EXERCISES[exercise].detector(frame_width, frame_height, **options.get(exercise, {}))
+
+# Landmark recording
+# File layout: a 16 byte header followed by fixed-size frame records
+LANDMARK_FILE_MAGIC = b"FQLM"
+LANDMARK_FILE_VERSION = 1
+LANDMARK_HEADER = np.dtype([("magic", "S4"), ("version", "<u2"), ("reserved", "<u2"),
+                            ("frame_width", "<u4"), ("frame_height", "<u4")])
+LANDMARK_RECORD = np.dtype([("time", "<f8"), ("landmarks", "<f4", (NUM_LANDMARKS, 4))])
+
+class LandmarkRecorder:
+    """Writes pose landmarks and their timestamps to a compact binary file"""
+
+    def __init__(self, path, frame_width, frame_height):
+        self.path = path
+        self.frames = 0
+        self._start = None
+        self._file = open(path, "wb")
+        header = np.zeros(1, dtype=LANDMARK_HEADER)
+        header["magic"] = LANDMARK_FILE_MAGIC
+        header["version"] = LANDMARK_FILE_VERSION
+        header["frame_width"] = frame_width
+        header["frame_height"] = frame_height
+        self._file.write(header.tobytes())
+
+    def write(self, landmarks, timestamp=None):
+        """Append one frame of (33, 4) landmarks; timestamps default to seconds since the first frame"""
+        if timestamp is None:
+            now = time.perf_counter()
+            if self._start is None:
+                self._start = now
+            timestamp = now - self._start
+        record = np.zeros(1, dtype=LANDMARK_RECORD)
+        record["time"] = timestamp
+        record["landmarks"] = landmarks
+        self._file.write(record.tobytes())
+        self.frames += 1
+
+    def close(self):
+        """Flush and close the recording"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+class LandmarkRecording:
+    """Memory-mapped landmark recording"""
+
+    def __init__(self, path):
+        self.path = path
+        header = np.fromfile(path, dtype=LANDMARK_HEADER, count=1)
+        if len(header) == 0 or header["magic"][0] != LANDMARK_FILE_MAGIC:
+            raise ValueError(f"{path} is not a landmark recording")
+        if header["version"][0] != LANDMARK_FILE_VERSION:
+            raise ValueError(f"{path} has unsupported version {header['version'][0]}")
+        self.frame_width = int(header["frame_width"][0])
+        self.frame_height = int(header["frame_height"][0])
+        
+        # A recording cut short keeps every complete record
+        frames = (os.path.getsize(path) - LANDMARK_HEADER.itemsize) // LANDMARK_RECORD.itemsize
+        if frames > 0:
+            records = np.memmap(path, dtype=LANDMARK_RECORD, mode="r",
+                                offset=LANDMARK_HEADER.itemsize, shape=(frames,))
+        else:
+            records = np.zeros(0, dtype=LANDMARK_RECORD)
+        self.timestamps = records["time"]  # (N,) seconds
+        self.landmarks = records["landmarks"]  # (N, 33, 4) x, y, z, visibility
+
+    def __len__(self):
+        return len(self.timestamps)
+
+class ReplaySource:
+    """Feeds a recorded session into exercise detection in place of the webcam"""
+
+    def __init__(self, path, realtime=True):
+        self.recording = LandmarkRecording(path)
+        self.realtime = realtime  # Pace frames by their recorded timestamps
+
+    async def frames(self):
+        """Yield (timestamp, landmarks) for every recorded frame, sleeping without blocking the loop"""
+        start = time.perf_counter()
+        for timestamp, landmarks in zip(self.recording.timestamps, self.recording.landmarks):
+            if self.realtime:
+                delay = timestamp - (time.perf_counter() - start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            yield float(timestamp), landmarks
+
+
+async def get_text_input(prompt):
     """Display text input dialog and return user input"""
     global running
     input_text = ""
@@ -152,22 +1961,22 @@ def get_text_input(prompt):
     while input_active and running:
         # Draw input screen
         screen.fill(WHITE)
-        prompt_surface = font.render(prompt, True, BLACK)
+        prompt_surface = render_text(font, prompt, True, BLACK)
         screen.blit(prompt_surface, (50, 150))
         
         # Draw input box
         pygame.draw.rect(screen, BLACK, (50, 200, 700, 50), 2)
-        text_surface = font.render(input_text, True, BLACK)
+        text_surface = render_text(font, input_text, True, BLACK)
         screen.blit(text_surface, (60, 210))
         
         # Draw instructions
-        instruction = small_font.render("Press ENTER to confirm", True, BLACK)
+        instruction = render_text(small_font, "Press ENTER to confirm", True, BLACK)
         screen.blit(instruction, (50, 270))
         
         pygame.display.flip()
         
-        # Handle input events
-        for event in pygame.event.get():
+        # Handle input events; the screen is only redrawn after some arrive
+        for event in await next_events():
             if event.type == pygame.QUIT:
                 running = False
                 return None
@@ -181,12 +1990,12 @@ def get_text_input(prompt):
     
     return input_text
 
-def select_existing_user():
+async def select_existing_user():
     """Display user selection screen"""
     global current_user, running
     
     if not user_data:
-        show_message("No existing users found. Please register first.")
+        await show_message("No existing users found. Please register first.")
         return False
     
     selected_index = 0
@@ -196,27 +2005,27 @@ def select_existing_user():
     while selecting and running:
         # Draw user selection screen
         screen.fill(WHITE)
-        title = font.render("Select User", True, BLACK)
+        title = render_text(font, "Select User", True, BLACK)
         screen.blit(title, (320, 50))
         
         # Draw user list
         for i, user in enumerate(users_list):
             color = BLUE if i == selected_index else BLACK
-            user_text = font.render(f"{user} (Age: {user_data[user]['age']})", True, color)
+            user_text = render_text(font, f"{user} (Age: {user_data[user]['age']})", True, color)
             screen.blit(user_text, (150, 150 + i * 50))
         
         # Add Back option
-        back_text = font.render("Back", True, BLUE if selected_index == len(users_list) else BLACK)
+        back_text = render_text(font, "Back", True, BLUE if selected_index == len(users_list) else BLACK)
         screen.blit(back_text, (150, 150 + len(users_list) * 50))
         
         # Draw instructions
-        instruction = small_font.render("UP/DOWN to navigate, ENTER to select, ESC to go back", True, BLACK)
+        instruction = render_text(small_font, "UP/DOWN to navigate, ENTER to select, ESC to go back", True, BLACK)
         screen.blit(instruction, (250, 500))
         
         pygame.display.flip()
         
-        # Handle input
-        for event in pygame.event.get():
+        # Handle input; the screen is only redrawn after some arrives
+        for event in await next_events():
             if event.type == pygame.QUIT:
                 running = False
                 return False
@@ -236,21 +2045,21 @@ def select_existing_user():
     
     return True
 
-def register_user():
+async def register_user():
     """Handle new user registration"""
     global current_user, running
     
     # Get user name
-    user_name = get_text_input("Enter Name")
+    user_name = await get_text_input("Enter Name")
     if user_name is None:
         return False
     
     if not user_name:
-        show_message("Name cannot be empty.")
+        await show_message("Name cannot be empty.")
         return False
     
     # Get user age
-    user_age = get_text_input("Enter Age")
+    user_age = await get_text_input("Enter Age")
     if user_age is None:
         return False
     
@@ -258,76 +2067,79 @@ def register_user():
     try:
         age = int(user_age)
         if age <= 0:
-            show_message("Age must be a positive number.")
+            await show_message("Age must be a positive number.")
             return False
     except ValueError:
-        show_message("Age must be a number.")
+        await show_message("Age must be a number.")
         return False
     
     # Check for existing user or create new
     if user_name in user_data:
-        show_message(f"User {user_name} already exists.")
+        await show_message(f"User {user_name} already exists.")
         current_user = user_name
     else:
         # Initialize new user data
         user_data[user_name] = {
-            "age": user_age,
+            "schema_version": USER_SCHEMA_VERSION,
+            "age": age,
             "coins": 0,
             "progress": 0,
             "squats_history": {},
             "walking_history": {},
+            "chair_sits_history": {},
             "last_exercise_date": None,
             "inventory": []
         }
-        save_user_data(user_data)
+        save_user_data(user_data, user_name)
         current_user = user_name
     
     return True
 
-def show_message(message, duration=2000):
+async def show_message(message, duration=2000):
     """Display a temporary message on screen"""
     global running
-    start_time = pygame.time.get_ticks()
+    end_time = time.monotonic() + duration / 1000
     
-    while pygame.time.get_ticks() - start_time < duration and running:
-        screen.fill(WHITE)
-        text_surface = font.render(message, True, BLACK)
-        text_rect = text_surface.get_rect(center=(SCREEN_WIDTH/2, SCREEN_HEIGHT/2))
-        screen.blit(text_surface, text_rect)
-        pygame.display.flip()
-        
-        for event in pygame.event.get():
+    screen.fill(WHITE)
+    text_surface = render_text(font, message, True, BLACK)
+    text_rect = text_surface.get_rect(center=(SCREEN_WIDTH/2, SCREEN_HEIGHT/2))
+    screen.blit(text_surface, text_rect)
+    pygame.display.flip()
+    
+    # The message does not change, so only wake up for input or the end
+    while running and time.monotonic() < end_time:
+        for event in await next_events(timeout=end_time - time.monotonic()):
             if event.type == pygame.QUIT:
                 running = False
                 return
 
-def select_exercise():
+async def select_exercise():
     """Display exercise selection menu"""
     global exercise_type, running
     selecting = True
     selected_index = 0
-    options = ["Hand Exercise", "Squatting", "Walking", "Chair Sit", "Back"]
+    options = [exercise.label for exercise in EXERCISES.values()] + ["Back"]
     
     while selecting and running:
         # Draw exercise selection screen
         screen.fill(WHITE)
-        title = font.render(f"Welcome, {current_user}! Select Exercise Type", True, BLACK)
+        title = render_text(font, f"Welcome, {current_user}! Select Exercise Type", True, BLACK)
         screen.blit(title, (200, 100))
         
         # Draw exercise options
         for i, option in enumerate(options):
             color = BLUE if i == selected_index else BLACK
-            option_text = font.render(option, True, color)
+            option_text = render_text(font, option, True, color)
             screen.blit(option_text, (320, 200 + i * 50))
         
         # Draw instructions
-        instruction = small_font.render("UP/DOWN to navigate, ENTER to select", True, BLACK)
+        instruction = render_text(small_font, "UP/DOWN to navigate, ENTER to select", True, BLACK)
         screen.blit(instruction, (250, 500))
         
         pygame.display.flip()
         
-        # Handle input
-        for event in pygame.event.get():
+        # Handle input; the screen is only redrawn after some arrives
+        for event in await next_events():
             if event.type == pygame.QUIT:
                 running = False
                 return False
@@ -340,27 +2152,20 @@ def select_exercise():
                     if options[selected_index] == "Back":
                         return False  # Return to main menu
                     else:
-                        # Set exercise type based on selection
-                        if selected_index == 0:
-                            exercise_type = "hand"
-                        elif selected_index == 1:
-                            exercise_type = "squat"
-                        elif selected_index == 2:
-                            exercise_type = "walking"
-                        elif selected_index == 3:
-                            exercise_type = "chair_sit"
+                        # Menu entries follow the registry order
+                        exercise_type = EXERCISE_TYPES[selected_index]
                         
                         selecting = False
                         return True  # Exercise selected
     
     return False
 
-def view_avatar():
+async def view_avatar():
     """Display user's avatar with collected items"""
     global current_user, running
     
     if current_user is None:
-        show_message("Please login first!")
+        await show_message("Please login first!")
         return
     
     viewing = True
@@ -368,7 +2173,7 @@ def view_avatar():
     while viewing and running:
         # Draw avatar screen
         screen.fill(WHITE)
-        title = font.render(f"{current_user}'s Avatar", True, BLACK)
+        title = render_text(font, f"{current_user}'s Avatar", True, BLACK)
         screen.blit(title, (320, 50))
         
         # Draw base avatar parts
@@ -385,13 +2190,13 @@ def view_avatar():
                     pygame.draw.rect(screen, BLUE, item_rect)
         
         # Draw instructions
-        instruction = small_font.render("Press ESC to go back", True, BLACK)
+        instruction = render_text(small_font, "Press ESC to go back", True, BLACK)
         screen.blit(instruction, (320, 500))
         
         pygame.display.flip()
         
-        # Handle input
-        for event in pygame.event.get():
+        # Handle input; the screen is only redrawn after some arrives
+        for event in await next_events():
             if event.type == pygame.QUIT:
                 running = False
                 return
@@ -399,12 +2204,12 @@ def view_avatar():
                 if event.key == pygame.K_ESCAPE:
                     viewing = False
 
-def marketplace():
+async def marketplace():
     """Display marketplace for avatar items"""
     global user_data, current_user, running
     
     if current_user is None:
-        show_message("Please login first!")
+        await show_message("Please login first!")
         return
     
     # Marketplace items
@@ -422,32 +2227,32 @@ def marketplace():
     while shopping and running:
         # Draw marketplace screen
         screen.fill(WHITE)
-        title = font.render("Marketplace", True, BLACK)
+        title = render_text(font, "Marketplace", True, BLACK)
         screen.blit(title, (320, 50))
         
         # Display user's coin balance
-        coins_text = font.render(f"Your Coins: {user_data[current_user]['coins']}", True, BLUE)
+        coins_text = render_text(font, f"Your Coins: {user_data[current_user]['coins']}", True, BLUE)
         screen.blit(coins_text, (320, 100))
         
         # Draw item list
         for i, item in enumerate(items):
             color = GREEN if i == selected_index else BLACK
-            item_text = font.render(f"{item['name']} - {item['price']} coins", True, color)
+            item_text = render_text(font, f"{item['name']} - {item['price']} coins", True, color)
             screen.blit(item_text, (150, 180 + i * 70))
             
-            desc_text = small_font.render(item['description'], True, BLACK)
+            desc_text = render_text(small_font, item['description'], True, BLACK)
             screen.blit(desc_text, (150, 210 + i * 70))
         
         # Draw instructions
-        instruction1 = small_font.render("UP/DOWN to navigate", True, BLACK)
-        instruction2 = small_font.render("ENTER to buy, ESC to exit", True, BLACK)
+        instruction1 = render_text(small_font, "UP/DOWN to navigate", True, BLACK)
+        instruction2 = render_text(small_font, "ENTER to buy, ESC to exit", True, BLACK)
         screen.blit(instruction1, (320, 480))
         screen.blit(instruction2, (320, 510))
         
         pygame.display.flip()
         
-        # Handle input
-        for event in pygame.event.get():
+        # Handle input; the screen is only redrawn after some arrives
+        for event in await next_events():
             if event.type == pygame.QUIT:
                 running = False
                 return
@@ -467,72 +2272,149 @@ def marketplace():
                             if 'inventory' not in user_data[current_user]:
                                 user_data[current_user]['inventory'] = []
                             user_data[current_user]['inventory'].append(selected_item['name'].lower())
-                            save_user_data(user_data)
-                            show_message(f"Purchased {selected_item['name']}!")
+                            save_user_data(user_data, current_user)
+                            await show_message(f"Purchased {selected_item['name']}!")
                         else:
-                            show_message("Not enough coins!")
+                            await show_message("Not enough coins!")
                 elif event.key == pygame.K_ESCAPE:
                     shopping = False
 
 # Data visualization functions
-def generate_hand_exercise_graph():
-    """Generate bar chart of hand exercise performance"""
+GRAPH_SIZE = (760, 480)  # Graph image size in pixels
+graph_cache = {}  # Graph name -> (user data version, rendered surface)
+
+def new_graph_figure(title, xlabel, ylabel):
+    """Create an off-screen figure of GRAPH_SIZE and return its axes"""
+    Figure, FigureCanvasAgg = load_matplotlib()
+    figure = Figure(figsize=(GRAPH_SIZE[0] / 100, GRAPH_SIZE[1] / 100), dpi=100)
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot(111)
+    axes.set_title(title)
+    axes.set_xlabel(xlabel)
+    axes.set_ylabel(ylabel)
+    return axes
+
+def figure_to_surface(axes):
+    """Render a figure with Agg and return it as a pygame surface"""
+    figure = axes.figure
+    figure.tight_layout()
+    figure.canvas.draw()
+    size = figure.canvas.get_width_height()
+    return pygame.image.frombuffer(figure.canvas.buffer_rgba(), size, "RGBA").copy()
+
+def render_bar_graph(users, values, color, title, xlabel, ylabel):
+    """Render a bar chart off-screen and return it as a pygame surface"""
+    axes = new_graph_figure(title, xlabel, ylabel)
+    axes.bar(users, values, color=color)
+    return figure_to_surface(axes)
+
+def hand_exercise_rows():
+    """Users and the coins each has collected"""
     users = list(user_data.keys())
-    coins = [user_data[user]['coins'] for user in users]
-    
-    plt.bar(users, coins, color='blue')
-    plt.title("Hand Exercise Performance (Coins Collected)")
-    plt.xlabel("Users")
-    plt.ylabel("Coins Collected")
-    plt.show()
+    return users, [user_data[user]['coins'] for user in users]
 
-def generate_squatting_graph():
-    """Generate bar chart of squatting performance"""
+def exercise_total_rows(exercise):
+    """Users and each one's all-time count of an exercise"""
     users = list(user_data.keys())
-    squats = [sum(user_data[user].get('squats_history', {}).values()) for user in users]
-    
-    plt.bar(users, squats, color='green')
-    plt.title("Squatting Performance (Total Squats)")
-    plt.xlabel("Users")
-    plt.ylabel("Total Squats")
-    plt.show()
+    return users, [stats_index.total(user, exercise) for user in users]
 
-def generate_walking_graph():
+def weekly_squat_rows():
+    """(user, week start days, weekly squats, current streak) over the last 12 weeks"""
+    start = (datetime.now() - timedelta(weeks=12)).strftime("%Y-%m-%d")
+    rows = []
+    for user in user_data:
+        weeks, squats = history_columns.resample(user, "squat", "week", start=start)
+        if len(weeks):
+            current_streak, _ = history_columns.streaks(user, "squat")
+            rows.append((user, weeks, squats, current_streak))
+    return rows
+
+def generate_hand_exercise_graph(rows):
+    """Generate bar chart of hand exercise performance"""
+    users, coins = rows
+    return render_bar_graph(users, coins, 'blue', "Hand Exercise Performance (Coins Collected)",
+                            "Users", "Coins Collected")
+
+def generate_squatting_graph(rows):
+    """Generate bar chart of squatting performance"""
+    users, squats = rows
+    return render_bar_graph(users, squats, 'green', "Squatting Performance (Total Squats)",
+                            "Users", "Total Squats")
+
+def generate_walking_graph(rows):
     """Generate bar chart of walking performance"""
-    users = list(user_data.keys())
-    walking_data = []
+    users, walking_data = rows
+    return render_bar_graph(users, walking_data, 'orange', "Walking Performance (Total Walking Bursts)",
+                            "Users", "Total Walking Bursts")
+
+def generate_chair_sit_graph(rows):
+    """Generate bar chart of chair sit performance"""
+    users, chair_sit_data = rows
+    return render_bar_graph(users, chair_sit_data, 'purple', "Chair Sit Performance (Total Chair Sits)",
+                            "Users", "Total Chair Sits")
+
+def generate_weekly_squat_trend_graph(rows):
+    """Generate line chart of each user's weekly squats over the last 12 weeks"""
+    axes = new_graph_figure("Weekly Squats (Last 12 Weeks)", "Week", "Squats")
     
-    for user in users:
-        total_bursts = sum(user_data[user].get('walking_history', {}).values())
-        walking_data.append(total_bursts)
+    for user, weeks, squats, current_streak in rows:
+        axes.plot(weeks.astype("datetime64[D]"), squats, marker="o", label=f"{user} (streak: {current_streak} days)")
     
-    plt.bar(users, walking_data, color='orange')
-    plt.title("Walking Performance (Total Walking Bursts)")
-    plt.xlabel("Users")
-    plt.ylabel("Total Walking Bursts")
-    plt.show()
+    if axes.get_legend_handles_labels()[0]:
+        axes.legend()
+    axes.figure.autofmt_xdate()
+    return figure_to_surface(axes)
 
-def generate_chair_sit_graph():
-    """Generate bar chart of chair sit performance"""
-    users = list(user_data.keys())
-    chair_sit_data = []
+# Row collector and graph generator for each graph menu option
+GRAPH_GENERATORS = {
+    "Hand Exercise Performance": (hand_exercise_rows, generate_hand_exercise_graph),
+    "Squatting Performance": (lambda: exercise_total_rows("squat"), generate_squatting_graph),
+    "Walking Performance": (lambda: exercise_total_rows("walking"), generate_walking_graph),
+    "Chair Sit Performance": (lambda: exercise_total_rows("chair_sit"), generate_chair_sit_graph),
+    "Weekly Squat Trend": (weekly_squat_rows, generate_weekly_squat_trend_graph),
+}
+
+async def get_graph_surface(name):
+    """Return a rendered graph, re-rendering only if user data changed since it was cached"""
+    collect_rows, generate = GRAPH_GENERATORS[name]
+    
+    # Copy the rows under the data lock; rendering a stale graph takes a
+    # while, so it runs on the executor without holding the lock
+    with data_lock:
+        version = user_data_version
+        cached = graph_cache.get(name)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        rows = collect_rows()
+    surface = await scheduler.run_blocking(generate, rows)
+    graph_cache[name] = (version, surface)
+    return surface
+
+async def show_graph(name):
+    """Display a graph inside the game window until ESC is pressed"""
+    global running
     
-    for user in users:
-        total_sits = sum(user_data[user].get('chair_sits_history', {}).values())
-        chair_sit_data.append(total_sits)
+    graph_surface = await get_graph_surface(name)
+    screen.fill(WHITE)
+    screen.blit(graph_surface, graph_surface.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 30)))
+    instruction = render_text(small_font, "Press ESC to go back", True, BLACK)
+    screen.blit(instruction, (320, 560))
+    pygame.display.flip()
     
-    plt.bar(users, chair_sit_data, color='purple')
-    plt.title("Chair Sit Performance (Total Chair Sits)")
-    plt.xlabel("Users")
-    plt.ylabel("Total Chair Sits")
-    plt.show()
+    # Nothing changes on screen, so just wait for input
+    while running:
+        for event in await next_events():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN and event.key in (pygame.K_ESCAPE, pygame.K_RETURN):
+                return
 
-def delete_user():
+async def delete_user():
     """Handle user deletion"""
     global user_data, running
     
     if not user_data:
-        show_message("No users to delete.")
+        await show_message("No users to delete.")
         return
     
     selected_index = 0
@@ -542,27 +2424,27 @@ def delete_user():
     while deleting and running:
         # Draw user deletion screen
         screen.fill(WHITE)
-        title = font.render("Delete User", True, BLACK)
+        title = render_text(font, "Delete User", True, BLACK)
         screen.blit(title, (320, 50))
         
         # Draw user list
         for i, user in enumerate(users_list):
             color = RED if i == selected_index else BLACK
-            user_text = font.render(f"{user} (Age: {user_data[user]['age']})", True, color)
+            user_text = render_text(font, f"{user} (Age: {user_data[user]['age']})", True, color)
             screen.blit(user_text, (150, 150 + i * 50))
         
         # Add Back option
-        back_text = font.render("Back", True, RED if selected_index == len(users_list) else BLACK)
+        back_text = render_text(font, "Back", True, RED if selected_index == len(users_list) else BLACK)
         screen.blit(back_text, (150, 150 + len(users_list) * 50))
         
         # Draw instructions
-        instruction = small_font.render("UP/DOWN to navigate, ENTER to delete, ESC to cancel", True, BLACK)
+        instruction = render_text(small_font, "UP/DOWN to navigate, ENTER to delete, ESC to cancel", True, BLACK)
         screen.blit(instruction, (200, 500))
         
         pygame.display.flip()
         
-        # Handle input
-        for event in pygame.event.get():
+        # Handle input; the screen is only redrawn after some arrives
+        for event in await next_events():
             if event.type == pygame.QUIT:
                 running = False
                 return
@@ -578,45 +2460,47 @@ def delete_user():
                         # Delete selected user
                         user_to_delete = users_list[selected_index]
                         del user_data[user_to_delete]
-                        save_user_data(user_data)
-                        show_message(f"User {user_to_delete} deleted.", 2000)
+                        stats_index.remove_user(user_to_delete)
+                        history_columns.remove_user(user_to_delete)
+                        save_user_data(user_data, user_to_delete)
+                        await show_message(f"User {user_to_delete} deleted.", 2000)
                         deleting = False
                 elif event.key == pygame.K_ESCAPE:
                     deleting = False
 
-def view_graphs():
+async def view_graphs():
     """Display graph selection menu"""
     global running
     
     if not user_data:
-        show_message("No user data available to generate graphs.")
+        await show_message("No user data available to generate graphs.")
         return
     
     selecting = True
     selected_index = 0
     options = ["Hand Exercise Performance", "Squatting Performance", "Walking Performance", 
-               "Chair Sit Performance", "Back"]
+               "Chair Sit Performance", "Weekly Squat Trend", "Back"]
     
     while selecting and running:
         # Draw graph selection screen
         screen.fill(WHITE)
-        title = font.render("View Graphs", True, BLUE)
+        title = render_text(font, "View Graphs", True, BLUE)
         screen.blit(title, (320, 50))
         
         # Draw graph options
         for i, option in enumerate(options):
             color = BLUE if i == selected_index else BLACK
-            option_text = font.render(option, True, color)
+            option_text = render_text(font, option, True, color)
             screen.blit(option_text, (280, 150 + i * 50))
         
         # Draw instructions
-        instruction = small_font.render("UP/DOWN to navigate, ENTER to select", True, BLACK)
-        screen.blit(instruction, (250, 400))
+        instruction = render_text(small_font, "UP/DOWN to navigate, ENTER to select", True, BLACK)
+        screen.blit(instruction, (250, 480))
         
         pygame.display.flip()
         
-        # Handle input
-        for event in pygame.event.get():
+        # Handle input; the screen is only redrawn after some arrives
+        for event in await next_events():
             if event.type == pygame.QUIT:
                 running = False
                 return
@@ -626,18 +2510,12 @@ def view_graphs():
                 elif event.key == pygame.K_DOWN:
                     selected_index = min(len(options) - 1, selected_index + 1)
                 elif event.key == pygame.K_RETURN:
-                    if options[selected_index] == "Hand Exercise Performance":
-                        generate_hand_exercise_graph()
-                    elif options[selected_index] == "Squatting Performance":
-                        generate_squatting_graph()
-                    elif options[selected_index] == "Walking Performance":
-                        generate_walking_graph()
-                    elif options[selected_index] == "Chair Sit Performance":
-                        generate_chair_sit_graph()
+                    if options[selected_index] in GRAPH_GENERATORS:
+                        await show_graph(options[selected_index])
                     elif options[selected_index] == "Back":
                         selecting = False
 
-def main_menu():
+async def main_menu():
     """Display main menu and handle navigation"""
     global current_user, running
     
@@ -648,18 +2526,18 @@ def main_menu():
     while menu_active and running:
         # Draw main menu
         screen.fill(WHITE)
-        title = font.render("Exercise Tracker Game", True, BLUE)
+        title = render_text(font, "Exercise Tracker Game", True, BLUE)
         screen.blit(title, (280, 50))
         
         # Display current user if logged in
         if current_user:
-            user_text = font.render(f"Current User: {current_user}", True, GREEN)
+            user_text = render_text(font, f"Current User: {current_user}", True, GREEN)
             screen.blit(user_text, (280, 100))
         
         # Draw menu options
         for i, option in enumerate(options):
             color = BLUE if i == selected_index else BLACK
-            option_text = font.render(option, True, color)
+            option_text = render_text(font, option, True, color)
             screen.blit(option_text, (350, 200 + i * 50))
         
         # Draw music control button
@@ -667,8 +2545,8 @@ def main_menu():
         
         pygame.display.flip()
         
-        # Handle input
-        for event in pygame.event.get():
+        # Handle input; the screen is only redrawn after some arrives
+        for event in await next_events():
             if event.type == pygame.QUIT:
                 running = False
                 return False
@@ -679,19 +2557,19 @@ def main_menu():
                     selected_index = min(len(options) - 1, selected_index + 1)
                 elif event.key == pygame.K_RETURN:
                     if options[selected_index] == "New User":
-                        if register_user():
+                        if await register_user():
                             menu_active = False
                     elif options[selected_index] == "Existing User":
-                        if select_existing_user():
+                        if await select_existing_user():
                             menu_active = False
                     elif options[selected_index] == "Marketplace":
-                        marketplace()
+                        await marketplace()
                     elif options[selected_index] == "View Graphs":
-                        view_graphs()
+                        await view_graphs()
                     elif options[selected_index] == "View Avatar":
-                        view_avatar()
+                        await view_avatar()
                     elif options[selected_index] == "Delete User":
-                        delete_user()
+                        await delete_user()
                     elif options[selected_index] == "Quit":
                         running = False
                         return False
@@ -702,692 +2580,1405 @@ def main_menu():
     
     return True
 
-# Exercise game functions
-def chair_sit_exercise_game():
-    """Chair sit exercise game logic"""
-    global user_data, current_user, running, webcam_active
-    
-    # Initialize variables
-    with data_lock:
-        sit_count = 0
-        coins_earned = 0
-        posture_status = "Calibrating..."
-        calibrated = False
-        initial_leg_height = None
-        is_sitting = False
-        was_sitting = False
-        
-        # Set current date
-        today = datetime.now().strftime("%Y-%m-%d")
-        user_data[current_user]['last_exercise_date'] = today
+# Exercise screen rendering
+class TextWidget:
+    """Text label whose surface is cached until its text or color changes"""
+
+    def __init__(self, text_font, position, value, centered=False):
+        self.font = text_font
+        self.position = position
+        self.value = value  # Callable taking time_left and returning (text, color)
+        self.centered = centered
+        self.invalidate()
+
+    def invalidate(self):
+        """Force the widget to be drawn on the next refresh"""
+        self._last_value = None
+        self._rect = None
+
+    def refresh(self, surface, time_left):
+        """Redraw the label if its value changed and return the dirty rectangles"""
+        value = self.value(time_left)
+        if value == self._last_value:
+            return []
+        self._last_value = value
         
-        # Initialize chair sits history
-        if 'chair_sits_history' not in user_data[current_user]:
-            user_data[current_user]['chair_sits_history'] = {}
+        text, color = value
+        text_surface = render_text(self.font, text, True, color)
+        if self.centered:
+            rect = text_surface.get_rect(center=self.position)
+        else:
+            rect = text_surface.get_rect(topleft=self.position)
         
-        if today not in user_data[current_user]['chair_sits_history']:
-            user_data[current_user]['chair_sits_history'][today] = 0
+        # Erase the previous text before drawing the new one
+        dirty = [rect]
+        if self._rect is not None:
+            surface.fill(WHITE, self._rect)
+            dirty.append(self._rect)
+        surface.blit(text_surface, rect)
+        self._rect = rect
+        return dirty
+
+class BarWidget:
+    """Outlined progress bar with an optional label drawn on top"""
+
+    def __init__(self, rect, color, value, label_font=None, label_position=None):
+        self.rect = pygame.Rect(rect)
+        self.color = color
+        self.value = value  # Callable taking time_left and returning (fill width, label)
+        self.label_font = label_font
+        self.label_position = label_position
+        self.invalidate()
+
+    def invalidate(self):
+        """Force the bar to be drawn on the next refresh"""
+        self._last_value = None
+
+    def refresh(self, surface, time_left):
+        """Redraw the bar if its value changed and return the dirty rectangles"""
+        value = self.value(time_left)
+        if value == self._last_value:
+            return []
+        self._last_value = value
         
-        save_user_data(user_data)
+        fill_width, label = value
+        surface.fill(WHITE, self.rect)
+        pygame.draw.rect(surface, BLACK, self.rect, 2)
+        pygame.draw.rect(surface, self.color, (self.rect.x, self.rect.y, fill_width, self.rect.height))
+        if label is not None:
+            surface.blit(render_text(self.label_font, label, True, BLACK), self.label_position)
+        return [self.rect]
+
+async def run_exercise_loop(widgets, game_duration, is_finished=None):
+    """Shared exercise screen loop with a capped frame rate that only redraws changed widgets"""
+    global running
     
-    # Start webcam
-    webcam_active = True
-    start_webcam()
+    clock = FrameClock()
+    start_time = pygame.time.get_ticks()
+    screen.fill(WHITE)
+    for widget in widgets:
+        widget.invalidate()
+    first_frame = True
+    
+    while running and webcam_active:
+        current_time = pygame.time.get_ticks()
+        time_left = max(0, game_duration - (current_time - start_time))
+        
+        # Redraw only the widgets whose values changed
+        dirty_rects = []
+        for widget in widgets:
+            dirty_rects.extend(widget.refresh(screen, time_left))
+        
+        if first_frame:
+            pygame.display.flip()
+            first_frame = False
+        elif dirty_rects:
+            pygame.display.update(dirty_rects)
+        
+        # Check game end conditions
+        if time_left <= 0 or (is_finished is not None and is_finished()):
+            return
+        
+        # Handle input
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+                return
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
+                    return
+        
+        await clock.tick(GAME_FPS)  # The webcam pipeline tasks run in between
+
+def pipeline_ready():
+    """Check whether the camera delivers frames and the pose model is warmed up"""
+    return (pipeline_status["camera"] and pipeline_status["model"]
+            and pipeline_status["frames"] >= PREWARM_FRAMES)
+
+async def run_prewarm_countdown(title):
+    """Countdown that shows camera and pose model readiness, then enables detection"""
+    global running, detection_active
     
-    # Ready countdown
-    countdown_start = 5
+    clock = FrameClock()
     countdown_font = pygame.font.Font(None, 200)
+    start_time = time.perf_counter()
     
-    for countdown in range(countdown_start, 0, -1):
+    while running and webcam_active and pipeline_active:
+        elapsed = time.perf_counter() - start_time
+        remaining = max(0, math.ceil(PREWARM_SECONDS - elapsed))
+        ready = pipeline_ready()
+        if (remaining == 0 and ready) or elapsed > PREWARM_TIMEOUT:
+            break
+        
         screen.fill(WHITE)
-        countdown_text = countdown_font.render(str(countdown), True, RED)
-        countdown_rect = countdown_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2))
+        countdown_text = render_text(countdown_font, str(remaining) if remaining else "...", True, RED)
+        countdown_rect = countdown_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 50))
         screen.blit(countdown_text, countdown_rect)
         
-        ready_instruction = font.render("Get Ready for Chair Sits!", True, BLACK)
-        instruction_rect = ready_instruction.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 200))
+        ready_instruction = render_text(font, title, True, BLACK)
+        instruction_rect = ready_instruction.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 100))
         screen.blit(ready_instruction, instruction_rect)
         
+        # Readiness of each part of the pipeline
+        statuses = [
+            ("Camera", "ready" if pipeline_status["camera"] else "starting..."),
+            ("Pose model", "ready" if pipeline_status["model"] else "warming up..."),
+            ("Frames checked", f"{min(pipeline_status['frames'], PREWARM_FRAMES)}/{PREWARM_FRAMES}"),
+            ("Person", "detected" if pipeline_status["person"] else "step into view"),
+        ]
+        for i, (label, value) in enumerate(statuses):
+            status_text = render_text(small_font, f"{label}: {value}", True, GREEN if value in ("ready", "detected") else BLACK)
+            screen.blit(status_text, (300, SCREEN_HEIGHT//2 + 140 + i * 25))
+        
         pygame.display.flip()
-        pygame.time.delay(1000)
-    
-    # Main game loop
-    game_running = True
-    start_time = pygame.time.get_ticks()
-    game_duration = 60000  # 1 minute
-    
-    while game_running and running and webcam_active:
-        current_time = pygame.time.get_ticks()
-        time_left = max(0, game_duration - (current_time - start_time))
         
-        # Draw game UI
-        screen.fill(WHITE)
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+        
+        await clock.tick(GAME_FPS)
+    
+    detection_active = True
+
+def time_left_fill(game_duration, width):
+    """Progress bar value showing how much of the game time has passed"""
+    return lambda time_left: (width - int((time_left / game_duration) * width), None)
+
+# Exercise registry
+class Exercise(ABC):
+    """An exercise type: its detector, scoring, game screen and how detection results are shown"""
+
+    name = None  # Key used in user data, recordings and on the command line
+    label = None  # Entry in the exercise menu
+    title = None  # Shown during the ready countdown
+    detector = None  # ExerciseDetector subclass
+    duration = 60000  # Game length in milliseconds
+    coin_rate = 5  # Coins per rep
+    history_field = None  # User data field with daily counts (None keeps no history)
+    initial_status = "Standing"  # Status shown before the first detected frame
+
+    def start_session(self, record, today):
+        """Prepare the user's record before play; returns a message to show first, or None"""
+        if self.history_field is not None:
+            record.setdefault(self.history_field, {}).setdefault(today, 0)
+        return None
+
+    def coins_for(self, count):
+        """Coins earned for a session's rep count"""
+        return count * self.coin_rate
+
+    def finish_session(self, record, count):
+        """Exercise-specific changes to the user's record after play"""
+
+    def draw_overlay(self, frame, detector):
+        """Draw exercise targets onto a webcam frame"""
+
+    def detect(self, frame, detector, landmarks, timestamp, previous):
+        """Run the detector on one frame, draw feedback and return the next snapshot"""
+        detector.step(landmarks, timestamp)
+        return previous._replace(count=detector.count, status=detector.state)
+
+    @abstractmethod
+    def widgets(self):
+        """Widgets of the game screen"""
+
+    def is_finished(self, snapshot):
+        """Whether the game ends before its time is up"""
+        return False
+
+    @abstractmethod
+    def result_message(self, count, coins):
+        """Message shown when the game ends"""
+
+EXERCISES = {}  # Registered exercises by name, in menu order
+
+def register_exercise(exercise_class):
+    """Class decorator adding an exercise to the registry; instantiating it checks nothing abstract is left"""
+    EXERCISES[exercise_class.name] = exercise_class()
+    return exercise_class
+
+@register_exercise
+class HandExercise(Exercise):
+    name = "hand"
+    label = "Hand Exercise"
+    title = "Get Ready for Hand Stretches!"
+    detector = HandCoinDetector
+    duration = 120000  # 2 minutes
+    coin_rate = 1  # Every collected coin is kept
+    goal = 15  # Coins that end the game early
+
+    def draw_overlay(self, frame, detector):
+        frame_height, frame_width = frame.shape[:2]
+        cv2.circle(frame, (int(detector.coin_x * frame_width), int(detector.coin_y * frame_height)), 20, GOLD, -1)
+
+    def detect(self, frame, detector, landmarks, timestamp, previous):
+        frame_height, frame_width = frame.shape[:2]
+        coin = (int(detector.coin_x * frame_width), int(detector.coin_y * frame_height))
+        self.draw_overlay(frame, detector)
+        detector.step(landmarks, timestamp)
+        if detector.count > previous.count:
+            cv2.circle(frame, coin, 30, (0, 255, 0), -1)
+        return previous._replace(count=detector.count, coin_x=detector.coin_x, coin_y=detector.coin_y)
+
+    def widgets(self):
+        def current_edge():
+            snapshot = exercise_state.latest()
+            return get_current_edge(snapshot.coin_x, snapshot.coin_y)
         
-        # Display stats
-        sit_text = font.render(f"Chair Sits: {sit_count}", True, BLACK)
-        screen.blit(sit_text, (50, 150))
+        return [
+            TextWidget(font, (650, 50), lambda time_left: (f"Time: {time_left // 1000}s", BLACK)),
+            TextWidget(font, (50, 50), lambda time_left: (f"Coins: {exercise_state.latest().count}/{self.goal}", BLACK)),
+            TextWidget(small_font, (250, 520), lambda time_left: (f"Stretch {current_edge().upper()} to collect the coin", BLACK)),
+        ]
+
+    def is_finished(self, snapshot):
+        return snapshot.count >= self.goal
+
+    def result_message(self, count, coins):
+        return f"Exercise Complete! You collected {count} coins."
+
+@register_exercise
+class SquatExercise(Exercise):
+    name = "squat"
+    label = "Squatting"
+    title = "Get Ready for Squats!"
+    detector = SquatDetector
+    duration = 120000  # 2 minutes
+    history_field = "squats_history"
+
+    def start_session(self, record, today):
+        # Progress restarts every session, less a penalty for missed days
+        record['progress'] = 0
+        message = None
+        last_date = record.get('last_exercise_date')
+        if last_date:
+            last_date = datetime.strptime(last_date, "%Y-%m-%d")
+            today_date = datetime.strptime(today, "%Y-%m-%d")
+            days_missed = (today_date - last_date).days - 1
+            
+            if days_missed > 0:
+                reduction = min(100, 10 * days_missed)
+                record['progress'] = max(0, record['progress'] - reduction)
+                message = f"You missed {days_missed} days. Progress reduced by {reduction}%"
+        super().start_session(record, today)
+        return message
+
+    def coins_for(self, count):
+        return min(count, goal_squats) * self.coin_rate
+
+    def finish_session(self, record, count):
+        record['progress'] += min(100 - record['progress'], min(count, goal_squats) * 100 / goal_squats)
+
+    def detect(self, frame, detector, landmarks, timestamp, previous):
+        detector.step(landmarks, timestamp)
+        snapshot = previous._replace(count=detector.count, status=detector.state, active=detector.is_squatting)
         
-        coins_text = font.render(f"Coins Earned: {coins_earned}", True, GOLD)
-        screen.blit(coins_text, (50, 200))
+        if detector.count > previous.count:
+            # Update progress
+            progress = min(100, (detector.count / goal_squats) * 100)
+            snapshot = snapshot._replace(progress=progress)
+            if current_user in user_data:  # No user when analyzing recordings
+                # The lock only guards user_data and the persistence queue
+                with pipeline_metrics.timed("persist"), data_lock:
+                    log_user_event(current_user, "set", ["progress"], progress)
+        return snapshot
+
+    def widgets(self):
+        def progress_bar(time_left):
+            progress = exercise_state.latest().progress  # Read once so the bar and label agree
+            return int(3 * progress), f"Progress: {progress}%"
         
-        status_text = font.render(f"Status: {posture_status}", True, BLACK)
-        screen.blit(status_text, (50, 250))
+        return [
+            TextWidget(font, (50, 480), lambda time_left: (f"Squats: {exercise_state.latest().count}", BLACK)),
+            TextWidget(font, (650, 480), lambda time_left: (f"Time: {time_left // 1000}s", BLACK)),
+            BarWidget((200, 480, 300, 30), GREEN, progress_bar, small_font, (320, 485)),
+            TextWidget(small_font, (250, 520), lambda time_left: ("Do squats to increase progress. Press ESC to exit.", BLACK)),
+            TextWidget(font, (350, 450), lambda time_left: ("Squatting", RED) if exercise_state.latest().active else ("Stand Straight", BLACK)),
+        ]
+
+    def result_message(self, count, coins):
+        return f"Exercise Complete! You did {count} squats and earned {coins} coins."
+
+@register_exercise
+class WalkingExercise(Exercise):
+    name = "walking"
+    label = "Walking"
+    title = "Get Ready for Walking!"
+    detector = WalkingDetector
+    coin_rate = 10
+    history_field = "walking_history"
+
+    def detect(self, frame, detector, landmarks, timestamp, previous):
+        detector.step(landmarks, timestamp)
+        return previous._replace(count=detector.count, status=detector.state, cadence=detector.cadence)
+
+    def widgets(self):
+        def walking_status(time_left):
+            status = exercise_state.latest().status
+            return f"Status: {status}", GREEN if status == "Walking" else BLACK
         
-        time_text = font.render(f"Time Left: {time_left // 1000}s", True, BLACK)
-        screen.blit(time_text, (650, 50))
+        return [
+            TextWidget(font, (50, 150), walking_status),
+            TextWidget(font, (50, 200), lambda time_left: (f"Walking Bursts: {exercise_state.latest().count}", BLUE)),
+            TextWidget(font, (50, 250), lambda time_left: (f"Cadence: {exercise_state.latest().cadence:.0f} steps/min", BLACK)),
+            TextWidget(font, (650, 50), lambda time_left: (f"Time Left: {time_left // 1000}s", BLACK)),
+            BarWidget((150, 450, 500, 20), (0, 180, 255), time_left_fill(self.duration, 500)),
+            TextWidget(small_font, (200, 520), lambda time_left: ("Walk in place to register walking bursts. Press ESC to exit.", BLACK)),
+        ]
+
+    def result_message(self, count, coins):
+        return f"Exercise Complete! You achieved {count} walking bursts and earned {coins} coins."
+
+@register_exercise
+class ChairSitExercise(Exercise):
+    name = "chair_sit"
+    label = "Chair Sit"
+    title = "Get Ready for Chair Sits!"
+    detector = ChairSitDetector
+    history_field = "chair_sits_history"
+    initial_status = "Calibrating..."
+
+    def detect(self, frame, detector, landmarks, timestamp, previous):
+        detector.step(landmarks, timestamp)
+        if detector.count > previous.count:
+            cv2.putText(frame, "Sit Detected!", (50, 100), cv2.FONT_HERSHEY_SIMPLEX, 
+                        2, (0, 255, 0), 3)
+        return previous._replace(count=detector.count, status=detector.posture_status, active=detector.is_sitting)
+
+    def widgets(self):
+        return [
+            TextWidget(font, (50, 150), lambda time_left: (f"Chair Sits: {exercise_state.latest().count}", BLACK)),
+            TextWidget(font, (50, 200), lambda time_left: (f"Coins Earned: {self.coins_for(exercise_state.latest().count)}", GOLD)),
+            TextWidget(font, (50, 250), lambda time_left: (f"Status: {exercise_state.latest().status}", BLACK)),
+            TextWidget(font, (650, 50), lambda time_left: (f"Time Left: {time_left // 1000}s", BLACK)),
+            BarWidget((150, 450, 500, 20), (0, 180, 255), time_left_fill(self.duration, 500)),
+            TextWidget(small_font, (150, 520), lambda time_left: ("Sit down and stand up to register chair sits. Press ESC to exit.", BLACK)),
+        ]
+
+    def result_message(self, count, coins):
+        return f"Exercise Complete! You did {count} chair sits and earned {coins} coins."
+
+EXERCISE_TYPES = list(EXERCISES)  # Registered exercise names, also used by batch, scoring and stations
+
+# History field of each exercise that keeps daily counts
+HISTORY_FIELDS = {name: exercise.history_field for name, exercise in EXERCISES.items() if exercise.history_field}
+
+# Exercise game functions
+async def run_exercise_game(exercise):
+    """Play one session of an exercise and credit the result to the current user"""
+    global user_data, current_user, running, webcam_active
+    
+    # Initialize variables
+    reset_exercise_state(exercise.initial_status)
+    with data_lock:
+        today = datetime.now().strftime("%Y-%m-%d")
+        message = exercise.start_session(user_data[current_user], today)
+        user_data[current_user]['last_exercise_date'] = today
+        save_user_data(user_data, current_user)
+    
+    # Shown outside the lock so the pipeline and flusher are not held up
+    if message is not None:
+        await show_message(message, 3000)
+    
+    # Start webcam
+    webcam_active = True
+    await start_webcam()
+    
+    # Ready countdown while the camera and pose model warm up
+    await run_prewarm_countdown(exercise.title)
+    
+    if pipeline_status["error"] is not None:
+        webcam_active = False
+        await stop_webcam()
+        await show_message(f"{pipeline_status['error']}. Check that a webcam is connected.", 3000)
+        return
+    
+    # Main game loop
+    await run_exercise_loop(exercise.widgets(), exercise.duration,
+                            is_finished=lambda: exercise.is_finished(exercise_state.latest()))
+    
+    # Clean up
+    webcam_active = False
+    await stop_webcam()
+    
+    # Update user data from the final snapshot
+    count = exercise_state.latest().count
+    with data_lock:
+        coins_earned = exercise.coins_for(count)
+        user_data[current_user]['coins'] += coins_earned
+        exercise.finish_session(user_data[current_user], count)
+        if exercise.history_field is not None:
+            record_session(current_user, exercise.name, today, count)
+        save_user_data(user_data, current_user)
+    
+    # Show results
+    await show_message(exercise.result_message(count, coins_earned), 3000)
+
+# Webcam functions
+class DropOldestQueue:
+    """Bounded asyncio queue that discards the oldest item when full"""
+
+    def __init__(self, maxsize=PIPELINE_QUEUE_SIZE, on_drop=None):
+        self._queue = asyncio.Queue(maxsize=maxsize)
+        self.on_drop = on_drop  # Called with each discarded item, e.g. to recycle its buffer
+        self.dropped = 0  # Frames discarded because the consumer fell behind
+
+    def put(self, item):
+        """Add an item, dropping the oldest one if the queue is full"""
+        while True:
+            try:
+                self._queue.put_nowait(item)
+                return
+            except asyncio.QueueFull:
+                dropped_item = self._queue.get_nowait()
+                self.dropped += 1
+                if self.on_drop is not None:
+                    self.on_drop(dropped_item)
+
+    async def get(self, timeout=PIPELINE_POLL_TIMEOUT):
+        """Return the next item, or None if nothing arrived before the timeout"""
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+class FrameBuffer:
+    """Preallocated arrays one camera frame passes through on its way to the display"""
+
+    def __init__(self, pool, shape):
+        self.pool = pool
+        self.raw = np.empty(shape, dtype=np.uint8)  # cap.read target
+        self.frame = np.empty(shape, dtype=np.uint8)  # Mirrored frame, annotated by the stage holding it
+        self.scaled = np.empty(shape, dtype=np.uint8)  # Downscaled inference input
+        self.rgb = np.empty(shape, dtype=np.uint8)  # Color converted inference input
+        self.view = self.frame.view()  # Read-only view handed to inference and display
+        self.view.flags.writeable = False
+
+    def scratch(self, name, height, width):
+        """Contiguous image of a (possibly cropped or scaled) size in the start of a scratch array"""
+        # A [:height, :width] slice would keep the full row stride, and MediaPipe
+        # rejects read-only input that is not C-contiguous
+        return getattr(self, name).reshape(-1)[:height * width * 3].reshape(height, width, 3)
+
+    def release(self):
+        """Return the buffer to its pool"""
+        self.pool.release(self)
+
+class FrameBufferPool:
+    """Fixed set of frame buffers recycled through the pipeline instead of allocating per frame"""
+
+    def __init__(self, size=FRAME_POOL_SIZE):
+        self.size = size
+        self.shape = None
+        self._free = queue.Queue()
+        self.frames = 0  # Frames that went through a pooled buffer
+        self.allocations = 0  # Arrays allocated by the pool
+        self.opencv_allocations = 0  # Arrays OpenCV allocated because a buffer did not fit
+
+    def _allocate(self, shape):
+        """Replace all buffers with ones of a new frame shape"""
+        self.shape = shape
+        self._free = queue.Queue()
+        for _ in range(self.size):
+            self._free.put(FrameBuffer(self, shape))
+            self.allocations += 4
+
+    def acquire(self, shape):
+        """A free buffer for frames of a shape, or None if all are in use"""
+        if shape != self.shape:
+            self._allocate(shape)  # Buffers of the old shape are dropped as they come back
+        try:
+            buffer = self._free.get_nowait()
+        except queue.Empty:
+            return None
+        self.frames += 1
+        return buffer
+
+    def release(self, buffer):
+        if buffer.frame.shape == self.shape:
+            self._free.put(buffer)
+
+    def check(self, result, buffer_array):
+        """Count an OpenCV call that allocated instead of writing into the buffer"""
+        if result is not buffer_array and not np.may_share_memory(result, buffer_array):
+            self.opencv_allocations += 1
+        return result
+
+    def report(self):
+        """Allocation counts for the session metrics file"""
+        return {"frames": self.frames, "pool_allocations": self.allocations,
+                "opencv_allocations": self.opencv_allocations,
+                # Without the pool every frame allocates read, flip and color conversion arrays
+                "unpooled_allocations_estimate": self.frames * 3}
+
+class QualityController:
+    """Picks the inference input scale, frame skip and model complexity from measured frame latency"""
+
+    def __init__(self, target_fps=TARGET_FPS, levels=QUALITY_LEVELS):
+        self.levels = levels
+        self.budget = 1.0 / target_fps if target_fps > 0 else None  # Seconds per frame, None when fixed
+        self.level = 0
+        self.latency = None  # Smoothed inference latency per displayed frame in seconds
+        self.slow_frames = 0
+        self.fast_frames = 0
+        self.upgrade_frames = QUALITY_UPGRADE_FRAMES  # Grows when raising quality did not hold
+        self.raised = False  # Whether the last change raised quality
+        self.frame_index = 0
+        self.changes = []  # (session seconds, level) for every change
+
+    @property
+    def scale(self):
+        return self.levels[self.level][0]
+
+    @property
+    def skip(self):
+        return self.levels[self.level][1]
+
+    @property
+    def model_complexity(self):
+        return self.levels[self.level][2]
+
+    def model_complexities(self):
+        """Complexities of every level, so their models can be built before play"""
+        if self.budget is None:
+            return [self.model_complexity]
+        return sorted({level[2] for level in self.levels}, reverse=True)
+
+    def should_infer(self):
+        """Whether the next frame goes through the pose model"""
+        infer = self.frame_index % self.skip == 0
+        self.frame_index += 1
+        return infer
+
+    def record(self, seconds):
+        """Feed the latency of a frame that ran inference and move between quality levels"""
+        seconds /= self.skip  # One inference covers the frames predicted after it
+        self.latency = seconds if self.latency is None else self.latency * 0.9 + seconds * 0.1
+        if self.budget is None:
+            return
         
-        # Draw progress bar
-        progress_width = int((time_left / game_duration) * 500)
-        pygame.draw.rect(screen, BLACK, (150, 450, 500, 20), 2)
-        pygame.draw.rect(screen, (0, 180, 255), (150, 450, 500 - progress_width, 20))
+        if self.latency > self.budget:
+            self.slow_frames += 1
+            self.fast_frames = 0
+            if self.slow_frames >= QUALITY_DOWNGRADE_FRAMES and self.level < len(self.levels) - 1:
+                if self.raised:
+                    # The last upgrade could not be sustained; wait longer before the next one
+                    self.upgrade_frames = min(self.upgrade_frames * 2, QUALITY_UPGRADE_FRAMES * 8)
+                self._set_level(self.level + 1)
+        elif self.latency < self.budget * QUALITY_HEADROOM:
+            self.fast_frames += 1
+            self.slow_frames = 0
+            if self.fast_frames >= self.upgrade_frames and self.level > 0:
+                self._set_level(self.level - 1)
+        else:
+            self.slow_frames = self.fast_frames = 0
+
+    def _set_level(self, level):
+        self.raised = level < self.level
+        self.level = level
+        self.latency = None  # Measure the new level from scratch
+        self.slow_frames = self.fast_frames = 0
+        self.frame_index = 0
+        self.changes.append((round(time.perf_counter() - pipeline_metrics.start_time, 2), level))
+
+    def describe(self):
+        """One line description for the overlay"""
+        return (f"Quality {self.level}: {int(self.scale * 100)}% input, "
+                f"infer 1/{self.skip} frames, model {self.model_complexity}")
+
+    def report(self):
+        """Settings and level changes for the session metrics file"""
+        return {"target_fps": round(1.0 / self.budget, 2) if self.budget else None,
+                "final_level": self.level, "changes": self.changes}
+
+class LandmarkPredictor:
+    """Extrapolates landmarks for frames that skip inference from the last two results"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.previous = None  # (time, landmarks) of the inference before the latest
+        self.latest = None
+
+    def update(self, landmarks, timestamp):
+        """Store an inference result; None means the person was lost"""
+        if landmarks is None:
+            self.reset()
+        else:
+            self.previous, self.latest = self.latest, (timestamp, landmarks)
+
+    def predict(self, timestamp):
+        """Landmarks at a time after the latest inference, or None without a person"""
+        if self.latest is None:
+            return None
+        latest_time, latest = self.latest
+        if self.previous is None or latest_time <= self.previous[0]:
+            return latest
+        previous_time, previous = self.previous
         
-        # Draw instructions
-        instruction = small_font.render("Sit down and stand up to register chair sits. Press ESC to exit.", True, BLACK)
-        screen.blit(instruction, (150, 520))
+        # Linear motion, extrapolated at most one inference interval ahead
+        progress = min((timestamp - latest_time) / (latest_time - previous_time), 1.0)
+        predicted = latest.copy()
+        predicted[:, :3] += (latest[:, :3] - previous[:, :3]) * progress
+        return predicted
+
+class RoiTracker:
+    """Crop region around the tracked person, derived from the previous landmarks"""
+
+    def __init__(self):
+        self.box = None  # (x0, y0, x1, y1) in pixels, None searches the full frame
+        self.frames = 0  # Inferences run on a crop
+        self.fallbacks = 0  # Crops that lost the person and were retried on the full frame
+        self.pixel_fraction = 0.0  # Sum of the frame fraction processed per crop
+
+    def reset(self):
+        self.box = None
+
+    def crop(self, frame):
+        """The region of the frame to process; a view, no pixels are copied"""
+        x0, y0, x1, y1 = self.box
+        return frame[y0:y1, x0:x1]
+
+    def to_frame(self, landmarks, frame_width, frame_height):
+        """Map landmarks normalized to the crop back to full-frame coordinates"""
+        x0, y0, x1, y1 = self.box
+        crop_width, crop_height = x1 - x0, y1 - y0
+        mapped = landmarks.copy()
+        mapped[:, 0] = (landmarks[:, 0] * crop_width + x0) / frame_width
+        mapped[:, 1] = (landmarks[:, 1] * crop_height + y0) / frame_height
+        mapped[:, 2] = landmarks[:, 2] * crop_width / frame_width  # z shares the x scale
+        return mapped
+
+    def update(self, landmarks, frame_width, frame_height):
+        """Derive the next crop from full-frame landmarks; None falls back to full-frame search"""
+        if landmarks is None:
+            self.box = None
+            return
+        points = landmarks[landmarks[:, 3] >= 0.5, :2]
+        if len(points) < 2:
+            points = landmarks[:, :2]
+        left, top = points.min(axis=0) * (frame_width, frame_height)
+        right, bottom = points.max(axis=0) * (frame_width, frame_height)
         
-        pygame.display.flip()
+        if self.box is not None:
+            # Keep the same crop while the person stays well inside it, so
+            # MediaPipe's tracking sees a steady input
+            x0, y0, x1, y1 = self.box
+            margin_x, margin_y = (x1 - x0) * ROI_MARGIN, (y1 - y0) * ROI_MARGIN
+            if left > x0 + margin_x and right < x1 - margin_x and top > y0 + margin_y and bottom < y1 - margin_y:
+                return
         
-        # Check game end condition
-        if time_left <= 0:
-            game_running = False
+        pad = ROI_PADDING * max(right - left, bottom - top)
+        half_width = max((right - left) / 2 + pad, ROI_MIN_SIZE * min(frame_width, frame_height) / 2)
+        half_height = max((bottom - top) / 2 + pad, ROI_MIN_SIZE * min(frame_width, frame_height) / 2)
+        center_x, center_y = (left + right) / 2, (top + bottom) / 2
+        x0, x1 = max(0, int(center_x - half_width)), min(frame_width, int(center_x + half_width))
+        y0, y1 = max(0, int(center_y - half_height)), min(frame_height, int(center_y + half_height))
         
-        # Handle input
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-                game_running = False
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE:
-                    game_running = False
+        if x1 - x0 < 2 or y1 - y0 < 2 or (x1 - x0) * (y1 - y0) > ROI_MAX_AREA * frame_width * frame_height:
+            self.box = None  # Cropping would save little
+        else:
+            self.box = (x0, y0, x1, y1)
+
+    def report(self):
+        """Crop usage for the session metrics file"""
+        return {"crop_frames": self.frames, "fallbacks": self.fallbacks,
+                "mean_pixel_fraction": round(self.pixel_fraction / self.frames, 3) if self.frames else None}
+
+def draw_pose(frame, landmarks):
+    """Draw a landmark array in the style of MediaPipe's draw_landmarks"""
+    height, width = frame.shape[:2]
+    points = (landmarks[:, :2] * (width, height)).astype(np.int32).tolist()
+    visible = (landmarks[:, 3] >= 0.5).tolist()
+    for start, end in mp_pose.POSE_CONNECTIONS:
+        if visible[start] and visible[end]:
+            cv2.line(frame, tuple(points[start]), tuple(points[end]), (224, 224, 224), 2)
+    for point, shown in zip(points, visible):
+        if shown:
+            cv2.circle(frame, tuple(point), 2, (0, 0, 255), -1)
+
+async def start_webcam():
+    """Open the webcam and start the pipeline as a scheduler task"""
+    global cap, webcam_task, pipeline_active, landmark_recorder, detection_active, pipeline_metrics, quality_controller, roi_tracker, frame_pool
+    
+    # Reset pipeline statistics
+    pipeline_metrics = PipelineMetrics()
+    quality_controller = QualityController(target_fps)
+    roi_tracker = RoiTracker()
+    frame_pool = FrameBufferPool()
+    pipeline_status.update(camera=False, model=False, frames=0, person=False, error=None)
+    pipeline_active = True
+    detection_active = False
+    
+    if replay_file is not None:
+        # Play a recorded session instead of opening the camera
+        pipeline_status.update(camera=True, model=True, frames=PREWARM_FRAMES)
+        webcam_task = scheduler.spawn(process_replay(ReplaySource(replay_file)))
+        return
+    
+    cap = await scheduler.run_blocking(cv2.VideoCapture, 0)  # Opening a camera can take a while
+    
+    if landmark_record_dir is not None:
+        os.makedirs(landmark_record_dir, exist_ok=True)
+        file_name = f"{current_user}_{exercise_type}_{datetime.now().strftime('%Y%m%d_%H%M%S')}{LANDMARK_FILE_EXTENSION}"
+        landmark_recorder = LandmarkRecorder(os.path.join(landmark_record_dir, file_name),
+                                             int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                                             int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    
+    webcam_task = scheduler.spawn(process_webcam())
+
+async def stop_webcam():
+    """Stop the pipeline and release webcam resources"""
+    global cap, webcam_task, pipeline_active, landmark_recorder
+    pipeline_active = False
+    
+    # Let the pipeline drain before releasing the camera
+    if webcam_task is not None:
+        task, webcam_task = webcam_task, None
+        try:
+            await task
+        except asyncio.CancelledError:
+            if not task.cancelled():
+                raise  # stop_webcam itself was cancelled
+        except Exception as e:
+            # The camera and recorder still need releasing
+            print(f"Webcam pipeline failed: {e!r}")
+    
+    if cap is not None:
+        cap.release()
+        cv2.destroyAllWindows()
+    
+    if landmark_recorder is not None:
+        landmark_recorder.close()
+        landmark_recorder = None
+
+def pipeline_running():
+    """Check whether the webcam pipeline should keep processing"""
+    return pipeline_active and webcam_active and running
+
+def read_frame(buffer, shape):
+    """Read and mirror one webcam frame into a pooled buffer; returns the buffer used, or None"""
+    stage_start = time.perf_counter()
+    ret, raw = cap.read(buffer.raw)
+    if not ret:
+        buffer.release()
+        return None
+    read_done = time.perf_counter()
+    pipeline_metrics.record("cap.read", read_done - stage_start)
+    
+    if raw.shape != shape:
+        # The camera delivers a different size than it reported; resize the pool
+        frame_pool.opencv_allocations += 1
+        buffer = frame_pool.acquire(raw.shape)
+        if buffer is None:
+            return None
+    else:
+        frame_pool.check(raw, buffer.raw)
+    
+    frame_pool.check(cv2.flip(raw, 1, dst=buffer.frame), buffer.frame)  # Mirror the frame
+    stage_end = time.perf_counter()
+    pipeline_metrics.record("flip", stage_end - read_done)
+    pipeline_metrics.record("capture", stage_end - stage_start)
+    return buffer
+
+async def capture_stage(capture_queue):
+    """Pipeline stage: read and mirror frames from the webcam on the executor"""
+    global pipeline_active
+    
+    if not cap.isOpened():
+        # Stop the pipeline so the countdown does not wait for frames that never come
+        pipeline_status["error"] = "Camera unavailable"
+        pipeline_active = False
+        cap.release()
+        return
     
-    # Clean up
-    webcam_active = False
-    stop_webcam()
+    shape = (int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or 480, int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or 640, 3)
     
-    # Update user data
-    with data_lock:
-        coins_earned = sit_count * 5
-        user_data[current_user]['coins'] += coins_earned
-        user_data[current_user]['chair_sits_history'][today] = sit_count
-        save_user_data(user_data)
+    while pipeline_running() and cap.isOpened():
+        buffer = frame_pool.acquire(shape)
+        if buffer is None:
+            await asyncio.sleep(1 / GAME_FPS)  # Every buffer is still in use downstream
+            continue
+        
+        buffer = await scheduler.run_blocking(read_frame, buffer, shape)
+        if buffer is None:
+            if frame_pool.shape == shape:
+                pipeline_active = False  # The camera stopped delivering frames
+                break
+            shape = frame_pool.shape
+            continue
+        
+        shape = buffer.frame.shape
+        pipeline_status["camera"] = True
+        capture_queue.put(buffer)
+
+def warm_up_pose():
+    """Build the pose models and run dummy inferences so the first real frame is fast"""
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or 640
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or 480
+    blank_frame = np.zeros((height, width, 3), dtype=np.uint8)
+    # Every model the quality controller may switch to is built now, not mid-session
+    for model_complexity in quality_controller.model_complexities():
+        model = get_pose(model_complexity)
+        for _ in range(PREWARM_INFERENCES):
+            model.process(blank_frame)
+    pipeline_status["model"] = True
+
+def run_pose(image, controller, buffer):
+    """Run pose estimation on a BGR image at the controller's scale and model complexity"""
+    if controller.scale < 1.0:
+        # Landmarks are normalized, so a smaller input needs no mapping back
+        height, width = image.shape[:2]
+        size = (max(1, int(width * controller.scale)), max(1, int(height * controller.scale)))
+        scaled = buffer.scratch("scaled", size[1], size[0])
+        with pipeline_metrics.timed("resize"):
+            image = frame_pool.check(cv2.resize(image, size, dst=scaled, interpolation=cv2.INTER_LINEAR), scaled)
     
-    # Show results
-    show_message(f"Exercise Complete! You did {sit_count} chair sits and earned {coins_earned} coins.", 3000)
+    # Convert to RGB for MediaPipe
+    rgb_image = buffer.scratch("rgb", image.shape[0], image.shape[1])
+    with pipeline_metrics.timed("cvtColor"):
+        rgb_image = frame_pool.check(cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=rgb_image), rgb_image)
+    if rgb_image.flags.c_contiguous:
+        rgb_image.flags.writeable = False  # Lets MediaPipe use the pixels without copying them
+    
+    # Process with MediaPipe
+    with pipeline_metrics.timed("pose.process"):
+        results = get_pose(controller.model_complexity).process(rgb_image)
+    
+    if results.pose_landmarks is None:
+        return None
+    return landmarks_to_array(results.pose_landmarks)
 
-def hand_exercise_game():
-    """Hand exercise game logic"""
-    global coin_x, coin_y, coins_collected, user_data, current_user, running, webcam_active
+def infer_landmarks(buffer, controller, roi):
+    """Full-frame landmarks of the person, processing only their region once they are tracked"""
+    frame = buffer.view
+    frame_height, frame_width, _ = frame.shape
+    pipeline_status["frames"] += 1
     
-    # Initialize coin position
-    coin_x, coin_y = generate_edge_coin_position()
+    landmarks = None
+    if roi.box is not None:
+        x0, y0, x1, y1 = roi.box
+        roi.frames += 1
+        roi.pixel_fraction += (x1 - x0) * (y1 - y0) / (frame_width * frame_height)
+        landmarks = run_pose(roi.crop(frame), controller, buffer)
+        if landmarks is None:
+            roi.fallbacks += 1  # Lost the person; search the whole frame below
+        else:
+            landmarks = roi.to_frame(landmarks, frame_width, frame_height)
     
-    # Initialize variables
-    with data_lock:
-        coins_collected = 0
-        user_data[current_user]['last_exercise_date'] = datetime.now().strftime("%Y-%m-%d")
-        save_user_data(user_data)
+    if landmarks is None:
+        landmarks = run_pose(frame, controller, buffer)
     
-    # Start webcam
-    webcam_active = True
-    start_webcam()
+    roi.update(landmarks, frame_width, frame_height)
+    return landmarks
+
+def process_frame(buffer, predictor, timestamp=None, detect_landmarks=None):
+    """Pose, drawing and exercise detection for one frame; runs on the executor.
     
-    # Main game loop
-    game_running = True
-    start_time = pygame.time.get_ticks()
-    game_duration = 120000  # 2 minutes
-    current_edge = get_current_edge(coin_x, coin_y)
+    The benchmark passes nominal frame times and its synthetic landmarks, so rep
+    counts do not depend on the machine's speed or on what the model sees.
+    """
+    stage_start = time.perf_counter()
+    timestamp = stage_start if timestamp is None else timestamp
+    frame = buffer.frame  # Annotations are drawn in place; pose only sees the read-only view
+    frame_height, frame_width, _ = frame.shape
     
-    while game_running and running and webcam_active:
-        current_time = pygame.time.get_ticks()
-        time_left = max(0, game_duration - (current_time - start_time))
-        
-        # Draw game UI
-        screen.fill(WHITE)
-        
-        # Display timer
-        time_text = font.render(f"Time: {time_left // 1000}s", True, BLACK)
-        screen.blit(time_text, (650, 50))
-        
-        # Display coins collected
-        coins_text = font.render(f"Coins: {coins_collected}/15", True, BLACK)
-        screen.blit(coins_text, (50, 50))
-        
-        # Display instructions
-        instruction = small_font.render(f"Stretch {current_edge.upper()} to collect the coin", True, BLACK)
-        screen.blit(instruction, (250, 520))
-        
-        pygame.display.flip()
-        
-        # Check game end conditions
-        if time_left <= 0 or coins_collected >= 15:
-            game_running = False
-        
-        # Handle input
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-                game_running = False
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE:
-                    game_running = False
+    inferred = quality_controller.should_infer()
+    if inferred:
+        landmarks = infer_landmarks(buffer, quality_controller, roi_tracker)
+        predictor.update(landmarks, timestamp)
+        pipeline_status["person"] = landmarks is not None
+    else:
+        # Skipped frame: carry the pose forward from the last inferences
+        with pipeline_metrics.timed("predict"):
+            landmarks = predictor.predict(timestamp)
     
-    # Clean up
-    webcam_active = False
-    stop_webcam()
+    if landmarks is not None:
+        # Draw pose landmarks
+        with pipeline_metrics.timed("draw_landmarks"):
+            draw_pose(frame, landmarks)
     
-    # Update user data
-    with data_lock:
-        user_data[current_user]['coins'] += coins_collected
-        save_user_data(user_data)
+    if detect_landmarks is None:
+        detect_landmarks = landmarks
+    if detect_landmarks is not None and detection_active:
+        if landmark_recorder is not None:
+            landmark_recorder.write(detect_landmarks)
+        with pipeline_metrics.timed(f"detect:{exercise_type}"):
+            detect_exercise(frame, detect_landmarks, frame_width, frame_height, timestamp)
     
-    # Show results
-    show_message(f"Exercise Complete! You collected {coins_collected} coins.", 3000)
+    stage_seconds = time.perf_counter() - stage_start
+    pipeline_metrics.record("inference", stage_seconds)
+    if inferred:
+        # Predicted frames are cheap and would make inference look faster than it is
+        quality_controller.record(stage_seconds)
 
-def squat_exercise_game():
-    """Squat exercise game logic"""
-    global squats_count, is_squatting, was_squatting, user_data, current_user, running, webcam_active
+async def inference_stage(capture_queue, display_queue):
+    """Pipeline stage: run pose estimation and exercise detection on the executor"""
+    # Warm up while the countdown runs; capture keeps only the newest frames meanwhile
+    await scheduler.run_blocking(warm_up_pose)
+    predictor = LandmarkPredictor()
     
-    # Initialize variables
-    with data_lock:
-        squats_count = 0
-        is_squatting = False
-        was_squatting = False
-        squat_state = "standing"
-        
-        # Reset progress
-        user_data[current_user]['progress'] = 0
-        save_user_data(user_data)
-        
-        # Check for missed days and apply penalty
-        today = datetime.now().strftime("%Y-%m-%d")
-        last_date = user_data[current_user].get('last_exercise_date')
+    while pipeline_running():
+        buffer = await capture_queue.get()
+        if buffer is None:
+            continue
+        await scheduler.run_blocking(process_frame, buffer, predictor)
+        display_queue.put(buffer)
+
+async def display_stage(capture_queue, display_queue):
+    """Pipeline stage: show processed frames with the metrics overlay"""
+    global pipeline_active, metrics_overlay
+    
+    while pipeline_running():
+        buffer = await display_queue.get()
+        if buffer is None:
+            continue
         
-        if last_date:
-            last_date = datetime.strptime(last_date, "%Y-%m-%d")
-            today_date = datetime.strptime(today, "%Y-%m-%d")
-            days_missed = (today_date - last_date).days - 1
-            
-            if days_missed > 0:
-                reduction = min(100, 10 * days_missed)
-                user_data[current_user]['progress'] = max(0, user_data[current_user]['progress'] - reduction)
-                show_message(f"You missed {days_missed} days. Progress reduced by {reduction}%", 3000)
+        stage_start = time.perf_counter()
+        frame = buffer.frame
+        pipeline_metrics.frame_shown()
+        pipeline_metrics.dropped_frames = capture_queue.dropped + display_queue.dropped
         
-        user_data[current_user]['last_exercise_date'] = today
+        # Overlay pipeline metrics
+        if metrics_overlay:
+            for i, line in enumerate([quality_controller.describe()] + pipeline_metrics.overlay_lines()):
+                cv2.putText(frame, line, (10, 20 + i * 18), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (255, 255, 0), 1)
         
-        # Initialize squats history
-        if 'squats_history' not in user_data[current_user]:
-            user_data[current_user]['squats_history'] = {}
+        # Display frame
+        with pipeline_metrics.timed("imshow"):
+            cv2.imshow("Exercise Tracker", buffer.view)
+            key = cv2.waitKey(1) & 0xFF
+        buffer.release()  # imshow has copied the pixels into the window
         
-        if today not in user_data[current_user]['squats_history']:
-            user_data[current_user]['squats_history'][today] = 0
+        # Exit on 'q' key, toggle the overlay with 'm'
+        if key == ord('q'):
+            pipeline_active = False
+        elif key == ord('m'):
+            metrics_overlay = not metrics_overlay
         
-        save_user_data(user_data)
+        pipeline_metrics.record("display", time.perf_counter() - stage_start)
+
+def dump_session_metrics():
+    """Write the session's metrics to METRICS_DIR and print a summary"""
+    summary = pipeline_metrics.summary()
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    path = os.path.join(METRICS_DIR, f"metrics_{current_user}_{exercise_type}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    pipeline_metrics.dump(path, quality=quality_controller.report(), roi=roi_tracker.report(),
+                          frame_buffers=frame_pool.report())
     
-    # Start webcam
-    webcam_active = True
-    start_webcam()
+    stages = ", ".join(f"{stage} p95 {stats['p95_ms']:.1f}ms" for stage, stats in summary["stages"].items())
+    print(f"Session metrics: {summary['average_fps']} FPS, {summary['dropped_frames']} frames dropped, "
+          f"{len(quality_controller.changes)} quality changes (final level {quality_controller.level}), "
+          f"{frame_pool.allocations + frame_pool.opencv_allocations} frame arrays allocated over {frame_pool.frames} frames, "
+          f"data_lock wait {summary['data_lock_wait']['total_ms']:.0f}ms; {stages}. Written to {path}")
+
+async def process_webcam():
+    """Run the capture, inference and display stages as a pipeline of tasks"""
+    capture_queue = DropOldestQueue(on_drop=FrameBuffer.release)
+    display_queue = DropOldestQueue(on_drop=FrameBuffer.release)
     
-    # Ready countdown
-    countdown_start = 5
-    countdown_font = pygame.font.Font(None, 200)
+    # Capture and inference wait on the executor at the same time, so camera
+    # I/O overlaps with pose estimation
+    stages = [
+        scheduler.spawn(capture_stage(capture_queue)),
+        scheduler.spawn(inference_stage(capture_queue, display_queue)),
+    ]
     
-    for countdown in range(countdown_start, 0, -1):
-        screen.fill(WHITE)
-        countdown_text = countdown_font.render(str(countdown), True, RED)
-        countdown_rect = countdown_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2))
-        screen.blit(countdown_text, countdown_rect)
-        
-        ready_instruction = font.render("Get Ready for Squats!", True, BLACK)
-        instruction_rect = ready_instruction.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 200))
-        screen.blit(ready_instruction, instruction_rect)
-        
-        pygame.display.flip()
-        pygame.time.delay(1000)
+    # Display stays on the loop thread alongside cv2.waitKey
+    await display_stage(capture_queue, display_queue)
     
-    # Main game loop
-    game_running = True
-    start_time = pygame.time.get_ticks()
-    game_duration = 120000  # 2 minutes
+    for result in await asyncio.gather(*stages, return_exceptions=True):
+        if isinstance(result, Exception):
+            print(f"Webcam pipeline stage failed: {result!r}")
     
-    while game_running and running and webcam_active:
-        current_time = pygame.time.get_ticks()
-        time_left = max(0, game_duration - (current_time - start_time))
-        
-        # Draw game UI
-        screen.fill(WHITE)
-        
-        # Display stats
-        squats_text = font.render(f"Squats: {squats_count}", True, BLACK)
-        screen.blit(squats_text, (50, 480))
-        
-        time_text = font.render(f"Time: {time_left // 1000}s", True, BLACK)
-        screen.blit(time_text, (650, 480))
-        
-        # Draw progress bar
-        progress = user_data[current_user]['progress']
-        pygame.draw.rect(screen, BLACK, (200, 480, 300, 30), 2)
-        pygame.draw.rect(screen, GREEN, (200, 480, int(3 * progress), 30))
-        progress_text = small_font.render(f"Progress: {progress}%", True, BLACK)
-        screen.blit(progress_text, (320, 485))
-        
-        # Draw instructions
-        instruction = small_font.render("Do squats to increase progress. Press ESC to exit.", True, BLACK)
-        screen.blit(instruction, (250, 520))
-        
-        # Display squat status
-        squat_status = font.render("Squatting" if is_squatting else "Stand Straight", True, RED if is_squatting else BLACK)
-        screen.blit(squat_status, (350, 450))
-        
-        pygame.display.flip()
-        
-        # Check game end condition
-        if time_left <= 0:
-            game_running = False
-        
-        # Handle input
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-                game_running = False
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE:
-                    game_running = False
+    pipeline_metrics.dropped_frames = capture_queue.dropped + display_queue.dropped
+    dump_session_metrics()
     
     # Clean up
-    webcam_active = False
-    stop_webcam()
+    if cap is not None:
+        cap.release()
+    cv2.destroyAllWindows()
+
+async def process_replay(source):
+    """Feed a recorded session through exercise detection at its recorded pace"""
+    recording = source.recording
+    frame = np.zeros((recording.frame_height, recording.frame_width, 3), dtype=np.uint8)
     
-    # Update user data
-    with data_lock:
-        user_data[current_user]['squats_history'][today] = squats_count
-        
-        # Calculate progress and coins
-        progress_increase = min(100 - user_data[current_user]['progress'], 
-                                min(squats_count, goal_squats) * 100 / goal_squats)
-        user_data[current_user]['progress'] += progress_increase
-        
-        coins_earned = min(squats_count, goal_squats) * 5
-        user_data[current_user]['coins'] += coins_earned
-        
-        save_user_data(user_data)
+    # Start playback when the countdown ends
+    while pipeline_running() and not detection_active:
+        await asyncio.sleep(PIPELINE_POLL_TIMEOUT)
     
-    # Show results
-    show_message(f"Exercise Complete! You did {squats_count} squats and earned {coins_earned} coins.", 3000)
+    async for timestamp, landmarks in source.frames():
+        if not pipeline_running():
+            break
+        detect_exercise(frame, landmarks, recording.frame_width, recording.frame_height, timestamp)
 
-def walking_exercise_game():
-    """Walking exercise game logic"""
-    global walking_bursts, walking_state, last_walking_state, center_history, still_counter
-    global user_data, current_user, running, webcam_active
+def detect_exercise(frame, landmarks, frame_width, frame_height, timestamp=None):
+    """Run exercise detection for the current exercise type on one frame and publish the new state"""
+    # Detectors are only touched by the pipeline (and reset before it starts), so no lock is needed
+    detector = active_detectors.get(exercise_type)
+    if detector is None:
+        detector = create_detector(exercise_type, frame_width, frame_height)
+        active_detectors[exercise_type] = detector
+    previous = exercise_state.latest()
+    snapshot = EXERCISES[exercise_type].detect(frame, detector, landmarks, timestamp, previous)
+    exercise_state.publish(snapshot._replace(frame=previous.frame + 1))
+
+def reset_exercise_state(status=Exercise.initial_status):
+    """Clear the detectors and publish a fresh snapshot before a new session"""
+    active_detectors.clear()  # Fresh detectors are built on the first frame
+    coin_x, coin_y = generate_edge_coin_position()
+    exercise_state.publish(ExerciseSnapshot(0, status, False, coin_x, coin_y, 0, 0.0, 0))
+
+# Batch analysis functions
+def init_batch_worker():
+    """Give each batch worker process its own MediaPipe pose model"""
+    global pose
+    load_mediapipe()
+    pose = mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5)
+
+def analyze_video(path, exercises=EXERCISE_TYPES, options=None, record_dir=None):
+    """Run the exercise detectors over a recorded video and return its rep counts and timings"""
+    # Reproducible coin positions for the hand exercise
+    random.seed(path)
     
-    # Movement detection constants
-    CENTER_MOVE_THRESHOLD = 20
-    SMOOTH_FRAMES = 5
-    STILL_FRAMES_THRESHOLD = 10
+    result = {"file": path, "frames": 0, "video_seconds": 0.0, "processing_seconds": 0.0,
+              "counts": {}, "rep_times": {}, "cadence": None, "error": None}
     
-    # Initialize variables
-    with data_lock:
-        walking_bursts = 0
-        walking_state = "Standing"
-        last_walking_state = "Standing"
-        center_history = []
-        still_counter = 0
-        
-        # Set current date
-        today = datetime.now().strftime("%Y-%m-%d")
-        user_data[current_user]['last_exercise_date'] = today
-        save_user_data(user_data)
+    video = cv2.VideoCapture(path)
+    if not video.isOpened():
+        result["error"] = "Could not open video"
+        return result
     
-    # Start webcam
-    webcam_active = True
-    start_webcam()
+    start = time.perf_counter()
+    landmark_frames = []  # Landmarks of every frame with a detected pose
+    timestamps = []  # Video time of those frames in seconds
+    frame_width, frame_height = 640, 480
+    try:
+        while True:
+            ret, frame = video.read()
+            if not ret:
+                break
+            
+            result["frames"] += 1
+            video_time = video.get(cv2.CAP_PROP_POS_MSEC) / 1000
+            result["video_seconds"] = video_time
+            
+            # Same preprocessing as the live webcam path
+            frame = cv2.flip(frame, 1)
+            frame_height, frame_width, _ = frame.shape
+            results = pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            if results.pose_landmarks:
+                landmark_frames.append(landmarks_to_array(results.pose_landmarks))
+                timestamps.append(video_time)
+    finally:
+        video.release()
     
-    # Ready countdown
-    countdown_start = 5
-    countdown_font = pygame.font.Font(None, 200)
+    # Score the whole landmark sequence at once for each exercise
+    landmarks = np.array(landmark_frames, dtype=np.float32).reshape(-1, NUM_LANDMARKS, 4)
+    timestamps = np.array(timestamps)
     
-    for countdown in range(countdown_start, 0, -1):
-        screen.fill(WHITE)
-        countdown_text = countdown_font.render(str(countdown), True, RED)
-        countdown_rect = countdown_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2))
-        screen.blit(countdown_text, countdown_rect)
-        
-        ready_instruction = font.render("Get Ready for Walking!", True, BLACK)
-        instruction_rect = ready_instruction.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 200))
-        screen.blit(ready_instruction, instruction_rect)
-        
-        pygame.display.flip()
-        pygame.time.delay(1000)
+    if record_dir is not None:
+        # Keep the landmarks so the video can be re-scored without inference
+        record_path = os.path.join(record_dir, os.path.splitext(os.path.basename(path))[0] + LANDMARK_FILE_EXTENSION)
+        recorder = LandmarkRecorder(record_path, frame_width, frame_height)
+        for timestamp, frame_landmarks in zip(timestamps, landmarks):
+            recorder.write(frame_landmarks, timestamp)
+        recorder.close()
+        result["recording"] = record_path
     
-    # Main game loop
-    game_running = True
-    start_time = pygame.time.get_ticks()
-    game_duration = 60000  # 1 minute
+    for exercise in exercises:
+        detector = create_detector(exercise, frame_width, frame_height, options)
+        reps = detector.run(landmarks, timestamps)
+        new_rep = np.diff(reps, prepend=0) > 0
+        result["counts"][exercise] = detector.count
+        result["rep_times"][exercise] = np.round(timestamps[new_rep], 3).tolist()
+        if exercise == "walking":
+            result["cadence"] = round(detector.cadence, 1)  # Steps per minute at the end of the video
     
-    while game_running and running and webcam_active:
-        current_time = pygame.time.get_ticks()
-        time_left = max(0, game_duration - (current_time - start_time))
-        
-        # Draw game UI
-        screen.fill(WHITE)
-        
-        # Display stats
-        status_text = font.render(f"Status: {walking_state}", True, GREEN if walking_state == "Walking" else BLACK)
-        screen.blit(status_text, (50, 150))
-        
-        bursts_text = font.render(f"Walking Bursts: {walking_bursts}", True, BLUE)
-        screen.blit(bursts_text, (50, 200))
-        
-        time_text = font.render(f"Time Left: {time_left // 1000}s", True, BLACK)
-        screen.blit(time_text, (650, 50))
-        
-        # Draw progress bar
-        progress_width = int((time_left / game_duration) * 500)
-        pygame.draw.rect(screen, BLACK, (150, 450, 500, 20), 2)
-        pygame.draw.rect(screen, (0, 180, 255), (150, 450, 500 - progress_width, 20))
-        
-        # Draw instructions
-        instruction = small_font.render("Walk in place to register walking bursts. Press ESC to exit.", True, BLACK)
-        screen.blit(instruction, (200, 520))
-        
-        pygame.display.flip()
-        
-        # Check game end condition
-        if time_left <= 0:
-            game_running = False
-        
-        # Handle input
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-                game_running = False
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE:
-                    game_running = False
+    result["processing_seconds"] = time.perf_counter() - start
+    return result
+
+def collect_video_files(paths):
+    """Expand directories into the video files they contain"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, name) for name in sorted(names)
+                             if name.lower().endswith(VIDEO_EXTENSIONS))
+        else:
+            files.append(path)
+    return files
+
+def run_batch_analysis(paths, exercises=EXERCISE_TYPES, workers=None, output_file=BATCH_OUTPUT_FILE,
+                       options=None, record_dir=None):
+    """Score recorded videos across a process pool and write one result per file"""
+    files = collect_video_files(paths)
+    if not files:
+        print("No video files found.")
+        return []
+    if record_dir is not None:
+        os.makedirs(record_dir, exist_ok=True)
     
-    # Clean up
-    webcam_active = False
-    stop_webcam()
+    results = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_batch_worker) as executor, \
+            open(output_file, "w") as output:
+        futures = {executor.submit(analyze_video, path, exercises, options, record_dir): path for path in files}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"file": futures[future], "error": str(e)}
+            results.append(result)
+            
+            # Write each result as soon as its file is done
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+            
+            if result.get("error"):
+                print(f"{result['file']}: error: {result['error']}")
+            else:
+                counts = ", ".join(f"{exercise} {count}" for exercise, count in result["counts"].items())
+                print(f"{result['file']}: {counts} ({result['frames']} frames in {result['processing_seconds']:.1f}s)")
     
-    # Update user data
-    with data_lock:
-        coins_earned = walking_bursts * 10
-        user_data[current_user]['coins'] += coins_earned
+    total_frames = sum(result.get("frames", 0) for result in results)
+    elapsed = time.perf_counter() - start
+    print(f"Analyzed {len(results)} files, {total_frames} frames in {elapsed:.1f}s "
+          f"({total_frames / elapsed if elapsed else 0:.1f} frames/s). Results written to {output_file}")
+    return results
+
+# Station functions
+def parse_station(spec):
+    """Parse a SOURCE:USER:EXERCISE station spec; SOURCE is a camera index or a video file"""
+    parts = spec.rsplit(":", 2)  # Video paths may contain colons, e.g. Windows drive letters
+    if len(parts) != 3 or parts[2] not in EXERCISE_TYPES:
+        raise ValueError(f"Station '{spec}' should look like SOURCE:USER:EXERCISE "
+                         f"with EXERCISE one of {', '.join(EXERCISE_TYPES)}")
+    source, user, exercise = parts
+    return int(source) if source.isdigit() else source, user, exercise
+
+class TrackingSession:
+    """One station: a capture source with its own pose model, detector state and user"""
+
+    def __init__(self, station_id, source, user, exercise, options=None):
+        self.station_id = station_id
+        self.source = source
+        self.user = user
+        self.exercise = exercise
+        self.options = options
+        self.capture = None
+        self.pose = None
+        self.detector = None
+        self.buffer = None
+        self.frames = 0
+        self.person = False
+        self.start_time = None
+
+    def open(self):
+        """Open the capture source and build the pose model and detector"""
+        self.capture = cv2.VideoCapture(self.source)
+        if not self.capture.isOpened():
+            raise RuntimeError(f"Cannot open capture source {self.source}")
+        width = int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH)) or 640
+        height = int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT)) or 480
+        self.buffer = FrameBufferPool(1).acquire((height, width, 3))
+        load_mediapipe()
+        self.pose = mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5)
+        self.detector = create_detector(self.exercise, width, height, self.options)
+        self.start_time = time.perf_counter()
+
+    def step(self):
+        """Process one frame; returns False when the source has no more frames"""
+        ret, raw = self.capture.read(self.buffer.raw)
+        if not ret:
+            return False
+        if raw.shape != self.buffer.frame.shape:
+            self.buffer = FrameBufferPool(1).acquire(raw.shape)
         
-        # Initialize walking history if needed
-        if 'walking_history' not in user_data[current_user]:
-            user_data[current_user]['walking_history'] = {}
+        frame = cv2.flip(raw, 1, dst=self.buffer.frame)  # Mirror the frame
+        rgb_frame = cv2.cvtColor(self.buffer.view, cv2.COLOR_BGR2RGB, dst=self.buffer.rgb)
+        rgb_frame.flags.writeable = False
+        results = self.pose.process(rgb_frame)
+        rgb_frame.flags.writeable = True
+        self.frames += 1
         
-        today = datetime.now().strftime("%Y-%m-%d")
-        user_data[current_user]['walking_history'][today] = walking_bursts
+        self.person = results.pose_landmarks is not None
+        if self.person:
+            landmarks = landmarks_to_array(results.pose_landmarks)
+            draw_pose(frame, landmarks)
+            self.detector.step(landmarks, time.perf_counter())
+        EXERCISES[self.exercise].draw_overlay(frame, self.detector)
+        return True
+
+    def status(self):
+        """Current counts and throughput, sent to the dashboard"""
+        elapsed = time.perf_counter() - self.start_time
+        return {
+            "station": self.station_id,
+            "user": self.user,
+            "exercise": self.exercise,
+            "count": self.detector.count,
+            "state": getattr(self.detector, "state", ""),
+            "person": self.person,
+            "frames": self.frames,
+            "fps": round(self.frames / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+
+    def tile(self):
+        """Downscaled copy of the annotated frame for the dashboard"""
+        return cv2.resize(self.buffer.view, STATION_TILE_SIZE, interpolation=cv2.INTER_AREA)
+
+    def close(self):
+        if self.capture is not None:
+            self.capture.release()
+        if self.pose is not None:
+            self.pose.close()
+
+def run_station(station_id, source, user, exercise, options, duration, updates, stop_event):
+    """Station process: track one source and report status and tiles to the dashboard"""
+    cv2.setNumThreads(1)  # Stations scale across processes, not OpenCV threads
+    session = TrackingSession(station_id, source, user, exercise, options)
+    try:
+        session.open()
+    except Exception as e:
+        updates.put(({"station": station_id, "user": user, "exercise": exercise, "error": str(e)}, None))
+        session.close()
+        return
+    
+    end_time = session.start_time + duration
+    next_update = 0.0
+    error = None
+    try:
+        while not stop_event.is_set() and time.perf_counter() < end_time:
+            if not session.step():
+                break
+            now = time.perf_counter()
+            if now >= next_update:
+                updates.put((session.status(), session.tile()))
+                next_update = now + STATION_UPDATE_INTERVAL
+    except Exception as e:
+        error = str(e)  # Reported with the final status; the count is not trustworthy
+    finally:
+        final_status = session.status()
+        final_status["finished"] = True
+        if error is not None:
+            final_status["error"] = error
+        updates.put((final_status, session.tile()))
+        session.close()
+
+def render_dashboard(stations, tiles):
+    """Tile every station's latest frame and status into one image"""
+    tile_width, tile_height = STATION_TILE_SIZE
+    columns = max(1, math.ceil(math.sqrt(len(stations))))
+    rows = math.ceil(len(stations) / columns)
+    dashboard = np.zeros((rows * tile_height, columns * tile_width, 3), dtype=np.uint8)
+    
+    for index, status in enumerate(stations):
+        top, left = (index // columns) * tile_height, (index % columns) * tile_width
+        tile = tiles.get(status["station"])
+        if tile is not None:
+            dashboard[top:top + tile_height, left:left + tile_width] = tile
         
-        save_user_data(user_data)
+        if status.get("error"):
+            lines = [f"{status['user']} ({status['exercise']})", f"Error: {status['error']}"]
+        else:
+            person = "" if status.get("person") else " - step into view"
+            done = " - done" if status.get("finished") else ""
+            lines = [f"{status['user']}: {status['exercise']} {status.get('count', 0)}{done}",
+                     f"{status.get('fps', 0.0):.1f} FPS {status.get('state', '')}{person}"]
+        for i, line in enumerate(lines):
+            cv2.putText(dashboard, line, (left + 10, top + 25 + i * 22), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
     
-    # Show results
-    show_message(f"Exercise Complete! You achieved {walking_bursts} walking bursts and earned {coins_earned} coins.", 3000)
+    total_fps = sum(status.get("fps", 0.0) for status in stations if not status.get("finished"))
+    cv2.putText(dashboard, f"Total: {total_fps:.1f} FPS across {len(stations)} stations",
+                (10, rows * tile_height - 12), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+    return dashboard
 
-# Webcam functions
-def start_webcam():
-    """Initialize and start webcam capture"""
-    global cap
-    cap = cv2.VideoCapture(0)
-    
-    # Start webcam processing thread
-    webcam_thread = threading.Thread(target=process_webcam, daemon=True)
-    webcam_thread.start()
-
-def stop_webcam():
-    """Release webcam resources"""
-    global cap
-    if cap is not None:
-        cap.release()
-        cv2.destroyAllWindows()
+def award_station_session(user, exercise, count):
+    """Credit a finished station session to a registered user, like the single-player games do"""
+    today = datetime.now().strftime("%Y-%m-%d")
+    with data_lock:
+        if user not in user_data:
+            return False
+        user_data[user]['coins'] += EXERCISES[exercise].coins_for(count)
+        user_data[user]['last_exercise_date'] = today
+        if exercise in HISTORY_FIELDS:
+            record_session(user, exercise, today, count)
+        save_user_data(user_data, user)
+    return True
 
-def process_webcam():
-    """Process webcam frames for exercise detection"""
-    global cap, coin_x, coin_y, coins_collected, squats_count, is_squatting, was_squatting, running, squat_state, calibrated, sit_count, initial_leg_height, is_sitting, was_sitting, posture_status, still_counter, walking_bursts, walking_state, last_walking_state, center_history
+def run_stations(specs, duration=STATION_SESSION_SECONDS, options=None):
+    """Track several stations in parallel processes and show them on one dashboard"""
+    global user_data
+    stations = [parse_station(spec) for spec in specs]
+    user_data = load_user_data()
+    stats_index.rebuild(user_data)
+    load_history_columns(user_data)
     
-    # Track coins by edge
-    coins_by_edge = {
-        "center": 0,
-        "left": 0,
-        "right": 0
-    }
+    # Spawned processes start with fresh OpenCV and MediaPipe state on every platform
+    context = multiprocessing.get_context("spawn")
+    updates = context.Queue()
+    stop_event = context.Event()
+    processes = [context.Process(target=run_station, daemon=True,
+                                 args=(station_id, source, user, exercise, options, duration, updates, stop_event))
+                 for station_id, (source, user, exercise) in enumerate(stations)]
+    for process in processes:
+        process.start()
     
-    while webcam_active and cap.isOpened() and running:
-        ret, frame = cap.read()
-        if not ret:
-            break
-            
-        frame = cv2.flip(frame, 1)  # Mirror the frame
-        frame_height, frame_width, _ = frame.shape
-        
-        # Convert to RGB for MediaPipe
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        
-        # Process with MediaPipe
-        results = pose.process(rgb_frame)
-        
-        if results.pose_landmarks:
-            # Draw pose landmarks
-            mp_drawing.draw_landmarks(frame, results.pose_landmarks, mp_pose.POSE_CONNECTIONS)
-            
-            # Get landmarks
-            landmarks = results.pose_landmarks.landmark
-            
-            with data_lock:
-                if exercise_type == "hand":
-                    # Hand exercise logic
-                    # Draw coin
-                    cv2.circle(frame, 
-                               (int(coin_x * frame_width), int(coin_y * frame_height)), 
-                               20, GOLD, -1)
-                    
-                    # Get relevant landmarks
-                    left_wrist = landmarks[mp_pose.PoseLandmark.LEFT_WRIST]
-                    right_wrist = landmarks[mp_pose.PoseLandmark.RIGHT_WRIST]
-                    left_shoulder = landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER]
-                    right_shoulder = landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER]
-                    
-                    # Convert to pixel coordinates
-                    left_wrist_x = left_wrist.x
-                    left_wrist_y = left_wrist.y
-                    right_wrist_x = right_wrist.x
-                    right_wrist_y = right_wrist.y
-                    
-                    # Determine current edge
-                    current_edge = get_current_edge(coin_x, coin_y)
-                    
-                    # Calculate pixel positions
-                    coin_pixel_x = int(coin_x * frame_width)
-                    coin_pixel_y = int(coin_y * frame_height)
-                    
-                    left_wrist_pixel_x = int(left_wrist_x * frame_width)
-                    left_wrist_pixel_y = int(left_wrist_y * frame_height)
-                    right_wrist_pixel_x = int(right_wrist_x * frame_width)
-                    right_wrist_pixel_y = int(right_wrist_y * frame_height)
-                    
-                    # Detection thresholds
-                    proximity_threshold = 100
-                    angle_threshold = 30
-                    
-                    # Arm angle calculation
-                    def calculate_arm_angle(shoulder_x, shoulder_y, wrist_x, wrist_y):
-                        return math.degrees(math.atan2(wrist_y - shoulder_y, wrist_x - shoulder_x))
-                    
-                    # Calculate arm angles
-                    left_arm_angle = calculate_arm_angle(
-                        left_shoulder.x * frame_width, 
-                        left_shoulder.y * frame_height, 
-                        left_wrist_pixel_x, 
-                        left_wrist_pixel_y
-                    )
-                    
-                    right_arm_angle = calculate_arm_angle(
-                        right_shoulder.x * frame_width, 
-                        right_shoulder.y * frame_height, 
-                        right_wrist_pixel_x, 
-                        right_wrist_pixel_y
-                    )
-                    
-                    # Calculate distances to coin
-                    left_hand_distance = math.hypot(
-                        left_wrist_pixel_x - coin_pixel_x, 
-                        left_wrist_pixel_y - coin_pixel_y
-                    )
-                    
-                    right_hand_distance = math.hypot(
-                        right_wrist_pixel_x - coin_pixel_x, 
-                        right_wrist_pixel_y - coin_pixel_y
-                    )
-                    
-                    # Edge-specific collection logic
-                    collected = False
-                    
-                    if current_edge == "center":
-                        # Center coin - stretch up
-                        left_stretched_up = (
-                            left_hand_distance < proximity_threshold and
-                            abs(left_arm_angle) > 70 and abs(left_arm_angle) < 110
-                        )
-                        right_stretched_up = (
-                            right_hand_distance < proximity_threshold and
-                            abs(right_arm_angle) > 70 and abs(right_arm_angle) < 110
-                        )
-                        
-                        collected = left_stretched_up or right_stretched_up
-                    
-                    elif current_edge == "left":
-                        # Left coin - right hand stretched left
-                        right_stretched_left = (
-                            right_hand_distance < proximity_threshold and
-                            right_arm_angle > 160 or right_arm_angle < -160
-                        )
-                        
-                        collected = right_stretched_left
-                    
-                    elif current_edge == "right":
-                        # Right coin - left hand stretched right
-                        left_stretched_right = (
-                            left_hand_distance < proximity_threshold and
-                            abs(left_arm_angle) < 20 or abs(left_arm_angle) > 340
-                        )
-                        
-                        collected = left_stretched_right
-                    
-                    if collected:
-                        coins_collected += 1
-                        cv2.circle(frame, (coin_pixel_x, coin_pixel_y), 30, (0, 255, 0), -1)
-                        coin_x, coin_y = generate_edge_coin_position()
-                        current_edge = get_current_edge(coin_x, coin_y)
-                
-                elif exercise_type == "squat":
-                    # Squat detection logic
-                    left_hip = landmarks[mp_pose.PoseLandmark.LEFT_HIP]
-                    right_hip = landmarks[mp_pose.PoseLandmark.RIGHT_HIP]
-                    left_knee = landmarks[mp_pose.PoseLandmark.LEFT_KNEE]
-                    right_knee = landmarks[mp_pose.PoseLandmark.RIGHT_KNEE]
-                    left_ankle = landmarks[mp_pose.PoseLandmark.LEFT_ANKLE]
-                    right_ankle = landmarks[mp_pose.PoseLandmark.RIGHT_ANKLE]
-                    
-                    # Calculate knee angles
-                    left_knee_angle = calculate_angle(
-                        left_hip.x, left_hip.y,
-                        left_knee.x, left_knee.y,
-                        left_ankle.x, left_ankle.y
-                    )
-                    
-                    right_knee_angle = calculate_angle(
-                        right_hip.x, right_hip.y,
-                        right_knee.x, right_knee.y,
-                        right_ankle.x, right_ankle.y
-                    )
-                    
-                    # Determine squat state
-                    is_squatting = left_knee_angle < 120 and right_knee_angle < 120
-                    
-                    # State machine for counting squats
-                    if squat_state == "standing" and is_squatting:
-                        squat_state = "squatting"
-                    elif squat_state == "squatting" and not is_squatting:
-                        squat_state = "standing"
-                        squats_count += 1
-                        
-                        # Update progress
-                        progress = min(100, (squats_count / goal_squats) * 100)
-                        user_data[current_user]['progress'] = progress
-                        save_user_data(user_data)
-                
-                elif exercise_type == "walking":
-                    # Walking detection logic
-                    left_hip = landmarks[mp_pose.PoseLandmark.LEFT_HIP]
-                    right_hip = landmarks[mp_pose.PoseLandmark.RIGHT_HIP]
-                    
-                    if left_hip.visibility > 0.5 and right_hip.visibility > 0.5:
-                        # Calculate center point
-                        center_x = int(((left_hip.x + right_hip.x) / 2) * frame_width)
-                        center_history.append(center_x)
-                        
-                        # Maintain history buffer
-                        if len(center_history) > 5:
-                            center_history.pop(0)
-                        
-                        if len(center_history) > 1:
-                            # Calculate movement
-                            movement = max(center_history) - min(center_history)
-                            
-                            if movement > 20:
-                                walking_state = "Walking"
-                                still_counter = 0
-                                if last_walking_state == "Standing":
-                                    walking_bursts += 1
-                            else:
-                                still_counter += 1
-                                if still_counter > 10:
-                                    walking_state = "Standing"
-                            
-                            last_walking_state = walking_state
-                
-                elif exercise_type == "chair_sit":
-                    # Chair sit detection logic
-                    left_hip = landmarks[mp_pose.PoseLandmark.LEFT_HIP]
-                    left_knee = landmarks[mp_pose.PoseLandmark.LEFT_KNEE]
-                    
-                    if left_hip.visibility > 0.5 and left_knee.visibility > 0.5:
-                        current_leg_height = abs(left_hip.y - left_knee.y)
-                        
-                        if not calibrated:
-                            # Initial calibration
-                            initial_leg_height = current_leg_height
-                            calibrated = True
-                            posture_status = "Calibrated"
-                        else:
-                            # Detect sitting position
-                            if current_leg_height < initial_leg_height * 0.8:
-                                is_sitting = True
-                                posture_status = "Sitting"
-                            else:
-                                is_sitting = False
-                                posture_status = "Standing"
-                            
-                            # Count sit transitions
-                            if is_sitting and not was_sitting:
-                                sit_count += 1
-                                cv2.putText(frame, "Sit Detected!", (50, 100), cv2.FONT_HERSHEY_SIMPLEX, 
-                                            2, (0, 255, 0), 3)
-                            
-                            was_sitting = is_sitting
+    latest = {station_id: {"station": station_id, "user": user, "exercise": exercise, "count": 0}
+              for station_id, (_, user, exercise) in enumerate(stations)}
+    tiles = {}
+    finished = set()
+    while len(finished) < len(stations):
+        # Take every update that arrived since the last redraw
+        try:
+            status, tile = updates.get(timeout=STATION_UPDATE_INTERVAL)
+            while True:
+                latest[status["station"]] = status
+                if tile is not None:
+                    tiles[status["station"]] = tile
+                if status.get("finished") or status.get("error"):
+                    finished.add(status["station"])
+                status, tile = updates.get_nowait()
+        except queue.Empty:
+            pass
         
-        # Display frame
-        cv2.imshow("Exercise Tracker", frame)
+        if not any(process.is_alive() for process in processes) and updates.empty():
+            break  # A station died without reporting
         
-        # Exit on 'q' key
+        cv2.imshow("FITQUEST Stations", render_dashboard(list(latest.values()), tiles))
         if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
+            stop_event.set()
     
-    # Clean up
-    if cap is not None:
-        cap.release()
+    stop_event.set()
+    for process in processes:
+        process.join(timeout=5)
     cv2.destroyAllWindows()
+    
+    credit_station_sessions(list(latest.values()))
+    persistence.stop()
+    return list(latest.values())
+
+def credit_station_sessions(statuses):
+    """Report each station's last status and credit the sessions that finished cleanly"""
+    total_frames = sum(status.get("frames", 0) for status in statuses)
+    for status in statuses:
+        # Awarding a session sets today's count, so a station without a final count must not overwrite it
+        if status.get("error"):
+            print(f"Station {status['station']} ({status['user']}): error: {status['error']}, nothing saved")
+            continue
+        if not status.get("finished"):
+            print(f"Station {status['station']} ({status['user']}): stopped without reporting a final count, nothing saved")
+            continue
+        credited = award_station_session(status["user"], status["exercise"], status["count"])
+        note = "" if credited else " (not a registered user, nothing saved)"
+        print(f"Station {status['station']} {status['user']}: {status['count']} {status['exercise']} reps, "
+              f"{status.get('frames', 0)} frames at {status.get('fps', 0.0)} FPS{note}")
+    print(f"{len(statuses)} stations, {sum(status.get('fps', 0.0) for status in statuses):.1f} FPS combined, "
+          f"{total_frames} frames")
 
 # Audio functions
 def initialize_music():
@@ -1408,6 +3999,12 @@ def initialize_music():
         print(f"Error initializing music: {e}")
         background_music_playing = False
 
+async def music_task():
+    """Load and start the background music off the loop, then let the menu redraw its button"""
+    with startup_timer("music"):
+        await scheduler.run_blocking(initialize_music)
+    pygame.event.post(pygame.event.Event(MUSIC_READY_EVENT))
+
 def toggle_music():
     """Toggle music playback state"""
     global background_music_playing
@@ -1436,7 +4033,7 @@ def draw_music_button(screen):
         # X mark
         pygame.draw.line(screen, RED, (SCREEN_WIDTH - 45, 15), (SCREEN_WIDTH - 15, 45), 2)
     
-    music_text = small_font.render("Music", True, BLACK)
+    music_text = render_text(small_font, "Music", True, BLACK)
     screen.blit(music_text, (SCREEN_WIDTH - 45, 55))
 
 def is_music_button_clicked(pos):
@@ -1445,35 +4042,403 @@ def is_music_button_clicked(pos):
             10 <= pos[1] <= 50)
 
 # Main game function
-def main():
+async def main():
     """Main game loop"""
+    global running, exercise_type, user_data
     setup_game()
-    global running, exercise_type
+    with startup_timer("load user data"):
+        user_data = load_user_data()
+        stats_index.rebuild(user_data)
+        load_history_columns(user_data)
+    
+    # Background work runs as tasks next to the screens
+    persistence.start()
+    scheduler.spawn(music_task())
 
     while running:
         # Show main menu
-        if not main_menu():
+        if not await main_menu():
             break
         
         # Select exercise
-        if not select_exercise():
+        if not await select_exercise():
             break
         
         # Run selected exercise
-        if exercise_type == "hand":
-            hand_exercise_game()
-        elif exercise_type == "squat":
-            squat_exercise_game()
-        elif exercise_type == "walking":
-            walking_exercise_game()
-        elif exercise_type == "chair_sit":
-            chair_sit_exercise_game()
+        await run_exercise_game(EXERCISES[exercise_type])
     
     # Clean up
-    stop_webcam()
+    await stop_webcam()
+    persistence.stop()  # Flush pending changes into a fresh snapshot
+    print(f"Text cache: {text_cache.stats()}")
     pygame.mixer.quit()
     pygame.quit()
 
+def score_recordings(paths, exercises=EXERCISE_TYPES, options=None):
+    """Re-score recorded landmark sessions without running pose inference"""
+    results = []
+    for path in paths:
+        start = time.perf_counter()
+        recording = LandmarkRecording(path)
+        counts = {}
+        for exercise in exercises:
+            detector = create_detector(exercise, recording.frame_width, recording.frame_height, options)
+            detector.run(recording.landmarks, recording.timestamps)
+            counts[exercise] = detector.count
+        elapsed = time.perf_counter() - start
+        results.append({"file": path, "frames": len(recording), "counts": counts})
+        
+        summary = ", ".join(f"{exercise} {count}" for exercise, count in counts.items())
+        print(f"{path}: {summary} ({len(recording)} frames in {elapsed * 1000:.1f}ms)")
+    return results
+
+# Benchmark functions
+def synthetic_landmarks(frames, seed=BENCHMARK_SEED):
+    """Deterministic (frames, 33, 4) landmark stream of someone squatting, stepping and reaching"""
+    rng = np.random.default_rng(seed)
+    base = np.zeros((NUM_LANDMARKS, 4))
+    base[:, :2] = (0.5, 0.25)  # Face and unused points sit around the head
+    base[:, 3] = 1.0  # Fully visible
+    standing = {
+        LEFT_SHOULDER: (0.45, 0.3), RIGHT_SHOULDER: (0.55, 0.3),
+        LEFT_WRIST: (0.42, 0.5), RIGHT_WRIST: (0.58, 0.5),
+        LEFT_HIP: (0.47, 0.55), RIGHT_HIP: (0.53, 0.55),
+        LEFT_KNEE: (0.47, 0.72), RIGHT_KNEE: (0.53, 0.72),
+        LEFT_ANKLE: (0.47, 0.9), RIGHT_ANKLE: (0.53, 0.9),
+    }
+    for index, point in standing.items():
+        base[index, :2] = point
+    
+    t = np.arange(frames)
+    depth = (1 - np.cos(2 * np.pi * t / 60)) / 2  # One squat or sit every 2 seconds at 30 FPS
+    sway = 0.15 * np.sin(2 * np.pi * t / 90)  # Side steps, two walking bursts per cycle
+    reach = np.clip(np.sin(2 * np.pi * t / 45), 0, 1)  # Arm stretches, alternating sideways and up
+    sideways = (t // 45) % 2 == 0
+    
+    landmarks = np.repeat(base[np.newaxis], frames, axis=0)
+    landmarks[:, :, 0] += sway[:, np.newaxis]
+    landmarks[:, [LEFT_HIP, RIGHT_HIP, LEFT_SHOULDER, RIGHT_SHOULDER], 1] += 0.18 * depth[:, np.newaxis]
+    landmarks[:, LEFT_KNEE, 0] -= 0.1 * depth
+    landmarks[:, RIGHT_KNEE, 0] += 0.1 * depth
+    
+    # Wrists move from their resting place towards the coin positions
+    targets = np.where(sideways[:, np.newaxis, np.newaxis], [[0.95, 0.5], [0.05, 0.5]], [[0.5, 0.05], [0.5, 0.05]])
+    wrists = landmarks[:, [LEFT_WRIST, RIGHT_WRIST], :2]
+    landmarks[:, [LEFT_WRIST, RIGHT_WRIST], :2] = wrists + (targets - wrists) * reach[:, np.newaxis, np.newaxis]
+    landmarks[:, :, :2] += rng.normal(0, 0.003, (frames, NUM_LANDMARKS, 2))
+    return landmarks.astype(np.float32)
+
+def draw_synthetic_frame(landmarks, width, height, background):
+    """Render a stick figure for one landmark array onto a copy of the background"""
+    frame = background.copy()
+    points = [(int(x * width), int(y * height)) for x, y in landmarks[:, :2]]
+    limbs = [(LEFT_SHOULDER, RIGHT_SHOULDER), (LEFT_SHOULDER, LEFT_WRIST), (RIGHT_SHOULDER, RIGHT_WRIST),
+             (LEFT_SHOULDER, LEFT_HIP), (RIGHT_SHOULDER, RIGHT_HIP), (LEFT_HIP, RIGHT_HIP),
+             (LEFT_HIP, LEFT_KNEE), (RIGHT_HIP, RIGHT_KNEE), (LEFT_KNEE, LEFT_ANKLE), (RIGHT_KNEE, RIGHT_ANKLE)]
+    thickness = max(2, width // 80)
+    for start, end in limbs:
+        cv2.line(frame, points[start], points[end], (60, 40, 200), thickness)
+    # Head above the middle of the shoulders
+    head_x = (points[LEFT_SHOULDER][0] + points[RIGHT_SHOULDER][0]) // 2
+    head_y = points[LEFT_SHOULDER][1] - height // 10
+    cv2.circle(frame, (head_x, head_y), width // 25, (150, 180, 220), -1)
+    return frame
+
+def benchmark_frames(width, height, landmarks, video_path=None):
+    """Frames for one resolution: from a video if given, otherwise rendered from the landmarks"""
+    if video_path is not None:
+        frames = []
+        video = cv2.VideoCapture(video_path)
+        while len(frames) < len(landmarks):
+            ret, frame = video.read()
+            if not ret:
+                if not frames:
+                    raise ValueError(f"No frames could be read from {video_path}")
+                video.set(cv2.CAP_PROP_POS_FRAMES, 0)  # Loop short videos
+                continue
+            frames.append(cv2.resize(frame, (width, height)))
+        video.release()
+        return frames
+    
+    rng = np.random.default_rng(BENCHMARK_SEED)
+    background = rng.integers(90, 140, (height, width, 3), dtype=np.uint8)
+    return [draw_synthetic_frame(points, width, height, background) for points in landmarks]
+
+def run_benchmark_frame(raw_frame, buffer, predictor, landmarks, timestamp):
+    """One pass of the webcam per-frame path: mirror like read_frame, then the pipeline's process_frame"""
+    frame_start = time.perf_counter()
+    with pipeline_metrics.timed("flip"):
+        cv2.flip(raw_frame, 1, dst=buffer.frame)
+    # Detection always gets the synthetic stream so rep counts do not depend on the model
+    process_frame(buffer, predictor, timestamp, landmarks)
+    pipeline_metrics.record("frame", time.perf_counter() - frame_start)
+    pipeline_metrics.frame_shown()
+
+def benchmark_case(exercise, width, height, frames, landmarks, level):
+    """Benchmark the per-frame path for one exercise at one resolution and quality level"""
+    global exercise_type, frame_pool, detection_active, landmark_recorder
+    exercise_type = exercise
+    detection_active = True
+    landmark_recorder = None
+    
+    frame_pool = FrameBufferPool(1)
+    buffer = frame_pool.acquire((height, width, 3))
+    times = frame_times(len(frames), None, None)
+    
+    def run(frame_range, metrics):
+        # A fresh session: quality fixed at the level, no crop until a person is found
+        global pipeline_metrics, quality_controller, roi_tracker
+        pipeline_metrics = metrics
+        quality_controller = QualityController(target_fps=0)
+        quality_controller.level = level
+        roi_tracker = RoiTracker()
+        predictor = LandmarkPredictor()
+        random.seed(BENCHMARK_SEED)  # Same coin positions on every run
+        reset_exercise_state()
+        for i in frame_range:
+            run_benchmark_frame(frames[i], buffer, predictor, landmarks[i], times[i])
+    
+    run(range(BENCHMARK_WARMUP_FRAMES), PipelineMetrics())
+    
+    # Timed run
+    metrics = PipelineMetrics()
+    run(range(BENCHMARK_WARMUP_FRAMES, len(frames)), metrics)
+    summary = metrics.summary()
+    reps = exercise_state.latest().count
+    roi = roi_tracker.report()
+    
+    # Memory is measured on a separate short run since tracemalloc slows allocation
+    tracemalloc.start()
+    run(range(BENCHMARK_WARMUP_FRAMES, min(len(frames), BENCHMARK_WARMUP_FRAMES + BENCHMARK_MEMORY_FRAMES)), PipelineMetrics())
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    frame_stats = summary["stages"]["frame"]
+    return {
+        "fps": round(1000 / frame_stats["mean_ms"], 2),
+        "reps": reps,
+        "roi": roi,
+        "peak_memory_kb": round(peak / 1024, 1),
+        "stages": {stage: {key: stats[key] for key in ("mean_ms", "p50_ms", "p95_ms", "p99_ms")}
+                   for stage, stats in summary["stages"].items()},
+    }
+
+def benchmark_detectors(exercises, frames):
+    """Throughput of whole-sequence detector runs, as used by --score"""
+    landmarks = synthetic_landmarks(frames)
+    results = {}
+    for exercise in exercises:
+        random.seed(BENCHMARK_SEED)
+        detector = create_detector(exercise, 640, 480)
+        start = time.perf_counter()
+        detector.run(landmarks)
+        elapsed = time.perf_counter() - start
+        results[exercise] = {"fps": round(frames / elapsed, 1), "reps": detector.count}
+    return results
+
+def run_benchmarks(exercises=EXERCISE_TYPES, frames=BENCHMARK_FRAMES, video_path=None, levels=BENCHMARK_QUALITY_LEVELS):
+    """Benchmark the per-frame path for every exercise, resolution and quality level"""
+    for level in levels:
+        get_pose(QUALITY_LEVELS[level][2])  # Model setup is not part of the timed frames
+    user_data.clear()  # No progress is persisted while benchmarking
+    
+    total_frames = BENCHMARK_WARMUP_FRAMES + frames
+    landmarks = synthetic_landmarks(total_frames)
+    cases = {}
+    for width, height in BENCHMARK_RESOLUTIONS:
+        frame_source = benchmark_frames(width, height, landmarks, video_path)
+        for exercise in exercises:
+            for level in levels:
+                case = benchmark_case(exercise, width, height, frame_source, landmarks, level)
+                cases[f"{exercise}@{width}x{height}/q{level}"] = case
+                stages = ", ".join(f"{stage} {stats['p50_ms']:.2f}/{stats['p95_ms']:.2f}"
+                                   for stage, stats in case["stages"].items() if stage != "frame")
+                print(f"{exercise:>9} {width}x{height} q{level}: {case['fps']:7.1f} FPS, peak {case['peak_memory_kb']:8.1f} KB, "
+                      f"{case['reps']} reps, {case['roi']['crop_frames']} cropped | p50/p95 ms: {stages}")
+    
+    detectors = benchmark_detectors(exercises, 10000)
+    for exercise, result in detectors.items():
+        print(f"{exercise:>9} detector.run: {result['fps']:,.0f} frames/s, {result['reps']} reps")
+    
+    return {
+        "machine": {"platform": platform.platform(), "processor": platform.processor(),
+                    "python": platform.python_version(), "cv2": cv2.__version__},
+        "frames": frames,
+        "source": video_path or "synthetic",
+        "cases": cases,
+        "detectors": detectors,
+    }
+
+def check_benchmark_regressions(results, baseline, tolerance=BENCHMARK_TOLERANCE):
+    """Compare benchmark results with a baseline and return the regressions found"""
+    regressions = []
+    if baseline.get("machine") != results["machine"]:
+        print("Warning: baseline was recorded on a different machine or library version")
+    if baseline.get("source") != results["source"]:
+        regressions.append(f"baseline used {baseline.get('source')} frames, this run used {results['source']}")
+        return regressions
+    
+    for name, case in results["cases"].items():
+        expected = baseline["cases"].get(name)
+        if expected is None:
+            continue
+        if case["fps"] < expected["fps"] * (1 - tolerance):
+            regressions.append(f"{name}: {case['fps']} FPS, baseline {expected['fps']}")
+        if case["peak_memory_kb"] > expected["peak_memory_kb"] * (1 + tolerance):
+            regressions.append(f"{name}: peak memory {case['peak_memory_kb']} KB, baseline {expected['peak_memory_kb']}")
+        if case["reps"] != expected["reps"]:
+            regressions.append(f"{name}: {case['reps']} reps, baseline {expected['reps']}")
+    for exercise, result in results["detectors"].items():
+        expected = baseline["detectors"].get(exercise)
+        if expected is not None and result["fps"] < expected["fps"] * (1 - tolerance):
+            regressions.append(f"{exercise} detector.run: {result['fps']} frames/s, baseline {expected['fps']}")
+    return regressions
+
+def benchmark(args):
+    """Run the benchmark suite, then save or check the baseline; returns the exit status"""
+    results = run_benchmarks(args.exercises, args.benchmark_frames, args.benchmark or None, args.benchmark_levels)
+    
+    if args.save_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(results, file, indent=4)
+        print(f"Baseline written to {args.baseline}")
+    
+    if args.check_baseline:
+        if not os.path.exists(args.baseline):
+            print(f"No baseline at {args.baseline}; run with --save-baseline first")
+            return 1
+        with open(args.baseline, "r") as file:
+            baseline = json.load(file)
+        regressions = check_benchmark_regressions(results, baseline)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.baseline}")
+    return 0
+
+def profile_startup():
+    """Measure every startup phase, including the deferred ones, and print a report"""
+    setup_game()
+    with startup_timer("load user data"):
+        load_user_data()
+    startup_phases = list(STARTUP_TIMINGS)
+    
+    # Phases that only run when first needed, or off the main path
+    with startup_timer("music"):
+        initialize_music()
+    get_pose()
+    load_matplotlib()
+    
+    print("Startup profile (use python -X importtime for a per-module import breakdown):")
+    for phase, seconds in STARTUP_TIMINGS.items():
+        when = "startup" if phase in startup_phases else "deferred to first use"
+        print(f"  {phase:<20} {seconds * 1000:8.1f} ms  ({when})")
+    startup_total = sum(STARTUP_TIMINGS[phase] for phase in startup_phases)
+    print(f"  {'time to main menu':<20} {startup_total * 1000:8.1f} ms")
+    pygame.quit()
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="FITQUEST exercise tracker")
+    parser.add_argument("--batch", nargs="+", metavar="VIDEO",
+                        help="analyze recorded videos (files or directories) without the game window")
+    parser.add_argument("--exercises", nargs="+", choices=EXERCISE_TYPES, default=EXERCISE_TYPES,
+                        help="exercise detectors to run in batch mode")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of batch worker processes (default: one per core)")
+    parser.add_argument("--output", default=BATCH_OUTPUT_FILE,
+                        help="file the batch results are written to")
+    parser.add_argument("--record", metavar="DIR",
+                        help="save the pose landmarks of every session or batch video to DIR")
+    parser.add_argument("--score", nargs="+", metavar="RECORDING",
+                        help="re-score recorded landmark files without pose inference")
+    parser.add_argument("--replay", metavar="RECORDING",
+                        help="play a recorded landmark file into the game instead of the webcam")
+    parser.add_argument("--stations", nargs="+", metavar="SOURCE:USER:EXERCISE",
+                        help="track several cameras or videos in parallel processes on one dashboard")
+    parser.add_argument("--duration", type=float, default=STATION_SESSION_SECONDS,
+                        help="length of a station session in seconds")
+    parser.add_argument("--target-fps", type=float, default=TARGET_FPS,
+                        help="frame rate adaptive quality aims for; 0 always uses full quality")
+    parser.add_argument("--startup-profile", action="store_true",
+                        help="report how long each startup phase takes and exit")
+    parser.add_argument("--benchmark", nargs="?", const="", metavar="VIDEO",
+                        help="benchmark the per-frame path on synthetic frames (or frames from VIDEO) and exit")
+    parser.add_argument("--benchmark-frames", type=int, default=BENCHMARK_FRAMES,
+                        help="timed frames per exercise, resolution and quality level")
+    parser.add_argument("--benchmark-levels", nargs="+", type=int, choices=range(len(QUALITY_LEVELS)),
+                        default=BENCHMARK_QUALITY_LEVELS, metavar="LEVEL",
+                        help="adaptive quality levels to benchmark (0 is full quality)")
+    parser.add_argument("--baseline", default=BENCHMARK_BASELINE_FILE,
+                        help="benchmark baseline file")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="store the benchmark results as the new baseline")
+    parser.add_argument("--check-baseline", action="store_true",
+                        help="exit with an error if the benchmark regressed against the baseline")
+    parser.add_argument("--export-users", metavar="FILE",
+                        help="write every user record, upgraded to the current schema, to FILE and exit")
+    parser.add_argument("--import-users", nargs="+", metavar="FILE",
+                        help="validate user records from FILEs and add them to the user data, then exit")
+    parser.add_argument("--migrate-users", action="store_true",
+                        help="upgrade the stored user data to the current schema in place and exit")
+    parser.add_argument("--format", choices=["ndjson", "csv", "json"],
+                        help="import/export file format (default: from the file extension, otherwise ndjson)")
+    parser.add_argument("--import-batch-size", type=int, default=IMPORT_BATCH_SIZE,
+                        help="user records validated and written together")
+    parser.add_argument("--import-errors", default=IMPORT_ERRORS_FILE,
+                        help="file rejected user records are reported to")
+    
+    # Detector threshold overrides
+    parser.add_argument("--knee-angle", type=float, help="squat knee angle threshold in degrees (default 120)")
+    parser.add_argument("--knee-hysteresis", type=float, help="degrees above the knee angle needed to stand up (default 10)")
+    parser.add_argument("--sit-ratio", type=float, help="chair sit leg height ratio (default 0.8)")
+    parser.add_argument("--sit-hysteresis", type=float, help="leg height ratio above the sit ratio needed to stand up (default 0.05)")
+    parser.add_argument("--move-threshold", type=float, help="walking hip movement threshold in pixels (default 20)")
+    parser.add_argument("--move-hysteresis", type=float, help="pixels below the movement threshold that keep a walking burst going (default 5)")
+    parser.add_argument("--move-window", type=int, help="recent hip positions walking movement is measured over (default 5)")
+    parser.add_argument("--cadence-window", type=int, help="recent hip positions walking cadence is measured over (default 150)")
+    parser.add_argument("--proximity", type=float, help="hand to coin distance in pixels (default 100)")
+    parser.add_argument("--smoothing", choices=sorted(LANDMARK_FILTERS),
+                        help="landmark filter used by every detector (default one_euro, none for the hand exercise)")
+    return parser.parse_args()
+
+def detector_options_from_args(args):
+    """Collect detector threshold overrides from the command line"""
+    options = {
+        "squat": {"knee_angle": args.knee_angle, "knee_hysteresis": args.knee_hysteresis, "smoothing": args.smoothing},
+        "chair_sit": {"sit_ratio": args.sit_ratio, "sit_hysteresis": args.sit_hysteresis, "smoothing": args.smoothing},
+        "walking": {"move_threshold": args.move_threshold, "move_hysteresis": args.move_hysteresis,
+                    "window": args.move_window, "cadence_window": args.cadence_window, "smoothing": args.smoothing},
+        "hand": {"proximity": args.proximity, "smoothing": args.smoothing},
+    }
+    return {exercise: {name: value for name, value in values.items() if value is not None}
+            for exercise, values in options.items()}
+
+STARTUP_TIMINGS["module import"] = time.perf_counter() - MODULE_IMPORT_START
+
 # Entry point
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    detector_options = detector_options_from_args(args)
+    if args.batch:
+        run_batch_analysis(args.batch, args.exercises, args.workers, args.output, detector_options, args.record)
+    elif args.score:
+        score_recordings(args.score, args.exercises, detector_options)
+    elif args.startup_profile:
+        profile_startup()
+    elif args.stations:
+        run_stations(args.stations, args.duration, detector_options)
+    elif args.benchmark is not None:
+        raise SystemExit(benchmark(args))
+    elif args.export_users:
+        export_users(args.export_users, args.format)
+    elif args.import_users:
+        import_users(args.import_users, args.format, args.import_batch_size, args.import_errors)
+    elif args.migrate_users:
+        migrate_user_store()
+    else:
+        landmark_record_dir = args.record
+        replay_file = args.replay
+        target_fps = args.target_fps
+        scheduler.run(main())
@@ -0,0 +1,209 @@
+"""Exercise detectors: chunking invariance and agreement with the original per-frame logic"""
+import math
+import random
+
+import numpy as np
+import pytest
+
+pytest.importorskip("cv2")
+pytest.importorskip("pygame")
+import FITQUEST
+from FITQUEST import LEFT_ANKLE, LEFT_HIP, LEFT_KNEE, LEFT_SHOULDER, LEFT_WRIST
+from FITQUEST import RIGHT_ANKLE, RIGHT_HIP, RIGHT_KNEE, RIGHT_SHOULDER, RIGHT_WRIST
+
+WIDTH, HEIGHT = 640, 480
+SEED = 7
+
+
+@pytest.fixture(scope="module")
+def recording(tmp_path_factory):
+    """A recorded session of the synthetic exercise stream, with stretches where the hips are hidden"""
+    landmarks = FITQUEST.synthetic_landmarks(900)
+    landmarks[200:215, [LEFT_HIP, RIGHT_HIP], 3] = 0.2
+    landmarks[610:640, LEFT_KNEE, 3] = 0.1
+    
+    path = str(tmp_path_factory.mktemp("recordings") / f"session{FITQUEST.LANDMARK_FILE_EXTENSION}")
+    recorder = FITQUEST.LandmarkRecorder(path, WIDTH, HEIGHT)
+    for i, frame in enumerate(landmarks):
+        recorder.write(frame, i / FITQUEST.NOMINAL_FRAME_RATE)
+    recorder.close()
+    return FITQUEST.LandmarkRecording(path)
+
+
+def run_detector(exercise, landmarks, times=None, chunks=None, **options):
+    random.seed(SEED)  # Coin positions of the hand exercise
+    detector = FITQUEST.create_detector(exercise, WIDTH, HEIGHT, {exercise: options})
+    if chunks is None:
+        return detector.run(landmarks, times).tolist()
+    counts = []
+    for start, end in zip(chunks, chunks[1:]):
+        counts.extend(detector.run(landmarks[start:end], None if times is None else times[start:end]).tolist())
+    return counts
+
+
+# The detection logic as it was written inline in the original webcam loop
+
+def original_angle(x1, y1, x2, y2, x3, y3):
+    angle = math.degrees(math.atan2(y3 - y2, x3 - x2) - math.atan2(y1 - y2, x1 - x2))
+    return abs(angle) if abs(angle) <= 180 else 360 - abs(angle)
+
+
+def original_hand(landmarks):
+    random.seed(SEED)
+    coin_x, coin_y = FITQUEST.generate_edge_coin_position()
+    coins, counts = 0, []
+    for frame in landmarks.tolist():
+        edge = FITQUEST.get_current_edge(coin_x, coin_y)
+        coin_px, coin_py = int(coin_x * WIDTH), int(coin_y * HEIGHT)
+        lwx, lwy = int(frame[LEFT_WRIST][0] * WIDTH), int(frame[LEFT_WRIST][1] * HEIGHT)
+        rwx, rwy = int(frame[RIGHT_WRIST][0] * WIDTH), int(frame[RIGHT_WRIST][1] * HEIGHT)
+        left_angle = math.degrees(math.atan2(lwy - frame[LEFT_SHOULDER][1] * HEIGHT, lwx - frame[LEFT_SHOULDER][0] * WIDTH))
+        right_angle = math.degrees(math.atan2(rwy - frame[RIGHT_SHOULDER][1] * HEIGHT, rwx - frame[RIGHT_SHOULDER][0] * WIDTH))
+        left_distance = math.hypot(lwx - coin_px, lwy - coin_py)
+        right_distance = math.hypot(rwx - coin_px, rwy - coin_py)
+        if edge == "center":
+            collected = ((left_distance < 100 and 70 < abs(left_angle) < 110) or
+                         (right_distance < 100 and 70 < abs(right_angle) < 110))
+        elif edge == "left":
+            collected = right_distance < 100 and right_angle > 160 or right_angle < -160
+        else:
+            collected = left_distance < 100 and abs(left_angle) < 20 or abs(left_angle) > 340
+        if collected:
+            coins += 1
+            coin_x, coin_y = FITQUEST.generate_edge_coin_position()
+        counts.append(coins)
+    return counts
+
+
+def original_squat(landmarks):
+    state, squats, counts = "standing", 0, []
+    for frame in landmarks.tolist():
+        left = original_angle(*frame[LEFT_HIP][:2], *frame[LEFT_KNEE][:2], *frame[LEFT_ANKLE][:2])
+        right = original_angle(*frame[RIGHT_HIP][:2], *frame[RIGHT_KNEE][:2], *frame[RIGHT_ANKLE][:2])
+        squatting = left < 120 and right < 120
+        if state == "standing" and squatting:
+            state = "squatting"
+        elif state == "squatting" and not squatting:
+            state = "standing"
+            squats += 1
+        counts.append(squats)
+    return counts
+
+
+def original_walking(landmarks):
+    history, state, last_state, still, bursts, counts = [], "Standing", "Standing", 0, 0, []
+    for frame in landmarks.tolist():
+        if frame[LEFT_HIP][3] > 0.5 and frame[RIGHT_HIP][3] > 0.5:
+            history.append(int(((frame[LEFT_HIP][0] + frame[RIGHT_HIP][0]) / 2) * WIDTH))
+            if len(history) > 5:
+                history.pop(0)
+            if len(history) > 1:
+                if max(history) - min(history) > 20:
+                    state = "Walking"
+                    still = 0
+                    if last_state == "Standing":
+                        bursts += 1
+                else:
+                    still += 1
+                    if still > 10:
+                        state = "Standing"
+                last_state = state
+        counts.append(bursts)
+    return counts
+
+
+def original_chair_sit(landmarks):
+    initial, was_sitting, sits, counts = None, False, 0, []
+    for frame in landmarks.tolist():
+        if frame[LEFT_HIP][3] > 0.5 and frame[LEFT_KNEE][3] > 0.5:
+            height = abs(frame[LEFT_HIP][1] - frame[LEFT_KNEE][1])
+            if initial is None:
+                initial = height
+            else:
+                sitting = height < initial * 0.8
+                if sitting and not was_sitting:
+                    sits += 1
+                was_sitting = sitting
+        counts.append(sits)
+    return counts
+
+
+ORIGINAL = {"hand": original_hand, "squat": original_squat, "walking": original_walking, "chair_sit": original_chair_sit}
+
+# Settings that reproduce the original detectors: no smoothing, no hysteresis bands
+UNFILTERED = {
+    "hand": {"smoothing": "none"},
+    "squat": {"smoothing": "none", "knee_hysteresis": 0},
+    "walking": {"smoothing": "none", "move_hysteresis": 0},
+    "chair_sit": {"smoothing": "none", "sit_hysteresis": 0},
+}
+
+
+@pytest.mark.parametrize("exercise", FITQUEST.EXERCISE_TYPES)
+def test_matches_original_per_frame_logic(recording, exercise):
+    expected = ORIGINAL[exercise](np.asarray(recording.landmarks, dtype=np.float64))
+    assert expected[-1] > 0  # The recording exercises every detector
+    assert run_detector(exercise, recording.landmarks, **UNFILTERED[exercise]) == expected
+
+
+@pytest.mark.parametrize("exercise", FITQUEST.EXERCISE_TYPES)
+@pytest.mark.parametrize("unfiltered", [False, True])
+def test_run_step_and_chunks_agree(recording, exercise, unfiltered):
+    options = UNFILTERED[exercise] if unfiltered else {}
+    landmarks, times = recording.landmarks, recording.timestamps
+    whole = run_detector(exercise, landmarks, times, **options)
+    
+    random.seed(SEED)
+    detector = FITQUEST.create_detector(exercise, WIDTH, HEIGHT, {exercise: options})
+    stepped = [detector.step(frame, timestamp) for frame, timestamp in zip(landmarks, times)]
+    assert stepped == whole
+    
+    chunks = [0, 1, 2, 17, 18, 250, 611, 612, 899, len(landmarks)]
+    assert run_detector(exercise, landmarks, times, chunks, **options) == whole
+
+
+@pytest.mark.parametrize("exercise", FITQUEST.EXERCISE_TYPES)
+def test_missing_timestamps_use_nominal_frame_rate(recording, exercise):
+    timed = run_detector(exercise, recording.landmarks, recording.timestamps)
+    assert run_detector(exercise, recording.landmarks, chunks=[0, 300, len(recording)]) == timed
+
+
+def test_walking_cadence_does_not_depend_on_frame_rate():
+    landmarks = FITQUEST.synthetic_landmarks(900)
+    cadences = []
+    for step in (1, 2):
+        detector = FITQUEST.create_detector("walking", WIDTH, HEIGHT, {})
+        detector.run(landmarks[::step], np.arange(0, 900, step) / 30)
+        cadences.append(detector.cadence)
+    assert cadences[0] > 0
+    assert cadences[1] == pytest.approx(cadences[0], rel=0.05)
+
+
+@pytest.mark.parametrize("capacity", [1, 2, 5, 64])
+def test_motion_window_matches_brute_force(capacity):
+    rng = np.random.default_rng(capacity)
+    values = rng.integers(0, 50, 500).astype(float)  # Repeated values exercise ties in the deques
+    window = FITQUEST.MotionWindow(capacity)
+    for i, value in enumerate(values):
+        window.push(value, i / 30)
+        recent = values[max(0, i + 1 - capacity):i + 1]
+        assert len(window) == len(recent)
+        assert window.minimum == recent.min()
+        assert window.maximum == recent.max()
+        assert window.span() == recent.max() - recent.min()
+        assert window.mean == pytest.approx(recent.mean())
+
+
+def test_motion_window_swing_frequency():
+    window = FITQUEST.MotionWindow(300, dead_band=1.0)
+    for i in range(300):
+        window.push(10 * math.sin(2 * math.pi * i / 90), i / 30)  # One full sway every 3 seconds
+    assert window.swings_per_minute() == pytest.approx(40, rel=0.05)  # Two swings per sway
+
+
+def test_detector_without_run_cannot_be_built():
+    class Incomplete(FITQUEST.ExerciseDetector):
+        pass
+    
+    with pytest.raises(TypeError, match="_run"):
+        Incomplete()
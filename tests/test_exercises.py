@@ -0,0 +1,24 @@
+"""Exercise registry"""
+import pytest
+
+pytest.importorskip("cv2")
+pytest.importorskip("pygame")
+import FITQUEST
+
+
+def test_registered_exercises_have_detectors_and_history():
+    assert FITQUEST.EXERCISE_TYPES == ["hand", "squat", "walking", "chair_sit"]
+    for name, exercise in FITQUEST.EXERCISES.items():
+        assert issubclass(exercise.detector, FITQUEST.ExerciseDetector)
+        assert FITQUEST.HISTORY_FIELDS.get(name) == exercise.history_field
+
+
+def test_exercise_missing_a_screen_method_fails_at_registration(monkeypatch):
+    monkeypatch.setattr(FITQUEST, "EXERCISES", dict(FITQUEST.EXERCISES))
+    with pytest.raises(TypeError, match="result_message"):
+        @FITQUEST.register_exercise
+        class Incomplete(FITQUEST.Exercise):
+            name = "incomplete"
+            
+            def widgets(self):
+                return []
@@ -0,0 +1,123 @@
+"""User data snapshot and change log"""
+import json
+
+import numpy as np
+import pytest
+
+pytest.importorskip("cv2")
+pytest.importorskip("pygame")
+import FITQUEST
+
+
+def make_store(tmp_path):
+    return FITQUEST.SessionStore(str(tmp_path / "user_data.json"), str(tmp_path / "user_data.log"))
+
+
+def put(user, coins):
+    return {"op": "put", "user": user, "value": {"coins": coins}}
+
+
+@pytest.mark.parametrize("fragment", ['{"op":"put","us', '{"op":"put","user":"x","value":{}}'])
+def test_torn_log_tail_is_cut_before_the_next_append(tmp_path, fragment):
+    store = make_store(tmp_path)
+    store.append(put("alice", 1))
+    store.close()
+    with open(store.log_path, "a") as file:
+        file.write(fragment)  # Crash partway through an append, before its newline
+    
+    assert make_store(tmp_path).load() == {"alice": {"coins": 1}}
+    
+    store = make_store(tmp_path)
+    store.load()
+    store.append(put("bob", 2))
+    store.append(put("carol", 3))
+    store.close()
+    assert make_store(tmp_path).load() == {"alice": {"coins": 1}, "bob": {"coins": 2}, "carol": {"coins": 3}}
+
+
+def test_snapshot_folds_in_the_log(tmp_path):
+    store = make_store(tmp_path)
+    store.append(put("alice", 1))
+    store.compact(store.load())
+    store.append(put("bob", 2))
+    store.close()
+    
+    with open(store.snapshot_path) as file:
+        assert json.load(file) == {"alice": {"coins": 1}}
+    assert make_store(tmp_path).load() == {"alice": {"coins": 1}, "bob": {"coins": 2}}
+
+
+def test_history_columns_can_be_rewritten_after_loading(tmp_path, monkeypatch):
+    data = {"alice": {"squats_history": {"2024-03-02": 5, "2024-03-01": 3}, "walking_history": {"2024-02-28": 1}},
+            "bob": {"chair_sits_history": {"2024-01-01": 2}}}
+    path = str(tmp_path / "user_history.bin")
+    columns = FITQUEST.HistoryColumns()
+    columns.build(data)
+    columns.write(path, columns.to_bytes())
+    
+    loaded = FITQUEST.HistoryColumns()
+    loaded.load(path)
+    assert isinstance(loaded.series("alice", "squat")[0], np.memmap)
+    loaded.update("alice", "squat", "2024-03-03", 7)
+    
+    loaded.detach()
+    assert not any(isinstance(column, np.memmap) for series in loaded._series.values() for column in series)
+    synced = []
+    monkeypatch.setattr(FITQUEST.os, "fsync", synced.append)
+    loaded.write(path, loaded.to_bytes(), fsync="snapshot")
+    loaded.write(path, loaded.to_bytes(), fsync="never")
+    assert len(synced) == 1
+    
+    reloaded = FITQUEST.HistoryColumns()
+    reloaded.load(path)
+    days, counts = reloaded.series("alice", "squat")
+    assert [FITQUEST.HistoryColumns.to_date(day) for day in days] == ["2024-03-01", "2024-03-02", "2024-03-03"]
+    assert counts.tolist() == [3, 5, 7]
+    assert reloaded.series("bob", "chair_sit")[1].tolist() == [2]
+
+
+def test_stats_index_skips_malformed_dates(capsys):
+    index = FITQUEST.StatsIndex()
+    index.rebuild({"alice": {"squats_history": {"2024-03-01": 3, "yesterday": 5, "2024-3-2": 4, "2024-03-04": 2}}})
+    assert index.total("alice", "squat") == 5
+    assert index.rollup("alice", "squat", "month") == {"2024-03": 5}
+    assert "'yesterday'" in capsys.readouterr().out
+
+
+def test_history_columns_skip_malformed_dates(capsys):
+    columns = FITQUEST.HistoryColumns()
+    columns.build({"alice": {"squats_history": {"2024-03-02": 5, "2024-3-1": 1, "not a date": 2, "2024-03-01": 3}},
+                   "bob": {"walking_history": {"??": 1}}})
+    days, counts = columns.series("alice", "squat")
+    assert [FITQUEST.HistoryColumns.to_date(day) for day in days] == ["2024-03-01", "2024-03-02"]
+    assert counts.tolist() == [3, 5]
+    assert len(columns.series("bob", "walking")[0]) == 0
+    assert "'not a date'" in capsys.readouterr().out
+
+
+def test_graphs_render_a_snapshot_taken_under_the_data_lock(monkeypatch):
+    rendered = []
+    
+    def generate(rows):
+        assert FITQUEST.data_lock._lock.acquire(blocking=False)  # Rendering does not hold the lock
+        FITQUEST.data_lock.release()
+        rendered.append(rows)
+        return "surface"
+    
+    monkeypatch.setattr(FITQUEST, "user_data", {"alice": {"coins": 3}})
+    monkeypatch.setattr(FITQUEST, "graph_cache", {})
+    monkeypatch.setitem(FITQUEST.GRAPH_GENERATORS, "Hand Exercise Performance",
+                        (FITQUEST.hand_exercise_rows, generate))
+    
+    scheduler = FITQUEST.Scheduler()
+    monkeypatch.setattr(FITQUEST, "scheduler", scheduler)
+    
+    async def run():
+        scheduler.loop = FITQUEST.asyncio.get_running_loop()
+        return await FITQUEST.get_graph_surface("Hand Exercise Performance")
+    
+    surface = FITQUEST.asyncio.run(run())
+    FITQUEST.user_data["bob"] = {"coins": 5}
+    
+    assert surface == "surface"
+    assert rendered == [(["alice"], [3])]
@@ -0,0 +1,176 @@
+"""Per-frame webcam path: input scaling, region of interest crops and pooled buffers"""
+import types
+
+import numpy as np
+import pytest
+
+pytest.importorskip("cv2")
+pytest.importorskip("pygame")
+import FITQUEST
+
+
+class StrictPose:
+    """Pose model stand-in that rejects input the way MediaPipe does and finds nobody"""
+
+    def __init__(self):
+        self.shapes = []
+
+    def process(self, image):
+        if not image.flags.writeable and not image.flags.c_contiguous:
+            raise ValueError("Reference mode is unavailable if 'data' is not c_contiguous.")
+        self.shapes.append(image.shape)
+        return types.SimpleNamespace(pose_landmarks=None)
+
+
+@pytest.fixture
+def session(monkeypatch):
+    """Fresh per-session pipeline state and a pooled buffer holding a synthetic frame"""
+    monkeypatch.setattr(FITQUEST, "quality_controller", FITQUEST.QualityController(target_fps=0))
+    monkeypatch.setattr(FITQUEST, "roi_tracker", FITQUEST.RoiTracker())
+    monkeypatch.setattr(FITQUEST, "frame_pool", FITQUEST.FrameBufferPool())
+    monkeypatch.setattr(FITQUEST, "pipeline_metrics", FITQUEST.PipelineMetrics())
+    monkeypatch.setattr(FITQUEST, "detection_active", False)
+    
+    landmarks = FITQUEST.synthetic_landmarks(1)[0]
+    background = np.full((480, 640, 3), 120, dtype=np.uint8)
+    buffer = FITQUEST.frame_pool.acquire((480, 640, 3))
+    buffer.frame[:] = FITQUEST.draw_synthetic_frame(landmarks, 640, 480, background)
+    return buffer
+
+
+@pytest.fixture
+def strict_pose(monkeypatch):
+    model = StrictPose()
+    monkeypatch.setattr(FITQUEST, "get_pose", lambda model_complexity=1: model)
+    return model
+
+
+def test_scratch_images_are_contiguous(session):
+    for height, width in [(480, 640), (360, 480), (123, 77)]:
+        image = session.scratch("rgb", height, width)
+        assert image.shape == (height, width, 3)
+        assert image.flags.c_contiguous
+        assert np.shares_memory(image, session.rgb)
+
+
+def test_scaled_input(session, strict_pose):
+    FITQUEST.quality_controller.level = 1  # 75% input
+    FITQUEST.process_frame(session, FITQUEST.LandmarkPredictor())
+    assert strict_pose.shapes == [(360, 480, 3)]
+
+
+def test_roi_crop_falls_back_to_full_frame(session, strict_pose):
+    FITQUEST.roi_tracker.box = (100, 50, 400, 430)
+    FITQUEST.process_frame(session, FITQUEST.LandmarkPredictor())
+    assert strict_pose.shapes == [(380, 300, 3), (480, 640, 3)]
+    assert FITQUEST.roi_tracker.fallbacks == 1
+
+
+def test_scaled_roi_crop(session, strict_pose):
+    FITQUEST.quality_controller.level = 3  # 50% input
+    FITQUEST.roi_tracker.box = (101, 51, 400, 430)
+    FITQUEST.process_frame(session, FITQUEST.LandmarkPredictor())
+    assert strict_pose.shapes == [(189, 149, 3), (240, 320, 3)]
+
+
+def test_quality_controller_only_sees_frames_that_ran_inference(session, strict_pose, monkeypatch):
+    FITQUEST.quality_controller.level = 5  # Infer every 3rd frame
+    recorded = []
+    monkeypatch.setattr(FITQUEST.quality_controller, "record", recorded.append)
+    predictor = FITQUEST.LandmarkPredictor()
+    for _ in range(6):
+        FITQUEST.process_frame(session, predictor)
+    assert len(strict_pose.shapes) == 2
+    assert len(recorded) == 2
+
+
+def test_mediapipe_accepts_scaled_roi_crops(session):
+    pytest.importorskip("mediapipe")
+    FITQUEST.quality_controller.level = 1
+    FITQUEST.roi_tracker.box = (100, 50, 400, 430)
+    predictor = FITQUEST.LandmarkPredictor()
+    for _ in range(3):
+        FITQUEST.process_frame(session, predictor)
+    assert FITQUEST.roi_tracker.frames >= 1
+
+
+def test_benchmark_runs_the_pipeline_frame_path(monkeypatch, strict_pose):
+    for name in ("exercise_type", "frame_pool", "detection_active", "landmark_recorder",
+                 "pipeline_metrics", "quality_controller", "roi_tracker"):
+        monkeypatch.setattr(FITQUEST, name, getattr(FITQUEST, name))
+    monkeypatch.setattr(FITQUEST, "user_data", {})
+    landmarks = FITQUEST.synthetic_landmarks(FITQUEST.BENCHMARK_WARMUP_FRAMES + 10)
+    frames = FITQUEST.benchmark_frames(160, 120, landmarks)
+    
+    case = FITQUEST.benchmark_case("squat", 160, 120, frames, landmarks, level=1)
+    assert set(strict_pose.shapes) == {(90, 120, 3)}  # 75% input, as the pipeline scales it
+    assert {"flip", "resize", "cvtColor", "pose.process", "detect:squat", "frame"} <= set(case["stages"])
+
+
+class ClosedCapture:
+    """A camera that failed to open"""
+
+    def __init__(self):
+        self.released = False
+
+    def isOpened(self):
+        return False
+
+    def release(self):
+        self.released = True
+
+
+def test_capture_stage_stops_the_pipeline_when_the_camera_is_unavailable(monkeypatch):
+    capture = ClosedCapture()
+    monkeypatch.setattr(FITQUEST, "cap", capture)
+    monkeypatch.setattr(FITQUEST, "pipeline_active", True)
+    monkeypatch.setitem(FITQUEST.pipeline_status, "error", None)
+    
+    async def run():
+        await FITQUEST.capture_stage(FITQUEST.DropOldestQueue())
+    
+    FITQUEST.asyncio.run(run())
+    assert not FITQUEST.pipeline_active
+    assert capture.released
+    assert FITQUEST.pipeline_status["error"] == "Camera unavailable"
+
+
+def test_pipeline_metrics_count_every_sample_recorded_from_several_threads():
+    metrics = FITQUEST.PipelineMetrics()
+    
+    def record():
+        for _ in range(2000):
+            metrics.record("capture", 0.001)
+            metrics.record_lock_wait(0.0)
+            metrics.frame_shown()
+    
+    threads = [FITQUEST.threading.Thread(target=record) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    summary = metrics.summary()
+    assert summary["stages"]["capture"]["count"] == 8000
+    assert summary["data_lock_wait"]["acquisitions"] == 8000
+    assert summary["frames_shown"] == 8000
+
+
+def test_stop_webcam_releases_the_camera_after_a_failed_pipeline(monkeypatch, capsys):
+    capture = ClosedCapture()
+    monkeypatch.setattr(FITQUEST, "cap", capture)
+    monkeypatch.setattr(FITQUEST, "landmark_recorder", None)
+    monkeypatch.setattr(FITQUEST.cv2, "destroyAllWindows", lambda: None)
+    
+    async def display():
+        raise RuntimeError("display died")
+    
+    async def run():
+        task = FITQUEST.asyncio.get_running_loop().create_task(display())
+        monkeypatch.setattr(FITQUEST, "webcam_task", task)
+        await FITQUEST.stop_webcam()
+    
+    FITQUEST.asyncio.run(run())
+    assert capture.released
+    assert FITQUEST.webcam_task is None
+    assert "display died" in capsys.readouterr().out
@@ -0,0 +1,39 @@
+"""Crediting station sessions to users"""
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("cv2")
+pytest.importorskip("pygame")
+import FITQUEST
+
+
+@pytest.fixture
+def users(monkeypatch, tmp_path):
+    today = datetime.now().strftime("%Y-%m-%d")
+    data = {user: {"coins": 0, "progress": 0, "squats_history": {today: 7}, "walking_history": {},
+                   "chair_sits_history": {}, "last_exercise_date": today, "inventory": []}
+            for user in ("alice", "bob", "carol", "dave")}
+    store = FITQUEST.SessionStore(str(tmp_path / "user_data.json"), str(tmp_path / "user_data.log"))
+    monkeypatch.setattr(FITQUEST, "user_data", data)
+    monkeypatch.setattr(FITQUEST, "persistence", FITQUEST.PersistenceService(store))
+    monkeypatch.setattr(FITQUEST, "stats_index", FITQUEST.StatsIndex())
+    monkeypatch.setattr(FITQUEST, "history_columns", FITQUEST.HistoryColumns())
+    return data, today
+
+
+def test_only_cleanly_finished_stations_are_credited(users, capsys):
+    data, today = users
+    FITQUEST.credit_station_sessions([
+        {"station": 0, "user": "alice", "exercise": "squat", "count": 0},  # Process died before its final status
+        {"station": 1, "user": "bob", "exercise": "squat", "count": 2, "finished": True, "error": "camera lost"},
+        {"station": 2, "user": "carol", "exercise": "squat", "error": "Cannot open capture source 3"},
+        {"station": 3, "user": "dave", "exercise": "squat", "count": 12, "finished": True, "frames": 300, "fps": 29.5},
+    ])
+    
+    for user in ("alice", "bob", "carol"):
+        assert data[user]["squats_history"] == {today: 7}
+        assert data[user]["coins"] == 0
+    assert data["dave"]["squats_history"] == {today: 12}
+    assert data["dave"]["coins"] == FITQUEST.EXERCISES["squat"].coins_for(12)
+    assert "without reporting a final count" in capsys.readouterr().out
@@ -0,0 +1,128 @@
+"""Streaming user import/export"""
+import io
+import json
+
+import pytest
+
+pytest.importorskip("cv2")
+pytest.importorskip("pygame")
+import FITQUEST
+
+USERS = {
+    "alice": {"schema_version": FITQUEST.USER_SCHEMA_VERSION, "age": 34, "coins": 120, "progress": 55.5,
+              "squats_history": {"2024-03-01": 12, "2024-03-02": 0}, "walking_history": {"2024-03-01": 3},
+              "chair_sits_history": {}, "last_exercise_date": "2024-03-02", "inventory": ["Hat", "Cape"]},
+    "böb, \"the\" builder": {"age": "71", "coins": 0, "progress": 0, "inventory": [], "pet": {"name": "Rex"}},
+    "carol": {"schema_version": 2, "age": "8", "coins": 1000, "progress": 100,
+              "squats_history": {}, "walking_history": {}, "chair_sits_history": {},
+              "last_exercise_date": None, "inventory": []},
+}
+
+
+def make_store(tmp_path, name):
+    directory = tmp_path / name
+    directory.mkdir()
+    return FITQUEST.SessionStore(str(directory / "user_data.json"), str(directory / "user_data.log"))
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64, 1 << 16])
+def test_iter_json_object_across_chunk_boundaries(chunk_size):
+    data = {"a": 1234567, "b": [1.5e10, -0.25, True, None], "cé": {"nested": "}{,:\\\"", "n": 0},
+            "d": "", "e": 12345678901234567890}
+    for text in (json.dumps(data), json.dumps(data, indent=4), json.dumps(data, separators=(",", ":"))):
+        assert dict(FITQUEST.iter_json_object(io.StringIO(text), chunk_size)) == data
+    assert list(FITQUEST.iter_json_object(io.StringIO(" { } "), chunk_size)) == []
+
+
+@pytest.mark.parametrize("text", ["[1, 2]", '{"a": 1 "b": 2}', '{"a" 1}', '{"a": 1,'])
+def test_iter_json_object_rejects_malformed_input(text):
+    with pytest.raises(ValueError):
+        dict(FITQUEST.iter_json_object(io.StringIO(text), 2))
+
+
+@pytest.mark.parametrize("file_format", ["ndjson", "csv", "json"])
+def test_export_import_round_trip(tmp_path, file_format):
+    source = make_store(tmp_path, "source")
+    source.compact(USERS)
+    source.append({"op": "put", "user": "dave", "value": {"age": 50, "coins": 5, "progress": 1}})
+    source.close()
+    expected = {user: FITQUEST.migrate_user_record(json.loads(json.dumps(record)))
+                for user, record in source.load().items()}
+    
+    path = str(tmp_path / f"users.{file_format}")
+    assert FITQUEST.export_users(path, store=source) == 4
+    
+    target = make_store(tmp_path, "target")
+    target.compact({"alice": {"age": 1, "coins": 0, "progress": 0}, "erin": {"age": 2, "coins": 0, "progress": 0}})
+    errors = str(tmp_path / "errors.jsonl")
+    assert FITQUEST.import_users([path], store=target, errors_file=errors, batch_size=2) == (4, 0)
+    
+    imported = target.load()
+    assert imported.pop("erin") == {"age": 2, "coins": 0, "progress": 0}  # Untouched by the import
+    assert imported == expected
+    assert imported["carol"]["age"] == 8  # Text ages from older versions become numbers
+    with open(target.log_path) as file:
+        assert file.read() == ""  # Imports leave the store compacted
+
+
+def test_import_rejects_invalid_records(tmp_path):
+    path = tmp_path / "users.ndjson"
+    path.write_text("\n".join([
+        json.dumps({"user": "ok", "age": 30, "coins": 0, "progress": 0}),
+        json.dumps({"user": "bad_age", "age": "old", "coins": 0, "progress": 0}),
+        json.dumps({"user": "bad_date", "age": 30, "coins": 0, "progress": 0, "squats_history": {"2024-13-01": 1}}),
+        "{not json",
+        "[1, 2]",
+    ]) + "\n")
+    store = make_store(tmp_path, "store")
+    errors = tmp_path / "errors.jsonl"
+    assert FITQUEST.import_users([str(path)], store=store, errors_file=str(errors)) == (1, 4)
+    assert list(store.load()) == ["ok"]
+    rejected = [json.loads(line) for line in errors.read_text().splitlines()]
+    assert [entry["user"] for entry in rejected] == ["bad_age", "bad_date", None, None]
+
+
+def test_export_skips_a_torn_log_tail_like_load(tmp_path):
+    store = make_store(tmp_path, "store")
+    store.append({"op": "put", "user": "alice", "value": {"age": 30, "coins": 0, "progress": 0}})
+    store.close()
+    with open(store.log_path, "a") as file:
+        file.write(json.dumps({"op": "put", "user": "torn", "value": {"age": 1, "coins": 0, "progress": 0}}))
+    
+    path = str(tmp_path / "users.ndjson")
+    assert FITQUEST.export_users(path, store=store) == 1
+    with open(path) as file:
+        assert [json.loads(line)["user"] for line in file] == ["alice"]
+    assert list(store.load()) == ["alice"]
+
+
+def test_later_import_records_win(tmp_path):
+    first, second = tmp_path / "first.ndjson", tmp_path / "second.ndjson"
+    first.write_text("".join(json.dumps({"user": user, "age": age, "coins": 0, "progress": 0}) + "\n"
+                             for user, age in [("a", 1), ("b", 2), ("a", 3)]))
+    second.write_text(json.dumps({"user": "b", "age": 4, "coins": 0, "progress": 0}) + "\n")
+    store = make_store(tmp_path, "store")
+    store.compact({"b": {"age": 9, "coins": 0, "progress": 0}, "c": {"age": 5, "coins": 0, "progress": 0}})
+    
+    FITQUEST.import_users([str(first), str(second)], store=store, errors_file=str(tmp_path / "errors.jsonl"), batch_size=2)
+    assert {user: record["age"] for user, record in store.load().items()} == {"a": 3, "b": 4, "c": 5}
+    assert sorted(path.name for path in (tmp_path / "store").iterdir()) == ["user_data.json", "user_data.log"]
+
+
+class CountingReader(io.StringIO):
+    def __init__(self, text):
+        super().__init__(text)
+        self.reads = 0
+
+    def read(self, size=-1):
+        self.reads += 1
+        return super().read(size)
+
+
+def test_iter_json_object_reports_syntax_errors_without_reading_on():
+    members = ",".join(f'"user{i}": {{"age": {i}}}' for i in range(2000))
+    text = '{"first": {"age": 1,, "x": 2}, ' + members + "}"
+    reader = CountingReader(text)
+    with pytest.raises(ValueError, match="at character 20"):
+        dict(FITQUEST.iter_json_object(reader, 64))
+    assert reader.reads <= 2